@@ -0,0 +1,101 @@
+"""
+Batch Module
+============
+
+Computes minimum_range for many (base, station) pairs at once, spread over a
+pool of worker processes.
+
+The graph is exported to a FlatGraph and placed in shared memory, every
+worker attaches to it once, when it starts, without copying it. After that
+each task only carries a few base indices, and each base is solved with a
+single sweep that reaches all the stations.
+
+Usage:
+    Not to be run as main, is used as an import.
+
+Example:
+    rows = minimum_range_matrix(G, bases, stations, max_workers=8)
+    rows[i][j]  # minimum_range(bases[i], stations[j])
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from flatgraph import FlatGraph, SharedGraphInfo
+
+# The graph and stations of this worker process, set once by _init_worker.
+_worker_graph = None
+_worker_stations = None
+
+
+def _init_worker(graph, stations):
+    """
+    Runs once in every worker, keeps the graph for all later tasks.
+    :param graph: Either the FlatGraph itself, or the SharedGraphInfo to
+                  attach to it in shared memory.
+    :param stations: The indices of the stations.
+    """
+    global _worker_graph, _worker_stations
+    if isinstance(graph, SharedGraphInfo):
+        graph = FlatGraph.attach(graph)
+    _worker_graph = graph
+    _worker_stations = stations
+
+
+def _solve_chunk(bases):
+    """
+    Solves a chunk of bases in the worker.
+    :param bases: The indices of the bases.
+    :return: The LIST of rows, one array of ranges per base.
+    """
+    return [_worker_graph.minimum_ranges(b, _worker_stations) for b in bases]
+
+
+def minimum_range_matrix(graph, bases, stations, max_workers=None,
+                         chunk_size=1, shared=True):
+    """
+    Returns the minimum range from every base to every station.
+
+    :param graph: The graph.
+    :param bases: The LIST of base vertices.
+    :param stations: The LIST of station vertices.
+    :param max_workers: The number of worker processes, defaults to the
+                        number of CPUs. With 1 everything runs in this process.
+    :param chunk_size: The number of bases sent to a worker per task. Bigger
+                       chunks mean less talking between processes, smaller
+                       ones balance the load better.
+    :param shared: Share one copy of the graph between the workers through
+                   shared memory, instead of pickling a copy for each.
+
+    :type graph: Graph
+    :type max_workers: int
+    :type chunk_size: int
+    :type shared: bool
+    :return: The LIST of rows, one per base. Each row is an array('d') with
+             the range to each station (inf if it can't be reached).
+    """
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    flat = FlatGraph.from_graph(graph)
+    base_indices = [flat.index(b.id) for b in bases]
+    station_indices = [flat.index(s.id) for s in stations]
+
+    if max_workers == 1:
+        return [flat.minimum_ranges(b, station_indices) for b in base_indices]
+
+    chunks = [base_indices[i:i + chunk_size]
+              for i in range(0, len(base_indices), chunk_size)]
+
+    owner = flat.to_shared_memory() if shared else None
+    rows = []
+    try:
+        with ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_worker,
+                initargs=(owner.info if shared else flat,
+                          station_indices)) as pool:
+            for chunk_rows in pool.map(_solve_chunk, chunks):
+                rows.extend(chunk_rows)
+    finally:
+        if owner is not None:
+            owner.close()
+    return rows
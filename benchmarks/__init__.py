@@ -0,0 +1,15 @@
+"""
+Benchmarks
+==========
+
+Scripts that time the graph on big, generated maps. They are not tests, run
+them from the folder with graph.py in it, e.g.
+
+python3 -m benchmarks.runner --sizes 1000 10000 100000 --json results.json
+
+    * generators.py  - seeded map generators (geometric, grid, chain, ...).
+    * runner.py      - latency percentiles and memory per operation, as a
+                       table or JSON, and compares two JSON reports.
+    * bench_batch.py - scaling of the batch minimum_range solver.
+    * bench_load.py  - building a map against loading it from a file.
+"""
@@ -0,0 +1,40 @@
+"""
+Batch minimum_range benchmark
+-----------------------------
+
+Times minimum_range_matrix with 1, 2, 4, ... worker processes on a random
+geometric graph and prints the speedup over one worker.
+
+python3 -m benchmarks.bench_batch [vertices] [bases]
+"""
+import os
+import sys
+import time
+
+from batch import minimum_range_matrix
+from benchmarks.generators import random_geometric
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_bases = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    G, vs = random_geometric(n)
+    bases = vs[:n_bases]
+
+    workers = 1
+    baseline = None
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        minimum_range_matrix(G, bases, vs, max_workers=workers,
+                             chunk_size=max(1, n_bases // (4 * workers)))
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline = elapsed
+        print("{:>3} workers: {:8.3f}s  speedup {:5.2f}x".format(
+            workers, elapsed, baseline / elapsed))
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Graph loading benchmark
+-----------------------
+
+Compares building a map with insert_vertex/insert_edge against loading the
+same map from a graph file, with and without memory mapping.
+
+python3 -m benchmarks.bench_load [vertices]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from graph import Graph
+from benchmarks.generators import random_geometric
+
+
+def timed(label, fn):
+    """
+    Runs fn once and prints how long it took.
+    :return: What fn returned.
+    """
+
+    start = time.perf_counter()
+    result = fn()
+    print("{:<28} {:8.3f}s".format(label, time.perf_counter() - start))
+    return result
+
+
+def build(coords, pairs):
+    """
+    The current construction path, one insert at a time.
+    """
+
+    G = Graph()
+    vs = [G.insert_vertex(x, y) for x, y in coords]
+    for i, j in pairs:
+        G.insert_edge(vs[i], vs[j])
+    return G
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    G, vs = random_geometric(n)
+    position = {v.id: i for i, v in enumerate(vs)}
+    coords = [(v.x_pos, v.y_pos) for v in vs]
+    pairs = [(i, position[G.opposite(e, v).id])
+             for i, v in enumerate(vs) for e in v.edges
+             if position[G.opposite(e, v).id] > i]
+
+    fd, path = tempfile.mkstemp(suffix=".pgr")
+    os.close(fd)
+    try:
+        timed("insert_vertex/insert_edge", lambda: build(coords, pairs))
+        timed("save", lambda: G.save(path))
+        timed("load(mmap=False)", lambda: Graph.load(path, mmap=False))
+        flat = timed("load(mmap=True)", lambda: Graph.load(path, mmap=True))
+        timed("  first minimum_range", lambda: flat.minimum_range(0, n - 1))
+        flat.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Vertex reordering benchmark
+---------------------------
+
+Times find_path and minimum_range on a random geometric graph in insertion
+order, then after Graph.reorder() with each strategy. Every order answers
+the same queries, on the graph itself, on the FlatGraph made from it, and
+on its graph file out of core.
+
+python3 -m benchmarks.bench_reorder [vertices] [queries]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from flatgraph import FlatGraph
+from graph import Graph
+from benchmarks.generators import random_geometric
+
+
+def throughput(queries, fn):
+    """
+    Runs fn on every query.
+    :return: The queries per second.
+    """
+
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def run(G, pairs, path):
+    """
+    Returns the queries per second of every (view, query) for G's order.
+    """
+
+    flat = FlatGraph.from_graph(G)
+    G.save(path)
+    mapped = Graph.load(path, out_of_core=True)
+    r = 0.1
+
+    by_id = G._by_id
+    on_graph = [(by_id[b], by_id[s]) for b, s in pairs]
+    on_flat = [(flat.index(b), flat.index(s)) for b, s in pairs]
+    on_file = [(mapped.index(b), mapped.index(s)) for b, s in pairs]
+
+    rates = [
+        throughput(on_graph, lambda b, s: G.find_path(b, s, r)),
+        throughput(on_graph, G.minimum_range),
+        throughput(on_flat, lambda b, s: flat.find_path(b, s, r)),
+        throughput(on_flat, flat.minimum_range),
+        throughput(on_file, lambda b, s: mapped.find_path(b, s, r)),
+        throughput(on_file, mapped.minimum_range),
+    ]
+    mapped.close()
+    return rates
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    G, vs = random_geometric(n)
+    rng = random.Random(0)
+    pairs = [(rng.choice(vs).id, rng.choice(vs).id) for _ in range(n_queries)]
+
+    print("{:<10}".format("order") + "".join(
+        "{:>14}".format(label) for label in
+        ("graph path/s", "graph range/s", "flat path/s", "flat range/s",
+         "file path/s", "file range/s")))
+
+    fd, path = tempfile.mkstemp(suffix=".pgr")
+    os.close(fd)
+    try:
+        for strategy in (None, "hilbert", "bfs", "rcm"):
+            if strategy is not None:
+                G.reorder(strategy)
+            rates = run(G, pairs, path)
+            print("{:<10}".format(strategy or "inserted") +
+                  "".join("{:>14.1f}".format(rate) for rate in rates))
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
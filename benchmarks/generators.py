@@ -0,0 +1,184 @@
+"""
+Map generators
+--------------
+
+Seeded generators for big test maps. Every generator takes the number of
+vertices n and a seed, and returns the connected Graph together with the
+LIST of its vertices. The same n and seed always give the same map.
+
+    * random_geometric   - stations in the unit square, joined when close.
+    * grid               - a square grid of stations.
+    * chain              - one long line of stations.
+    * hub_and_spoke      - a ring of hubs, each with its own spokes.
+    * clustered_icebergs - tight clusters of stations, bridged together.
+"""
+import math
+import random
+
+from graph import Graph
+
+
+def _connect_nearby(G, vs, radius):
+    """
+    Joins every pair of vertices closer than radius, using a uniform grid so
+    only the neighbouring cells are compared.
+    """
+
+    cells = {}
+    for i, v in enumerate(vs):
+        key = (int(v.x_pos // radius), int(v.y_pos // radius))
+        cells.setdefault(key, []).append(i)
+
+    for (cx, cy), members in cells.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                others = cells.get((cx + dx, cy + dy))
+                if others is None:
+                    continue
+                for i in members:
+                    for j in others:
+                        if i < j and G.distance(vs[i], vs[j]) <= radius:
+                            G.insert_edge(vs[i], vs[j])
+
+
+def _make_connected(G, vs):
+    """
+    Joins the connected components together, by chaining one vertex of each
+    component in order of position.
+    """
+
+    component = {}
+    leaders = []
+    for v in vs:
+        if v.id in component:
+            continue
+        leaders.append(v)
+        component[v.id] = v.id
+        stack = [v]
+        while stack:
+            u = stack.pop()
+            for e in u.edges:
+                w = G.opposite(e, u)
+                if w.id not in component:
+                    component[w.id] = v.id
+                    stack.append(w)
+
+    leaders.sort(key=lambda v: (v.x_pos, v.y_pos))
+    for u, v in zip(leaders, leaders[1:]):
+        G.insert_edge(u, v)
+
+
+def random_geometric(n, seed=0, degree=8):
+    """
+    Random geometric graph: n stations in the unit square, joined when they
+    are close enough to give about `degree` neighbours each.
+    """
+
+    rng = random.Random(seed)
+    G = Graph()
+    vs = [G.insert_vertex(rng.random(), rng.random()) for _ in range(n)]
+    _connect_nearby(G, vs, math.sqrt(degree / (math.pi * max(n, 1))))
+    _make_connected(G, vs)
+    return G, vs
+
+
+def grid(n, seed=0):
+    """
+    Square grid, each station joined to the one to its right and above. The
+    seed only shuffles the order the vertices are inserted in.
+    """
+
+    side = max(1, math.ceil(math.sqrt(n)))
+    cells = [(i % side, i // side) for i in range(n)]
+    random.Random(seed).shuffle(cells)
+
+    G = Graph()
+    at = {}
+    for x, y in cells:
+        at[x, y] = G.insert_vertex(x, y)
+    for (x, y), v in at.items():
+        for other in ((x + 1, y), (x, y + 1)):
+            if other in at:
+                G.insert_edge(v, at[other])
+    _make_connected(G, list(at.values()))
+    return G, list(at.values())
+
+
+def chain(n, seed=0):
+    """
+    One long line of stations, slightly wobbling, the worst case for hops.
+    """
+
+    rng = random.Random(seed)
+    G = Graph()
+    vs = [G.insert_vertex(i, rng.uniform(-0.5, 0.5)) for i in range(n)]
+    for u, v in zip(vs, vs[1:]):
+        G.insert_edge(u, v)
+    return G, vs
+
+
+def hub_and_spoke(n, seed=0):
+    """
+    About sqrt(n) hubs on a ring, joined to their neighbours, each with its
+    own spokes of stations around it.
+    """
+
+    rng = random.Random(seed)
+    G = Graph()
+    n_hubs = max(1, int(math.sqrt(n)))
+    ring = n_hubs * 10.0
+
+    hubs = []
+    for h in range(n_hubs):
+        angle = 2 * math.pi * h / n_hubs
+        hubs.append(G.insert_vertex(ring * math.cos(angle),
+                                    ring * math.sin(angle)))
+    for u, v in zip(hubs, hubs[1:] + hubs[:1]):
+        if u is not v and not any(G.opposite(e, u) is v for e in u.edges):
+            G.insert_edge(u, v)
+
+    vs = list(hubs)
+    for k in range(n - n_hubs):
+        hub = hubs[k % n_hubs]
+        angle = rng.uniform(0, 2 * math.pi)
+        radius = rng.uniform(0.5, 4.5)
+        v = G.insert_vertex(hub.x_pos + radius * math.cos(angle),
+                            hub.y_pos + radius * math.sin(angle))
+        G.insert_edge(hub, v)
+        vs.append(v)
+    return G, vs
+
+
+def clustered_icebergs(n, seed=0, clusters=None):
+    """
+    Tight clusters of stations (the icebergs) scattered over a wide area,
+    with stations inside a cluster joined when close, and a few bridges.
+    """
+
+    rng = random.Random(seed)
+    clusters = clusters or max(1, int(math.sqrt(n) / 4))
+    size = math.sqrt(clusters) * 100
+    centres = [(rng.uniform(0, size), rng.uniform(0, size))
+               for _ in range(clusters)]
+
+    G = Graph()
+    vs = []
+    for k in range(n):
+        cx, cy = centres[k % clusters]
+        vs.append(G.insert_vertex(rng.gauss(cx, 5), rng.gauss(cy, 5)))
+
+    # Most of a cluster is within two standard deviations of its centre,
+    # pick the radius giving about 8 neighbours in there.
+    per_cluster = max(n / clusters, 1)
+    _connect_nearby(G, vs, 10 * math.sqrt(8 / per_cluster))
+    _make_connected(G, vs)
+    return G, vs
+
+
+GENERATORS = {
+    "geometric": random_geometric,
+    "grid": grid,
+    "chain": chain,
+    "hub": hub_and_spoke,
+    "clustered": clustered_icebergs,
+}
@@ -0,0 +1,236 @@
+"""
+Benchmark runner
+----------------
+
+Times the graph operations on generated maps and reports latency percentiles
+and memory, as a table and optionally as JSON to compare commits with.
+
+    python3 -m benchmarks.runner --maps geometric grid --sizes 1000 10000
+    python3 -m benchmarks.runner --json before.json
+    python3 -m benchmarks.runner compare before.json after.json
+
+The latencies are measured first, then every operation is run once more under
+tracemalloc to find its peak memory, so the tracing doesn't skew the timings.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.generators import GENERATORS
+
+OPERATIONS = ("construct", "find_path", "minimum_range",
+              "find_emergency_range", "move_vertex")
+
+
+def percentile(samples, p):
+    """
+    The p-th percentile of the samples, by nearest rank.
+    """
+
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1,
+                      int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarise(samples):
+    """
+    Turns a list of latencies (seconds) into the reported numbers.
+    """
+
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(samples, 50),
+        "p90": percentile(samples, 90),
+        "p99": percentile(samples, 99),
+        "max": max(samples),
+    }
+
+
+def peak_memory(fn):
+    """
+    Runs fn once under tracemalloc.
+    :return: The peak number of bytes allocated while it ran.
+    """
+
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def make_queries(G, vs, rng):
+    """
+    Builds the callables for one random query of each operation.
+    :return: Dict of operation name to a function making a fresh query.
+    """
+
+    def find_path():
+        b, s = rng.choice(vs), rng.choice(vs)
+        r = G.distance(b, s) * rng.uniform(1.0, 2.0)
+        return lambda: G.find_path(b, s, r)
+
+    def minimum_range():
+        b, s = rng.choice(vs), rng.choice(vs)
+        return lambda: G.minimum_range(b, s)
+
+    def find_emergency_range():
+        v = rng.choice(vs)
+        return lambda: G.find_emergency_range(v)
+
+    def move_vertex():
+        v = rng.choice(vs)
+        # Nudge it and put it back, so the map stays the same.
+        x, y = v.x_pos, v.y_pos
+        nudge = rng.uniform(-1e-6, 1e-6)
+
+        def move():
+            G.move_vertex(v, x + nudge, y + nudge)
+            G.move_vertex(v, x, y)
+
+        return move
+
+    return {
+        "find_path": find_path,
+        "minimum_range": minimum_range,
+        "find_emergency_range": find_emergency_range,
+        "move_vertex": move_vertex,
+    }
+
+
+def run_map(name, size, operations, repeat, seed, memory):
+    """
+    Benchmarks the operations on one generated map.
+    :return: The LIST of result dicts.
+    """
+
+    generator = GENERATORS[name]
+    results = []
+
+    def record(operation, samples, fn):
+        result = {"map": name, "size": size, "operation": operation}
+        result.update(summarise(samples))
+        result["peak_memory"] = peak_memory(fn) if memory else None
+        results.append(result)
+
+    start = time.perf_counter()
+    G, vs = generator(size, seed=seed)
+    construct_time = time.perf_counter() - start
+    if "construct" in operations:
+        record("construct", [construct_time], lambda: generator(size, seed))
+
+    rng = random.Random(seed)
+    queries = make_queries(G, vs, rng)
+    for operation in operations:
+        if operation == "construct":
+            continue
+        samples = []
+        for _ in range(repeat):
+            query = queries[operation]()
+            start = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - start)
+        record(operation, samples, queries[operation]())
+
+    return results
+
+
+def git_commit():
+    """
+    The commit being benchmarked, if this is a git checkout.
+    """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    print("{:<10} {:>8} {:<21} {:>10} {:>10} {:>10} {:>12}".format(
+        "map", "size", "operation", "p50 ms", "p90 ms", "p99 ms", "peak KiB"))
+    for r in results:
+        memory = "-" if r["peak_memory"] is None \
+            else "{:.1f}".format(r["peak_memory"] / 1024)
+        print("{:<10} {:>8} {:<21} {:>10.3f} {:>10.3f} {:>10.3f} {:>12}".format(
+            r["map"], r["size"], r["operation"], r["p50"] * 1000,
+            r["p90"] * 1000, r["p99"] * 1000, memory))
+
+
+def compare(before_path, after_path):
+    """
+    Prints how the p50 and p90 latencies changed between two JSON reports.
+    """
+
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    old = {(r["map"], r["size"], r["operation"]): r for r in before["results"]}
+    print("{:<10} {:>8} {:<21} {:>10} {:>10}".format(
+        "map", "size", "operation", "p50 x", "p90 x"))
+    for r in after["results"]:
+        key = (r["map"], r["size"], r["operation"])
+        if key not in old:
+            continue
+        print("{:<10} {:>8} {:<21} {:>10.2f} {:>10.2f}".format(
+            *key, r["p50"] / max(old[key]["p50"], 1e-12),
+            r["p90"] / max(old[key]["p90"], 1e-12)))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        if len(argv) != 3:
+            sys.exit("usage: python3 -m benchmarks.runner compare OLD NEW")
+        compare(argv[1], argv[2])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--maps", nargs="+", default=sorted(GENERATORS),
+                        choices=sorted(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--operations", nargs="+", default=list(OPERATIONS),
+                        choices=OPERATIONS)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the tracemalloc pass")
+    parser.add_argument("--json", metavar="PATH",
+                        help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.maps:
+        for size in args.sizes:
+            results.extend(run_map(name, size, args.operations, args.repeat,
+                                   args.seed, not args.no_memory))
+    print_table(results)
+
+    if args.json:
+        report = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
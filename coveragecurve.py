@@ -0,0 +1,94 @@
+"""
+Coverage Curve Module
+=====================
+
+How many stations a team leaving from base b can reach, as a function of the
+range of their radio.
+
+A station s can be reached with range r when find_path(b, s, r) finds a path,
+which is when r is at least minimum_range(b, s). So the count only ever steps
+up, at the minimum ranges of the stations, and one minimum range sweep from b
+(which reaches the stations in increasing order of range) gives the whole
+curve. Looking up the count for a range, or the range for a count, is then a
+binary search.
+
+The base itself isn't counted.
+
+Usage:
+    Not to be run as main, curves are made with Graph.coverage_curve(b).
+
+Example:
+    curve = G.coverage_curve(b)
+    curve(2.5)           # The stations reachable with a range of 2.5
+    curve.range_for(10)  # The smallest range reaching 10 of them
+    curve.steps()        # [(range, count), ...]
+"""
+import bisect
+
+
+class CoverageCurve:
+    """
+    CoverageCurve Class
+    -------------------
+
+    The number of stations reachable from a base station for every range, as
+    a step function. It doesn't follow later changes to the graph.
+
+    Attributes:
+        * base (Vertex): The base station b.
+        * total (int): The number of stations reachable with any range.
+    """
+
+    def __init__(self, base, ranges):
+        """
+        Builds the steps of the curve.
+        :param base: The base station.
+        :param ranges: The minimum range of every reachable station but the
+                       base, in increasing order.
+        """
+
+        self.base = base
+        self.total = len(ranges)
+        # Where the count steps up, and the count from there on. Stations
+        # with the same range make one step.
+        self._ranges = []
+        self._counts = []
+        for count, r in enumerate(ranges, 1):
+            if self._ranges and self._ranges[-1] == r:
+                self._counts[-1] = count
+            else:
+                self._ranges.append(r)
+                self._counts.append(count)
+
+    def __call__(self, r):
+        return self.count(r)
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def count(self, r):
+        """
+        Returns how many stations can be reached with range r.
+        """
+
+        k = bisect.bisect_right(self._ranges, r)
+        return self._counts[k - 1] if k else 0
+
+    def range_for(self, n):
+        """
+        Returns the smallest range that reaches at least n stations, or None
+        if fewer than n can be reached at all.
+        """
+
+        if n <= 0:
+            return 0.0
+        k = bisect.bisect_left(self._counts, n)
+        return self._ranges[k] if k < len(self._ranges) else None
+
+    def steps(self):
+        """
+        Returns the LIST of (range, count) pairs where the count goes up, in
+        increasing order of range.
+        """
+
+        return list(zip(self._ranges, self._counts))
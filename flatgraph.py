@@ -0,0 +1,444 @@
+"""
+Flat Graph Module
+=================
+
+A compact, read only copy of the graph stored in flat arrays, with no Vertex
+or Edge objects at all. It is cheap to pickle and send to other processes.
+
+The vertices are numbered 0 to n-1 (in the order of Graph._vertices when it
+was exported). The edges are stored in CSR form: the neighbours of vertex i
+are targets[offsets[i]:offsets[i + 1]].
+
+The arrays can also be placed in shared memory, so worker processes attach
+to one copy of the map instead of each unpickling their own.
+
+Usage:
+    Not to be run as main, made from a graph with FlatGraph.from_graph(G).
+
+Example:
+    flat = FlatGraph.from_graph(G)
+    i, j = flat.index(b.id), flat.index(s.id)
+    r = flat.minimum_range(i, j)
+
+    # In the parent process
+    with flat.to_shared_memory() as shared:
+        start_workers(shared.info)
+
+    # In a worker process, no copying
+    flat = FlatGraph.attach(info)
+"""
+import bisect
+import math
+import sys
+from array import array
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import search
+from metrics import EUCLIDEAN
+
+# Everything a process needs to attach to a graph in shared memory. The
+# metric is None for Euclidean.
+SharedGraphInfo = namedtuple("SharedGraphInfo",
+                             ["name", "vertices", "edges", "metric"],
+                             defaults=(None,))
+
+# The arrays in the order they are laid out in shared memory, all of them are
+# 8 bytes per item so every array stays aligned.
+_LAYOUT = (("xs", "d"), ("ys", "d"), ("ids", "q"), ("offsets", "q"),
+           ("targets", "q"))
+_ITEM_SIZE = 8
+
+
+def _lengths(vertices, edges):
+    """
+    Returns the number of items in each array of the layout (and of the
+    id_order a graph file adds to it).
+    """
+    return {"xs": vertices, "ys": vertices, "ids": vertices,
+            "offsets": vertices + 1, "targets": edges, "id_order": vertices}
+
+
+def _open_shared_memory(name):
+    """
+    Attaches to an existing shared memory block without taking ownership.
+    """
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before 3.13 attaching registers the block with the resource tracker.
+    # Processes started by the owner share its tracker, so that's harmless.
+    return shared_memory.SharedMemory(name=name)
+
+
+class FlatGraph:
+    """
+    FlatGraph Class
+    ---------------
+
+    The graph as flat arrays. All queries take and return vertex indices.
+
+    Attributes:
+        * xs (array): The X position of every vertex.
+        * ys (array): The Y position of every vertex.
+        * offsets (array): Where each vertex's neighbours start in targets,
+                           there are n + 1 of these.
+        * targets (array): The neighbours of every vertex, back to back.
+        * ids (array): The Vertex.id of every vertex, to map back to the graph.
+        * id_order (array): Optional, the vertices in increasing order of id,
+                            saved in graph files so index() can bisect out
+                            of core whatever order the vertices are in.
+        * metric: How distances are measured (see metrics.py).
+        * out_of_core (bool): Whether the arrays are a file bigger than the
+                              memory. The queries then only keep what they
+                              have explored in memory, and read the file in
+                              order a layer at a time.
+    """
+
+    def __init__(self, xs, ys, offsets, targets, ids, metric=None,
+                 out_of_core=False, id_order=None):
+        """
+        Wraps the arrays, any indexable sequence of numbers will do.
+        :param metric: Optional, Euclidean if not given.
+        :param out_of_core: Optional, see out_of_core above.
+        :param id_order: Optional, see id_order above.
+        """
+        self.xs = xs
+        self.ys = ys
+        self.offsets = offsets
+        self.targets = targets
+        self.ids = ids
+        self.id_order = id_order
+        self.metric = EUCLIDEAN if metric is None else metric
+        self.out_of_core = out_of_core
+        self._index = None
+        # Out of core without an id_order, whether the ids are in order (so
+        # index() can bisect them directly).
+        self._ids_sorted = None
+        # Every vertex projected by the metric, made on the first query that
+        # needs them. Euclidean measures the arrays directly.
+        self._points = None
+        # Set when the arrays are views into a buffer (shared memory or a
+        # memory mapped file), which has to be closed with the graph.
+        self._owner = None
+        self._views = []
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Exports the graph into flat arrays.
+        :param graph: The graph to export.
+        :type graph: Graph
+        :return: The new FlatGraph.
+        """
+
+        with graph._lock:
+            vertices = list(graph._vertices)
+            position = {v.id: i for i, v in enumerate(vertices)}
+
+            xs = array("d", (v.x_pos for v in vertices))
+            ys = array("d", (v.y_pos for v in vertices))
+            ids = array("q", (v.id for v in vertices))
+            offsets = array("q", [0])
+            targets = array("q")
+            for v in vertices:
+                for e in v.edges:
+                    targets.append(position[graph.opposite(e, v).id])
+                offsets.append(len(targets))
+
+        return cls(xs, ys, offsets, targets, ids, metric=graph.metric)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getstate__(self):
+        if self._owner is not None:
+            raise TypeError("A FlatGraph viewing a buffer can't be pickled, "
+                            "send the SharedGraphInfo or the file path.")
+        # The id lookup and the points are rebuilt on demand, no need to
+        # send them.
+        state = dict(self.__dict__)
+        state["_index"] = None
+        state["_points"] = None
+        return state
+
+    ########################################
+    # Shared memory
+    ########################################
+
+    def to_shared_memory(self):
+        """
+        Copies the arrays into a new block of shared memory.
+
+        The returned SharedFlatGraph owns the block, close it (or use it as a
+        context manager) once every worker is done to free the memory.
+
+        :return: The SharedFlatGraph owning the block.
+        """
+
+        lengths = _lengths(len(self.xs), len(self.targets))
+        size = sum(lengths[field] for field, _ in _LAYOUT) * _ITEM_SIZE
+        shm = shared_memory.SharedMemory(create=True, size=size)
+
+        start = 0
+        for field, typecode in _LAYOUT:
+            data = array(typecode, getattr(self, field)).tobytes()
+            shm.buf[start:start + len(data)] = data
+            start += lengths[field] * _ITEM_SIZE
+
+        info = SharedGraphInfo(shm.name, len(self.xs), len(self.targets),
+                               None if self.metric == EUCLIDEAN
+                               else self.metric)
+        return SharedFlatGraph(shm, info)
+
+    @classmethod
+    def attach(cls, info):
+        """
+        Attaches to a graph placed in shared memory by to_shared_memory().
+        The arrays are read only views of the shared block, nothing is copied.
+
+        :param info: The SharedGraphInfo of the block.
+        :type info: SharedGraphInfo
+        :return: The FlatGraph, close() it when done.
+        """
+        shm = _open_shared_memory(info.name)
+        return cls._from_buffer(shm, shm.buf, info.vertices, info.edges,
+                                metric=info.metric)
+
+    @classmethod
+    def _from_buffer(cls, owner, buf, vertices, edges, start=0, metric=None,
+                     out_of_core=False, layout=_LAYOUT):
+        """
+        Builds the FlatGraph out of read only views into a buffer laid out
+        as in _LAYOUT (or the given layout).
+        :param owner: The object to close() once the views are released.
+        :param buf: The buffer holding the arrays.
+        :param vertices: The number of vertices.
+        :param edges: The number of items in targets.
+        :param start: Where the first array starts in the buffer.
+        :param metric: Optional, Euclidean if not given.
+        :param out_of_core: Optional, whether the buffer is bigger than the
+                            memory.
+        :param layout: Optional, the (field, typecode) of every array.
+        """
+
+        buf = memoryview(buf).toreadonly()
+        views = [buf]
+        arrays = {}
+        lengths = _lengths(vertices, edges)
+
+        for field, typecode in layout:
+            end = start + lengths[field] * _ITEM_SIZE
+            raw = buf[start:end]
+            arrays[field] = raw.cast(typecode)
+            views.extend((raw, arrays[field]))
+            start = end
+
+        flat = cls(metric=metric, out_of_core=out_of_core, **arrays)
+        flat._owner = owner
+        flat._views = views
+        return flat
+
+    def close(self):
+        """
+        Lets go of the shared memory block or file, if the arrays live in
+        one. The graph can't be used after this.
+        """
+
+        if self._owner is None:
+            return
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self.xs = self.ys = self.ids = self.offsets = self.targets = None
+        self.id_order = None
+        self._points = None
+        self._owner.close()
+        self._owner = None
+
+    def index(self, vertex_id):
+        """
+        Returns the index of the vertex with the given Vertex.id.
+        """
+
+        if self.out_of_core:
+            return self._find_index(vertex_id)
+        if self._index is None:
+            self._index = {vertex_id: i for i, vertex_id in enumerate(self.ids)}
+        return self._index[vertex_id]
+
+    def _find_index(self, vertex_id):
+        """
+        Finds an index without a lookup table of every id. Graph files keep
+        the vertices in order of id (id_order), so it bisects through that.
+        Without one it bisects the ids if they are in order, and scans them
+        otherwise.
+        """
+
+        ids = self.ids
+        order = self.id_order
+        if order is None:
+            if self._ids_sorted is None:
+                self._ids_sorted = all(ids[k] < ids[k + 1]
+                                       for k in range(len(ids) - 1))
+            if self._ids_sorted:
+                order = range(len(ids))
+        if order is not None:
+            k = bisect.bisect_left(order, vertex_id, key=ids.__getitem__)
+            if k < len(order) and ids[order[k]] == vertex_id:
+                return order[k]
+        else:
+            for i, other in enumerate(ids):
+                if other == vertex_id:
+                    return i
+        raise KeyError(vertex_id)
+
+    def neighbours(self, i):
+        """
+        Returns the indices of the vertices next to vertex i.
+        """
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def _projected(self):
+        """
+        Returns the LIST of every vertex projected by the metric, projecting
+        them all the first time.
+        """
+
+        if self._points is None:
+            project = self.metric.project
+            self._points = [project(x, y) for x, y in zip(self.xs, self.ys)]
+        return self._points
+
+    def _point(self, i):
+        """
+        Returns vertex i projected by the metric. Out of core it is projected
+        every time, rather than keeping every vertex projected.
+        """
+
+        if self.out_of_core:
+            return self.metric.project(self.xs[i], self.ys[i])
+        return self._projected()[i]
+
+    def distance(self, i, j):
+        """
+        The distance between vertex i and j, measured by the metric.
+        """
+        if self.metric == EUCLIDEAN:
+            return math.sqrt(((self.xs[j] - self.xs[i])**2) +
+                             ((self.ys[j] - self.ys[i])**2))
+        return self.metric.kernel(self._point(i), self._point(j))
+
+    def _dist_from(self, b):
+        """
+        Returns a function giving the distance of a vertex from vertex b.
+        """
+
+        if self.metric != EUCLIDEAN:
+            point, kernel = self._point, self.metric.kernel
+            p = point(b)
+
+            def dist(i):
+                return kernel(p, point(i))
+
+            return dist
+
+        xs, ys = self.xs, self.ys
+        bx, by = xs[b], ys[b]
+
+        def dist(i):
+            return math.sqrt(((xs[i] - bx)**2) + ((ys[i] - by)**2))
+
+        return dist
+
+    def find_emergency_range(self, v):
+        """
+        Returns the distance to the vertex furthest from vertex v.
+        """
+        return search.farthest(range(len(self)), self._dist_from(v))
+
+    def find_path(self, b, s, r):
+        """
+        Returns the LIST of indices on a minimum hop path from b to s that
+        stays within range r of b, or None if there is no such path.
+        """
+        return search.bfs_path(b, s, r, self.neighbours, self._dist_from(b),
+                               in_order=self.out_of_core)
+
+    def minimum_range(self, b, s):
+        """
+        Returns the minimum range required to go from b to s, or None if s
+        can't be reached.
+        """
+        if self.out_of_core:
+            return search.threshold_range(b, s, self.neighbours,
+                                          self._dist_from(b))
+        return search.minimum_range(b, s, self.neighbours, self._dist_from(b))
+
+    def minimum_ranges(self, b, stations):
+        """
+        Returns the minimum range required to go from b to each station, all
+        from the one sweep. Stops as soon as every station has been reached.
+
+        :param b: The index to start from.
+        :param stations: The indices of the stations.
+        :return: An array of the ranges, in the order of stations, with inf
+                 for the stations that can't be reached.
+        """
+
+        wanted = {}
+        for j, s in enumerate(stations):
+            wanted.setdefault(s, []).append(j)
+
+        result = array("d", [math.inf]) * len(stations)
+        remaining = len(wanted)
+        if remaining == 0:
+            return result
+
+        for u, key in search.bottleneck_sweep(b, self.neighbours,
+                                              self._dist_from(b)):
+            if u in wanted:
+                for j in wanted[u]:
+                    result[j] = key
+                remaining -= 1
+                if remaining == 0:
+                    break
+        return result
+
+
+class SharedFlatGraph:
+    """
+    SharedFlatGraph Class
+    ---------------------
+
+    Owns a block of shared memory holding a FlatGraph. Hand the info to the
+    worker processes, they attach with FlatGraph.attach(info).
+
+    Attributes:
+        * info (SharedGraphInfo): What the workers need to attach.
+        * graph (FlatGraph): This process's view of the shared graph.
+    """
+
+    def __init__(self, shm, info):
+        self._shm = shm
+        self.info = info
+        self.graph = FlatGraph._from_buffer(shm, shm.buf, info.vertices,
+                                            info.edges, metric=info.metric)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Frees the shared memory block. Workers should have closed their
+        views first.
+        """
+
+        if self._shm is None:
+            return
+        self.graph.close()
+        self._shm.unlink()
+        self._shm = None
@@ -9,10 +9,71 @@ This is going to be the main file that you are modifying. :)
 Usage:
     Contains the graph, requires the connection to vertices and edges.
 """
+import contextlib
+import heapq
 import math
+import threading
+from collections import namedtuple
 
 from vertex import Vertex
 from edge import Edge
+from snapshot import GraphSnapshot, _Layer
+from flatgraph import FlatGraph
+import graphfile
+import ordering
+import search
+from instrumentation import Probe, Trace, instrumented
+from rangetable import RangeTable
+from coveragecurve import CoverageCurve
+from watches import PathWatch, RangeWatch
+from spatial import GridIndex, SphereIndex
+from hull import ConvexLayers
+from metrics import EUCLIDEAN
+from kinetic import KineticView
+from scratch import PATH_FORMS, LazyPath, Scratch
+
+
+# What find_path_progressive() yields: the vertices first reached in hops
+# hops from b, and on the last one (done) the path find_path() would return.
+Frontier = namedtuple("Frontier", ["hops", "vertices", "done", "path"])
+
+# How many sets of scratch arrays each thread keeps for searches running at
+# the same time (e.g. while a find_path_progressive() is paused).
+SCRATCH_POOL_SIZE = 4
+
+
+def _euclidean(u, v):
+    """
+    Returns the Euclidean distance between vertex u and v.
+    """
+
+    # Euclidean Distance
+    # sqrt( (x2-x1)^2 + (y2-y1)^2 )
+    return math.sqrt(((v.x_pos - u.x_pos)**2) + ((v.y_pos - u.y_pos)**2))
+
+
+class _OrOnTheClass:
+    """
+    Wraps a Graph method so that, looked up on the Graph class itself
+    instead of a graph, it is a plain function. Graph.distance(u, v) was a
+    static method before graphs had a metric, and still works that way.
+    """
+
+    def __init__(self, function):
+        self._function = function
+
+    def __call__(self, method):
+        self._method = method
+        self.__doc__ = method.__doc__
+        return self
+
+    def __get__(self, graph, owner=None):
+        if graph is None:
+            return self._function
+        # Kept on the graph, so later lookups don't come through here.
+        bound = self._method.__get__(graph, owner)
+        graph.__dict__[self._method.__name__] = bound
+        return bound
 
 
 # Define a "edge already exists" exception
@@ -33,13 +94,240 @@ class Graph:
 
     Attributes:
         * vertices (list): The list of vertices
+        * version (int): Goes up by one every time the graph changes.
+        * travel_distance (float): In proximity mode, the distance within
+                                   which stations get an edge. None otherwise.
+        * metric: How distances are measured (see metrics.py).
     """
 
-    def __init__(self):
+    def __init__(self, travel_distance=None, metric=None):
         """
         Initialises an empty graph
+
+        :param travel_distance: Optional, turns on proximity mode: every pair
+                                of stations within this distance of each
+                                other gets an edge automatically, kept up to
+                                date as stations are inserted and moved.
+        :param metric: Optional, how distances are measured (see metrics.py).
+                       Planar Euclidean if not given.
         """
         self._vertices = []
+        self._by_id = {}
+        self._next_id = 0
+        self.version = 0
+
+        # Writers hold the lock, readers should query a snapshot instead.
+        self._lock = threading.RLock()
+        self._snapshot = None
+        # The ids changed since the last snapshot. None until the first
+        # snapshot is taken, so nobody pays for it unless they use them.
+        self._dirty_coords = None
+        self._dirty_adj = None
+
+        # Only set while instrumentation is on, see instrument().
+        self._probe = None
+
+        # Told about every change, e.g. the RangeTables kept up to date.
+        self._observers = []
+
+        # Every station's position projected by the metric, worked out once
+        # per move. Planar positions need no projecting, so no cache.
+        self.metric = EUCLIDEAN if metric is None else metric
+        self._points = None if self.metric == EUCLIDEAN else {}
+
+        # The grid finds the stations near a position. In proximity mode its
+        # cells are as wide as the travel distance. It holds the projected
+        # points if the metric is planar on them, the positions otherwise
+        # (and is then only used to find a taken spot).
+        self.travel_distance = travel_distance
+        self._grid = GridIndex(travel_distance if self.metric.planar
+                               else None)
+        # A spherical metric finds the stations near a position with a grid
+        # on every face of a cube around the sphere instead.
+        self._sphere = SphereIndex() if self.metric.spherical else None
+        # The convex layers for the furthest station queries, only made (and
+        # kept up to date) once somebody asks one.
+        self._hull = None
+
+        # Vertex id to (vx, vy, ax, ay), only for the stations that drift.
+        self._motion = {}
+
+        # Every thread's search state, kept between searches so a search
+        # only pays for what it explores (see scratch.py).
+        self._scratch = threading.local()
+
+    def _touch(self, coords=(), adj=()):
+        """
+        Records that the graph changed. Must be called holding the lock.
+        :param coords: The ids of the vertices whose position changed.
+        :param adj: The ids of the vertices whose edges changed.
+        """
+
+        self.version += 1
+        if self._dirty_coords is not None:
+            self._dirty_coords.update(coords)
+            self._dirty_adj.update(adj)
+
+    def _notify(self, event, *args):
+        """
+        Tells the observers about a change. Must be called holding the lock,
+        once the change has been made.
+        :param event: The observer method to call, one of vertex_inserted,
+                      edge_inserted, edge_removed, vertex_removed,
+                      vertex_moved, change_started or change_finished.
+        """
+
+        for observer in list(self._observers):
+            getattr(observer, event)(*args)
+
+    @contextlib.contextmanager
+    def _one_change(self):
+        """
+        Tells the observers that the events sent inside make up one change
+        (e.g. a move in proximity mode unlinks, moves and links again), so
+        they can wait for the end before running their queries again. Must
+        be called holding the lock.
+        """
+
+        self._notify("change_started")
+        try:
+            yield
+        finally:
+            self._notify("change_finished")
+
+    def _point(self, v):
+        """
+        Returns the position of v projected by the metric.
+        """
+
+        if self._points is None:
+            return v.x_pos, v.y_pos
+        p = self._points.get(v.id)
+        if p is None:
+            p = self.metric.project(v.x_pos, v.y_pos)
+        return p
+
+    def _index_point(self, x_pos, y_pos):
+        """
+        Returns where a position goes in the spatial indexes.
+        """
+
+        if self.metric.planar:
+            return self.metric.project(x_pos, y_pos)
+        return x_pos, y_pos
+
+    def _index_insert(self, v):
+        """
+        Adds v to the spatial indexes. Must be called holding the lock.
+        """
+
+        if self._points is not None:
+            self._points[v.id] = self.metric.project(v.x_pos, v.y_pos)
+        x, y = self._index_point(v.x_pos, v.y_pos)
+        self._grid.insert(v.id, x, y)
+        if self._sphere is not None:
+            self._sphere.insert(v.id, self._points[v.id])
+        if self._hull is not None:
+            self._hull.insert(v.id, x, y)
+
+    def _index_move(self, v):
+        """
+        Tells the spatial indexes v has moved. Must be called holding the
+        lock.
+        """
+
+        if self._points is not None:
+            self._points[v.id] = self.metric.project(v.x_pos, v.y_pos)
+        x, y = self._index_point(v.x_pos, v.y_pos)
+        self._grid.move(v.id, x, y)
+        if self._sphere is not None:
+            self._sphere.move(v.id, self._points[v.id])
+        if self._hull is not None:
+            self._hull.move(v.id, x, y)
+
+    def _index_remove(self, v):
+        """
+        Takes v out of the spatial indexes. Must be called holding the lock,
+        after the observers have been told (they may still measure it).
+        """
+
+        self._grid.remove(v.id)
+        if self._sphere is not None:
+            self._sphere.remove(v.id)
+        if self._hull is not None:
+            self._hull.remove(v.id)
+        if self._points is not None:
+            self._points.pop(v.id, None)
+
+    def _ids_within(self, x_pos, y_pos, r):
+        """
+        Returns the ids of the stations within r of a position. Uses the grid
+        if the metric is planar, the sphere's grids if it is spherical (then
+        measuring the few they find), and measures every station otherwise.
+        """
+
+        if self.metric.planar:
+            x, y = self._index_point(x_pos, y_pos)
+            return self._grid.within(x, y, r)
+        p = self.metric.project(x_pos, y_pos)
+        kernel = self.metric.kernel
+        if self._sphere is not None:
+            # A hair of slack on the chord, the arc decides.
+            points = self._points
+            c = self.metric.chord(r) * (1 + 1e-9) + 1e-12
+            return [i for i in self._sphere.within(p, c)
+                    if kernel(points[i], p) <= r]
+        return [u.id for u in self._vertices if kernel(self._point(u), p) <= r]
+
+    def _neighbour_ids(self, i):
+        """
+        Returns the ids of the vertices next to the vertex with id i.
+        """
+
+        v = self._by_id[i]
+        return [self.opposite(e, v).id for e in v.edges]
+
+    ########################################
+    # Instrumentation
+    ########################################
+
+    def instrument(self, enabled=True):
+        """
+        Turns the counters of the queries on or off (see instrumentation.py).
+        Turning them on again starts the totals from zero.
+        :param enabled: Whether to count.
+        :return: The Probe collecting the counters, or None.
+        """
+
+        self._probe = Probe() if enabled else None
+        return self._probe
+
+    @property
+    def stats(self):
+        """
+        The counters summed per operation since instrument() was called, as
+        a dict of operation name to Counters. Empty while it is off.
+        """
+        return {} if self._probe is None else dict(self._probe.totals)
+
+    def trace(self):
+        """
+        Returns a context manager capturing every query made inside it:
+
+            with G.trace() as trace:
+                G.minimum_range(b, s)
+            trace.records  # [QueryTrace(operation, args, counters)]
+
+        Instrumentation is turned on for the block if it was off.
+        """
+        return Trace(self)
+
+    def _counters(self):
+        """
+        The Counters of the operation running in this thread, or None when
+        instrumentation is off.
+        """
+        return None if self._probe is None else self._probe.active()
 
     def insert_vertex(self, x_pos, y_pos):
         """
@@ -55,7 +343,24 @@ class Graph:
         """
 
         v = Vertex(x_pos, y_pos)
-        self._vertices.append(v)
+        with self._lock:
+            v.id = self._next_id
+            self._next_id += 1
+            self._vertices.append(v)
+            self._by_id[v.id] = v
+            self._touch(coords=(v.id,), adj=(v.id,))
+            self._index_insert(v)
+            if self.travel_distance is None:
+                self._notify("vertex_inserted", v)
+                return v
+
+            # Connect it up with everything within travel distance.
+            with self._one_change():
+                self._notify("vertex_inserted", v)
+                near = self._ids_within(x_pos, y_pos, self.travel_distance)
+                for i in sorted(near):
+                    if i != v.id:
+                        self._link(v, self._by_id[i])
         return v
 
     def insert_edge(self, u, v):
@@ -76,16 +381,59 @@ class Graph:
 
         e = Edge(u, v)
 
-        # Check that the edge doesn't already exist
-        for i in u.edges:
-            if i == e:
-                # Edge already exists.
-                raise EdgeAlreadyExists("Edges already exist between vertex!")
+        with self._lock:
+            # Check that the edge doesn't already exist, under the lock so
+            # two writers can't both add it.
+            for i in u.edges:
+                if i == e:
+                    # Edge already exists.
+                    raise EdgeAlreadyExists(
+                        "Edges already exist between vertex!")
+
+            # Add the edge to both nodes.
+            u.add_edge(e)
+            v.add_edge(e)
+            self._touch(adj=(u.id, v.id))
+            self._notify("edge_inserted", u, v)
+
+    def _link(self, u, v):
+        """
+        Inserts the edge between u and v, which must not exist yet. Must be
+        called holding the lock.
+        """
 
-        # Add the edge to both nodes.
+        e = Edge(u, v)
         u.add_edge(e)
         v.add_edge(e)
+        self._touch(adj=(u.id, v.id))
+        self._notify("edge_inserted", u, v)
+
+    def _unlink(self, u, e):
+        """
+        Removes the edge e of u. Must be called holding the lock.
+        """
+
+        v = self.opposite(e, u)
+        self._drop(u.edges, e)
+        self._drop(v.edges, e)
+        self._touch(adj=(u.id, v.id))
+        self._notify("edge_removed", u, v)
+
+    @staticmethod
+    def _drop(items, x):
+        """
+        Removes x itself from the list. list.remove would take the first item
+        equal to it, and a vertex (or an edge) is equal to any other at the
+        same spot.
+        """
+
+        for k, y in enumerate(items):
+            if y is x:
+                del items[k]
+                return
+        raise ValueError("{} is not in the list".format(x))
 
+    @instrumented("remove_vertex")
     def remove_vertex(self, v):
         """
         Removes the vertex V from the graph.
@@ -93,32 +441,282 @@ class Graph:
         :type v: Vertex
         """
 
-        # Remove it from the list
-        del self._vertices[self._vertices.index(v)]
+        with self._lock:
+            # Remove it from the list
+            self._drop(self._vertices, v)
+            self._by_id.pop(v.id, None)
+            self._motion.pop(v.id, None)
+            changed = [v.id]
+            neighbours = []
+
+            # Go through and remove all edges from that node.
+            while len(v.edges) != 0:
+                e = v.edges.pop()
+                u = self.opposite(e, v)
+                self._drop(u.edges, e)
+                changed.append(u.id)
+                neighbours.append(u)
+
+            self._touch(coords=(v.id,), adj=changed)
+            self._notify("vertex_removed", v, neighbours)
+            self._index_remove(v)
+
+    def snapshot(self):
+        """
+        Returns an immutable snapshot of the graph as it is right now.
 
-        # Go through and remove all edges from that node.
-        while len(v.edges) != 0:
-            e = v.edges.pop()
-            u = self.opposite(e, v)
-            u.remove_edge(e)
+        Snapshots share everything that didn't change with the previous one,
+        so this costs as much as the number of vertices changed since the
+        last call (the very first call has to copy the whole graph).
 
-    @staticmethod
-    def distance(u, v):
+        :return: The GraphSnapshot of the current version.
+        """
+
+        with self._lock:
+            if self._dirty_coords is None:
+                coord_ids = adj_ids = list(self._by_id)
+                parent = None
+            else:
+                coord_ids = self._dirty_coords
+                adj_ids = self._dirty_adj
+                parent = self._snapshot._top
+
+            if self._snapshot is not None and not coord_ids and not adj_ids:
+                return self._snapshot
+
+            coords = {}
+            for i in coord_ids:
+                v = self._by_id.get(i)
+                coords[i] = None if v is None else \
+                    (v, v.x_pos, v.y_pos, self._point(v))
+
+            adj = {}
+            for i in adj_ids:
+                v = self._by_id.get(i)
+                adj[i] = None if v is None else \
+                    tuple(self.opposite(e, v).id for e in v.edges)
+
+            top = _Layer.stack(parent, coords, adj)
+            self._snapshot = GraphSnapshot(top, self.version,
+                                           len(self._vertices), self.metric)
+            self._dirty_coords = set()
+            self._dirty_adj = set()
+            return self._snapshot
+
+    def set_velocity(self, v, vx, vy, ax=0.0, ay=0.0):
+        """
+        Sets how v drifts, for the queries at a future time (see at()). It
+        doesn't move v, and moving v later starts it drifting from there.
+        :param v: The vertex.
+        :param vx: The X velocity.
+        :param vy: The Y velocity.
+        :param ax: Optional, the X acceleration.
+        :param ay: Optional, the Y acceleration.
+        """
+
+        with self._lock:
+            if v.id not in self._by_id:
+                raise ValueError("Vertex {} is not in the graph!".format(v))
+            if vx == vy == ax == ay == 0:
+                self._motion.pop(v.id, None)
+            else:
+                self._motion[v.id] = (vx, vy, ax, ay)
+            self._touch()
+
+    def velocity(self, v):
+        """
+        Returns the (vx, vy, ax, ay) v drifts with, all 0 if it doesn't.
+        """
+        return self._motion.get(v.id, (0.0, 0.0, 0.0, 0.0))
+
+    def at(self, t):
+        """
+        Returns a read only KineticView of the graph as it will be t time
+        units from now, with every station drifted by its velocity (see
+        kinetic.py). Nothing on the graph moves. The view can also certify
+        how long its answers hold.
+
+        :param t: The time, from now.
+        :return: The KineticView.
+        """
+
+        with self._lock:
+            return KineticView(self.snapshot(), dict(self._motion), t,
+                               self.metric)
+
+    def range_table(self, b):
+        """
+        Returns a table of minimum_range(b, s) for every station s, which is
+        kept up to date as the graph changes (see rangetable.py). Only the
+        part of the table a change can affect is computed again.
+
+        :param b: The base station.
+        :return: The RangeTable, close() it when it is no longer needed.
+        """
+        return RangeTable(self, b)
+
+    def watch_path(self, b, s, r, callback):
+        """
+        Watches find_path(b, s, r), calling callback(old_path, new_path)
+        whenever a change to the graph changes the answer (see watches.py).
+        Changes that can't affect it are ruled out without searching.
+
+        Callbacks are made while the graph is being changed, so they mustn't
+        change the graph themselves.
+
+        :param b: Vertex B to start from.
+        :param s: Vertex S to finish at.
+        :param r: The maximum range of the radio.
+        :param callback: Called with the old and the new path.
+        :return: The PathWatch, cancel() it to stop watching.
+        """
+        return PathWatch(self, b, s, r, callback)
+
+    def watch_range(self, b, s, callback):
+        """
+        Watches minimum_range(b, s), calling callback(old_range, new_range)
+        whenever a change to the graph changes it (see watches.py).
+
+        :param b: Vertex B to start from.
+        :param s: Vertex S to finish at.
+        :param callback: Called with the old and the new range.
+        :return: The RangeWatch, cancel() it to stop watching.
+        """
+        return RangeWatch(self, b, s, callback)
+
+    def reorder(self, strategy="hilbert"):
+        """
+        Puts the stations in an order where stations near each other come
+        near each other (see ordering.py), and every station's edges in that
+        order too. Searches then go through the stations in runs, most of
+        all on the FlatGraph, graph file and shards made from the graph,
+        which are laid out in this order.
+
+        The ids don't change, only the order of the vertices and of their
+        edges, so find_path may pick another of the paths with the fewest
+        hops.
+
+        :param strategy: "hilbert" (along a Hilbert curve over the map),
+                         "bfs" (breadth first) or "rcm" (reverse
+                         Cuthill-McKee).
+        """
+
+        if strategy not in ordering.STRATEGIES:
+            raise ValueError("Unknown strategy {!r}, expected one of {}."
+                             .format(strategy, ", ".join(ordering.STRATEGIES)))
+
+        with self._lock:
+            vertices = self._vertices
+            if strategy == "hilbert":
+                order = ordering.hilbert_order(
+                    [self._index_point(v.x_pos, v.y_pos) for v in vertices])
+            else:
+                position = {v.id: k for k, v in enumerate(vertices)}
+
+                def neighbours(k):
+                    v = vertices[k]
+                    return [position[self.opposite(e, v).id] for e in v.edges]
+
+                make = ordering.bfs_order if strategy == "bfs" \
+                    else ordering.rcm_order
+                order = make(len(vertices), neighbours)
+
+            self._vertices = [vertices[k] for k in order]
+            self._by_id = {v.id: v for v in self._vertices}
+            rank = {v.id: k for k, v in enumerate(self._vertices)}
+            for v in self._vertices:
+                v.edges.sort(key=lambda e: rank[self.opposite(e, v).id])
+            self._touch(adj=rank)
+
+    def save(self, path):
+        """
+        Saves the graph to a binary file (see graphfile.py for the layout).
+        :param path: Where to save it.
+        """
+        graphfile.write(FlatGraph.from_graph(self), path)
+
+    @classmethod
+    def load(cls, path, mmap=True, metric=None, out_of_core=False):
+        """
+        Loads a graph saved with save().
+
+        With mmap the file is memory mapped and returned as a read only
+        FlatGraph, which is near instant whatever the size of the map, as
+        nothing is read until a query needs it. Without mmap a normal Graph
+        is built, keeping the ids the vertices were saved with.
+
+        :param path: The file to load.
+        :param mmap: Whether to memory map the file.
+        :param metric: Optional, how distances are measured (see metrics.py).
+                       The file only holds the positions, so a graph saved
+                       with a metric has to be given it again.
+        :param out_of_core: Optional, for files bigger than the memory (needs
+                            mmap). The FlatGraph's queries then only keep
+                            what they explored in memory.
+        :return: The FlatGraph (mmap) or the Graph.
+        """
+
+        flat = graphfile.read(path, mmap=mmap, metric=metric,
+                              out_of_core=out_of_core)
+        if mmap:
+            return flat
+
+        G = cls(metric=metric)
+        vertices = []
+        for x, y, i in zip(flat.xs, flat.ys, flat.ids):
+            v = Vertex(x, y)
+            v.id = i
+            vertices.append(v)
+            G._by_id[i] = v
+            G._index_insert(v)
+        G._vertices = vertices
+        G._next_id = max(flat.ids, default=-1) + 1
+
+        # Every edge is stored from both ends, only build it from the first.
+        # The file can be trusted, so skip insert_edge's duplicate check.
+        offsets, targets = flat.offsets, flat.targets
+        for i, u in enumerate(vertices):
+            for k in range(offsets[i], offsets[i + 1]):
+                j = targets[k]
+                if i < j:
+                    e = Edge(u, vertices[j])
+                    u.add_edge(e)
+                    vertices[j].add_edge(e)
+        return G
+
+    @_OrOnTheClass(_euclidean)
+    def distance(self, u, v):
         """
         Get the distance between vertex u and v.
 
+        Called on the class, Graph.distance(u, v), it is always the Euclidean
+        distance, as before graphs had a metric.
+
         :param u: A vertex to get the distance between.
         :param v: A vertex to get the distance between.
 
         :type u: Vertex
         :type v: Vertex
-        :return: The Euclidean distance between two vertices.
+        :return: The distance between two vertices, measured by the metric
+                 (Euclidean unless the graph was given another).
         """
 
-        # Euclidean Distance
-        # sqrt( (x2-x1)^2 + (y2-y1)^2 )
+        if self._points is None:
+            # Inline rather than calling _euclidean, this is measured a lot.
+            return math.sqrt(((v.x_pos - u.x_pos)**2) +
+                             ((v.y_pos - u.y_pos)**2))
+        return self.metric.kernel(self._point(u), self._point(v))
+
+    def _distance_to(self, u, x_pos, y_pos):
+        """
+        Returns the distance from vertex u to a position, e.g. where a
+        station used to be.
+        """
 
-        return math.sqrt(((v.x_pos - u.x_pos)**2) + ((v.y_pos - u.y_pos)**2))
+        if self._points is None:
+            return math.sqrt(((x_pos - u.x_pos)**2) + ((y_pos - u.y_pos)**2))
+        return self.metric.kernel(self._point(u),
+                                  self.metric.project(x_pos, y_pos))
 
     @staticmethod
     def opposite(e, v):
@@ -142,51 +740,138 @@ class Graph:
     # Implement the functions below
     ##############################################
 
-    def find_emergency_range(self, v):
+    @instrumented("find_emergency_range")
+    def find_emergency_range(self, v, witness=False):
         """
         Returns the distance to the vertex W that is furthest from V.oooooo
         :param v: The vertex to start at.
-        :return: The distance of the vertex W furthest away from V.
+        :param witness: Whether to return W as well.
+        :return: The distance of the vertex W furthest away from V, or the
+                 (distance, W) pair with witness.
         """
 
-        # Easy way, loop through all the vertices, work out the distances
-        # and keep the maximum..
-        # However, this is not the best way!
-        max = 0
-        for u in self._vertices:
-            d = self.distance(v, u)
-            if d > max:
-                max = d
-        return max
+        # The furthest vertex is always a corner of the convex hull, so only
+        # those get measured (see hull.py).
+        found = self._farthest(v, 1, None)
+        d, w = found[0] if found else (0, None)
+        return (d, w) if witness else d
+
+    @instrumented("farthest_stations")
+    def farthest_stations(self, v, k):
+        """
+        Returns the k stations furthest from V, using the convex layers of
+        the map rather than measuring the distance to every station.
+        :param v: The vertex to start at (it is left out of the answer).
+        :param k: How many stations to return, fewer if there aren't enough.
+        :return: The LIST of (distance, VERTEX) pairs, furthest first.
+        """
+        return self._farthest(v, k, v.id)
+
+    def _farthest(self, v, k, skip):
+        with self._lock:
+            if not self.metric.planar:
+                # The layers only work on a plane, measure everything.
+                found = heapq.nlargest(k, ((self.distance(v, u), u.id)
+                                           for u in self._vertices
+                                           if u.id != skip))
+                measured = len(self._vertices) - (skip is not None)
+            else:
+                if self._hull is None:
+                    self._hull = ConvexLayers()
+                    for u in self._vertices:
+                        self._hull.insert(u.id, *self._point(u))
+                found = self._hull.farthest(*self._point(v), k, skip)
+                measured = self._hull.last_measured
+
+        counters = self._counters()
+        if counters is not None:
+            counters.distance_evals += measured
+        return [(d, self._by_id[i]) for d, i in found]
 
     ########################################
     # DFS
     ########################################
 
-    def _DFS_visit(self, visited, parent, start, u, r):
+    @contextlib.contextmanager
+    def _scratch_arrays(self):
+        """
+        Hands out a Scratch from this thread's pool for one search, with a
+        new epoch, and puts it back when the search is done. A search started
+        inside another (e.g. from a callback, or while a progressive search
+        is paused) gets another set, made only if the pool is empty.
+        """
+
+        pool = getattr(self._scratch, "pool", None)
+        if pool is None:
+            pool = self._scratch.pool = []
+        scratch = pool.pop() if pool else Scratch()
+        scratch.busy = True
+        scratch.begin(self._next_id)
+        try:
+            yield scratch
+        finally:
+            scratch.busy = False
+            if len(pool) < SCRATCH_POOL_SIZE:
+                pool.append(scratch)
+
+    def _trace(self, scratch, b, s, form="vertices"):
+        """
+        Reads the path from b to s off the parents in the scratch arrays.
+        :param form: "vertices", "ids" or "lazy", see find_path().
+        :return: The path in that form, or None if s wasn't reached.
+        """
+
+        walked = scratch.walk(b.id, s.id)
+        if walked is None:
+            # We've reached the end, and we didn't find the node
+            # Therefore it's an invalid path
+            return None
+        hops, first = walked
+        if form == "lazy":
+            return LazyPath(scratch, self._by_id, b.id, s.id, hops, first)
+        ids = scratch.path_ids(b.id, s.id, hops)
+        if form == "ids":
+            return ids
+        return list(map(self._by_id.__getitem__, ids))
+
+    def _DFS_visit(self, scratch, start, u, r):
         """
         Visit the nodes
-        :param visited: The set of visited nodes
-        :param parent: The parents of nodes
+        :param scratch: The search state (see scratch.py)
         :param start: The starting node
         :param u: The current node being visited
         :param r: The range
         """
-        visited.append(u)
+        epoch = scratch.epoch
+        scratch.visited[u.id] = epoch
+
+        counters = self._counters()
+        if counters is not None:
+            counters.vertices_expanded += 1
+            counters.edges_relaxed += len(u.edges)
 
         for e in u.edges:
             v = self.opposite(e, u)
-            if v not in visited:
-                parent[v] = u
-                if self.distance(start, v) <= r:
-                    self._DFS_visit(visited, parent, start, v, r)
-
-    def _DFS_path(self, b, s, r):
+            i = v.id
+            if scratch.visited[i] != epoch:
+                scratch.parent[i] = u.id
+                scratch.parent_stamp[i] = epoch
+                # Every distance is only measured once per search.
+                if scratch.distance_stamp[i] != epoch:
+                    scratch.distance[i] = self.distance(start, v)
+                    scratch.distance_stamp[i] = epoch
+                    if counters is not None:
+                        counters.distance_evals += 1
+                if scratch.distance[i] <= r:
+                    self._DFS_visit(scratch, start, v, r)
+
+    def _DFS_path(self, b, s, r, form="vertices"):
         """
         Perform a DFS to find the path
         :param b: The start node
         :param s: The destination
         :param r: The range to stay within
+        :param form: The form of the path, see find_path()
 
         :type b: Vertex
         :type s: Vertex
@@ -194,88 +879,127 @@ class Graph:
         :return: The path of nodes
         """
 
-        visited = []
-        parent = {x: None for x in self._vertices}
+        with self._scratch_arrays() as scratch:
+            # Start the DFS from this node, we know it's connected so we'll
+            # get to every node we need to visit.
+            self._DFS_visit(scratch, b, b, r)
 
-        # Start the DFS from this node, we know it's connected so we'll get
-        # to every node we need to visit.
-        self._DFS_visit(visited, parent, b, b, r)
-
-        # now find the path by backtracing
-        c = s
-        path = []
-        while c != b:
-            path.append(c)
-            c = parent[c]
-            if c is None:
-                # We've reached the end, and we didn't find the node
-                # Therefore it's an invalid path
-                return None
-        if c not in path:
-            path.append(c)
-        path.reverse()
-        return path
+            # now find the path by backtracing
+            return self._trace(scratch, b, s, form)
 
     ########################################
     # BFS
     ########################################
 
-    def _BFS_path(self, b, s, r):
+    def _BFS_path(self, b, s, r, form="vertices"):
         """
         Do a BFS
         :param b: The start node.
         :param s: The node to reach
         :param r: The range to stay within.
+        :param form: The form of the path, see find_path().
         :return: The path of the nodes
         """
 
-        seen = []
-        layers = []
+        with self._scratch_arrays() as scratch:
+            return self._BFS_scratch(scratch, b, s, r, form)
+
+    def _BFS_scratch(self, scratch, b, s, r, form="vertices"):
+        """
+        Runs the BFS in _BFS_layers() to the end and reads off the path.
+        """
+
+        for _ in self._BFS_layers(scratch, b, s, r):
+            pass
+
+        # now find the path by backtracing
+        return self._trace(scratch, b, s, form)
+
+    def _BFS_layers(self, scratch, b, s, r, chunk=None):
+        """
+        The BFS itself, keeping what it has seen and the parents in the
+        scratch arrays, so it never touches the parts of the map it doesn't
+        explore. Leaves the path in the parents.
+
+        Yields (hops, LIST of vertices) for each layer as soon as it is
+        complete, starting with (0, [b]), or for every chunk vertices of a
+        layer if chunk is given. The lists are the search's own, read only.
+        """
+
+        epoch = scratch.epoch
+        seen, parent, parent_stamp = \
+            scratch.visited, scratch.parent, scratch.parent_stamp
         next = []
         current = [b]
-        parents = {x: None for x in self._vertices}
 
-        v = None
-        seen.append(b)
-        while len(current) != 0:
-            layers.append(current)
-
-            for current_node in current:
-                # Loop through the current node's connections
-                for current_edge in current_node.edges:
-                    # Get the correct node from the edge
-                    v = self.opposite(current_edge, current_node)
-                    if v not in seen:
-                        seen.append(v)
-                        if self.distance(b, v) <= r:
-                            next.append(v)
-                            parents[v] = current_node
-                    if v == s:
-                        break
-            # Sneaky hax
-            if v == s:
-                break
-
-            # Update the current and next
-            current = next
-            next = []
+        # Counted locally, only handed over if instrumentation is on.
+        expanded = relaxed = evals = 0
 
-        # now find the path by backtracing
-        c = s
-        path = []
-        while c != b:
-            path.append(c)
-            c = parents[c]
-            if c is None:
-                # We've reached the end, and we didn't find the node
-                # Therefore it's an invalid path
-                return None
-        if c not in path:
-            path.append(c)
-        path.reverse()
-        return path
-
-    def find_path(self, b, s, r):
+        # When the range takes in the whole map (the grid keeps a box around
+        # it), everything is admissible and nothing needs testing.
+        everything = self.metric.planar and \
+            self._grid.covers(*self._point(b), r)
+
+        v = None
+        seen[b.id] = epoch
+        hops = 0
+        try:
+            yield hops, current
+            while len(current) != 0:
+                hops += 1
+                # How much of the layer has been handed out so far.
+                sent = 0
+                limit = chunk or math.inf
+
+                for current_node in current:
+                    expanded += 1
+                    # Loop through the current node's connections
+                    for current_edge in current_node.edges:
+                        relaxed += 1
+                        # Get the correct node from the edge
+                        v = self.opposite(current_edge, current_node)
+                        i = v.id
+                        if seen[i] != epoch:
+                            seen[i] = epoch
+                            if everything:
+                                admissible = True
+                            else:
+                                evals += 1
+                                admissible = self.distance(b, v) <= r
+                            if admissible:
+                                next.append(v)
+                                parent[i] = current_node.id
+                                parent_stamp[i] = epoch
+                        if v == s:
+                            break
+                    while len(next) >= limit:
+                        yield hops, next[sent:limit]
+                        sent = limit
+                        limit += chunk
+
+                # The layer is done, hand out what's left of it.
+                if sent == 0 and next:
+                    yield hops, next
+                elif sent < len(next):
+                    yield hops, next[sent:]
+
+                # Sneaky hax
+                if v == s:
+                    break
+
+                # Update the current and next
+                current = next
+                next = []
+        finally:
+            counters = self._counters()
+            if counters is not None:
+                counters.bfs_calls += 1
+                counters.vertices_expanded += expanded
+                counters.edges_relaxed += relaxed
+                counters.distance_evals += evals
+
+    @instrumented("find_path")
+    def find_path(self, b, s, r, form="vertices"):
         """
         Find a path from vertex B to vertex S, such that the distance from B to
         every vertex in the path is within R.  If there is no path between B
@@ -284,42 +1008,323 @@ class Graph:
         :param b: Vertex B to start from.
         :param s: Vertex S to finish at.
         :param r: The maximum range of the radio.
-        :return: The LIST of the VERTICES in the path.
+        :param form: "vertices" for the LIST of the VERTICES, "ids" for an
+                     array('l') of their ids, or "lazy" for a LazyPath that
+                     knows its length and first hop without building the
+                     path (see scratch.py).
+        :return: The path in that form.
         """
+        self._check_form(form)
         if b == s:
-            return [b]
-        p = self._BFS_path(b, s, r)
+            if form == "vertices":
+                return [b]
+            with self._scratch_arrays() as scratch:
+                return self._trace(scratch, b, b, form)
+        p = self._BFS_path(b, s, r, form)
         # p = self._DFS_path(b, s, r)
         return p
 
+    @staticmethod
+    def _check_form(form):
+        """
+        Raises ValueError if form isn't one of the forms of a path.
+        """
+        if form not in PATH_FORMS:
+            raise ValueError("Unknown path form {!r}, expected one of "
+                             "{}.".format(form, ", ".join(PATH_FORMS)))
+
+    def find_path_progressive(self, b, s, r, chunk=None, form="vertices"):
+        """
+        find_path() as a generator, so the reachable frontier can be shown
+        growing while the path is found. Yields a Frontier(hops, vertices,
+        done, path) for every layer of the BFS as soon as it is complete (or
+        every chunk vertices of one), then a last Frontier with done set and
+        the path find_path() would return. Stop iterating to stop the search.
+
+        While it's suspended the search holds this thread's scratch arrays,
+        searches made on the thread in the meantime get fresh ones.
+
+        :param b: Vertex B to start from.
+        :param s: Vertex S to finish at.
+        :param r: The maximum range of the radio.
+        :param chunk: Hand out at most this many vertices at a time, or None
+                      for whole layers.
+        :param form: The form of the path, see find_path().
+        :return: The generator of Frontier.
+        """
+
+        self._check_form(form)
+        if chunk is not None and chunk < 1:
+            raise ValueError("The chunk size must be at least 1, got "
+                             "{}.".format(chunk))
+        return self._progressive(b, s, r, chunk, form)
+
+    def _progressive(self, b, s, r, chunk, form):
+        """
+        The generator behind find_path_progressive().
+        """
+
+        with self._scratch_arrays() as scratch:
+            hops = 0
+            if b == s:
+                yield Frontier(hops, [b], False, None)
+            else:
+                for hops, vertices in self._BFS_layers(scratch, b, s, r,
+                                                       chunk):
+                    yield Frontier(hops, vertices, False, None)
+            path = self._trace(scratch, b, s, form)
+        yield Frontier(hops, [], True, path)
+
+    def _searchable(self, b):
+        """
+        Returns the neighbours and dist callables for the search module,
+        working on vertex ids (a vertex's hash follows its position).
+        :param b: The base station the distances are measured from.
+        """
+
+        by_id = self._by_id
+
+        def dist(i):
+            return self.distance(b, by_id[i])
+
+        return self._neighbour_ids, dist
+
+    @instrumented("minimum_range")
     def minimum_range(self, b, s):
         """
         Returns the minimum range required to go from Vertex B to Vertex S.
         :param b: Vertex B to start from.
         :param s: Vertex S to finish at.
-        :return: The minimum range in the path to go from B to S.
+        :return: The minimum range in the path to go from B to S, or None if
+                 S can't be reached at all.
         """
 
-        # Get the maximum distance, so we know where to start the range.
-        path_range = self.find_emergency_range(b) + 0.1
+        # Sweep out from B in increasing order of range, S comes out with
+        # the exact answer.
+        neighbours, dist = self._searchable(b)
+        return search.minimum_range(b.id, s.id, neighbours, dist,
+                                    self._counters())
+
+    @instrumented("minimum_range_path")
+    def minimum_range_path(self, b, s):
+        """
+        Returns the minimum range required to go from Vertex B to Vertex S,
+        together with the path with the fewest hops that stays within it.
+        :param b: Vertex B to start from.
+        :param s: Vertex S to finish at.
+        :return: The (range, LIST of VERTICES) pair, or (None, None) if S
+                 can't be reached at all.
+        """
 
-        current_path = self.find_path(b, s, path_range)
-        result_path = None
+        neighbours, dist = self._searchable(b)
+        r, path = search.minimum_range_path(b.id, s.id, neighbours, dist,
+                                            self._counters())
+        if path is None:
+            return None, None
+        return r, [self._by_id[i] for i in path]
 
-        # Keep decreasing the range until we hit no path
-        while current_path is not None:
-            result_path = current_path
-            path_range = max([self.distance(b, i) for i in result_path]) - 0.01
-            if path_range <= 0:
-                break
-            current_path = self.find_path(b, s, path_range)
+    @instrumented("range_hop_frontier")
+    def range_hop_frontier(self, b, s):
+        """
+        Returns every trade off between range and hops worth making to go
+        from Vertex B to Vertex S, from the minimum range (with the fewest
+        hops it allows) up to the range that gives the fewest hops of all.
+        :param b: Vertex B to start from.
+        :param s: Vertex S to finish at.
+        :return: The LIST of (range, hops, LIST of VERTICES) tuples, in
+                 increasing order of range and decreasing order of hops.
+                 Empty if S can't be reached at all.
+        """
 
-        # Now that we have the shortest available path, return the distance
+        neighbours, dist = self._searchable(b)
+        frontier = search.range_hop_frontier(b.id, s.id, neighbours, dist,
+                                             self._counters())
+        return [(r, hops, [self._by_id[i] for i in path])
+                for r, hops, path in frontier]
 
-        res_dist = max([self.distance(b, v) for v in result_path])
+    @instrumented("coverage_curve")
+    def coverage_curve(self, b):
+        """
+        Returns how many stations can be reached from Vertex B for every
+        range, from one minimum range sweep out from B (see coveragecurve.py).
+        :param b: The base station.
+        :return: The CoverageCurve, curve(r) is the count for range r.
+        """
 
-        return res_dist
+        neighbours, dist = self._searchable(b)
+        ranges = [key for i, key in search.bottleneck_sweep(
+            b.id, neighbours, dist, self._counters()) if i != b.id]
+        return CoverageCurve(b, ranges)
 
+    ########################################
+    # Nearby stations
+    ########################################
+
+    def _query_point(self, v_or_xy):
+        """
+        Returns the (x, y, id) of a vertex, or (x, y, None) of a position.
+        """
+
+        if isinstance(v_or_xy, Vertex):
+            return v_or_xy.x_pos, v_or_xy.y_pos, v_or_xy.id
+        x, y = v_or_xy
+        return x, y, None
+
+    @instrumented("stations_within")
+    def stations_within(self, v_or_xy, r):
+        """
+        Returns the stations within R of a vertex or a position, using the
+        grid instead of measuring the distance to every station.
+
+        :param v_or_xy: A vertex (which is left out of the answer) or an
+                        (x, y) position.
+        :param r: The range.
+        :return: The LIST of VERTICES within R, nearest first.
+        """
+
+        x, y, skip = self._query_point(v_or_xy)
+        with self._lock:
+            found = [(self._distance_to(u, x, y), u.id, u)
+                     for u in map(self._by_id.get,
+                                  self._ids_within(x, y, r))
+                     if u.id != skip]
+        found.sort(key=lambda t: t[:2])
+        return [u for _, _, u in found]
+
+    @instrumented("nearest_stations")
+    def nearest_stations(self, v_or_xy, k):
+        """
+        Returns the k stations nearest to a vertex or a position, searching
+        the grid outwards from it.
+
+        :param v_or_xy: A vertex (which is left out of the answer) or an
+                        (x, y) position.
+        :param k: How many stations to return, fewer if there aren't enough.
+        :return: The LIST of (distance, VERTEX) pairs, nearest first.
+        """
+
+        x, y, skip = self._query_point(v_or_xy)
+        with self._lock:
+            if not self.metric.planar:
+                found = heapq.nsmallest(k, ((self._distance_to(u, x, y), u.id)
+                                            for u in self._vertices
+                                            if u.id != skip))
+            else:
+                found = self._grid.nearest(*self._index_point(x, y), k, skip)
+            return [(d, self._by_id[i]) for d, i in found]
+
+    ########################################
+    # Shortest paths
+    ########################################
+
+    def _edge_length(self, i, j):
+        by_id = self._by_id
+        return self.distance(by_id[i], by_id[j])
+
+    @instrumented("find_shortest_path")
+    def find_shortest_path(self, b, s, r):
+        """
+        Find the path from vertex B to vertex S with the smallest total edge
+        length, such that every vertex in the path is within R of B. Uses A*
+        with the straight line distance to S as the estimate.
+
+        :param b: Vertex B to start from.
+        :param s: Vertex S to finish at.
+        :param r: The maximum range of the radio.
+        :return: The (length, LIST of VERTICES) pair, or (None, None) if there
+                 is no path within R.
+        """
+
+        neighbours, dist = self._searchable(b)
+
+        def estimate(i):
+            return self.distance(self._by_id[i], s)
+
+        found = search.shortest_paths(b.id, [s.id], r, neighbours, dist,
+                                      self._edge_length, estimate,
+                                      self._counters())
+        if s.id not in found:
+            return None, None
+        g, p = found[s.id]
+        return g, [self._by_id[i] for i in p]
+
+    @instrumented("find_shortest_paths")
+    def find_shortest_paths(self, b, targets, r):
+        """
+        Find the shortest paths (by total edge length) from vertex B to every
+        target at once, such that every vertex in them is within R of B.
+
+        :param b: Vertex B to start from.
+        :param targets: The VERTICES to reach.
+        :param r: The maximum range of the radio.
+        :return: The LIST of (length, LIST of VERTICES) pairs, one per target
+                 in the same order, (None, None) for the ones out of reach.
+        """
+
+        neighbours, dist = self._searchable(b)
+        found = search.shortest_paths(b.id, [t.id for t in targets], r,
+                                      neighbours, dist, self._edge_length,
+                                      counters=self._counters())
+        results = []
+        for t in targets:
+            if t.id in found:
+                g, p = found[t.id]
+                results.append((g, [self._by_id[i] for i in p]))
+            else:
+                results.append((None, None))
+        return results
+
+    ########################################
+    # Several base stations
+    ########################################
+
+    def _pair_distance(self, a, u):
+        by_id = self._by_id
+        return self.distance(by_id[a], by_id[u])
+
+    @instrumented("find_path_from_bases")
+    def find_path_from_bases(self, bases, s, r):
+        """
+        Find the path with the fewest hops from whichever of the bases is
+        best to vertex S, such that every vertex in the path is within R of
+        the base it leaves from. All the bases are searched at once.
+
+        :param bases: The base station VERTICES to choose from.
+        :param s: Vertex S to finish at.
+        :param r: The maximum range of the radio.
+        :return: The LIST of the VERTICES in the path, starting at the chosen
+                 base, or None if there is no path from any of them.
+        """
+
+        p = search.multi_bfs_path([b.id for b in bases], s.id, r,
+                                  self._neighbour_ids, self._pair_distance,
+                                  self._counters())
+        if p is None:
+            return None
+        return [self._by_id[i] for i in p]
+
+    @instrumented("minimum_range_from_bases")
+    def minimum_range_from_bases(self, bases, s):
+        """
+        Returns the minimum range required to reach vertex S from whichever of
+        the bases needs the least, with the range measured from that base.
+        All the bases are swept at once.
+
+        :param bases: The base station VERTICES to choose from.
+        :param s: Vertex S to finish at.
+        :return: The (range, base VERTEX) pair, or (None, None) if S can't be
+                 reached from any of them.
+        """
+
+        r, b = search.multi_minimum_range([b.id for b in bases], s.id,
+                                          self._neighbour_ids,
+                                          self._pair_distance,
+                                          self._counters())
+        if b is None:
+            return None, None
+        return r, self._by_id[b]
+
+    @instrumented("move_vertex")
     def move_vertex(self, v, new_x, new_y):
         """
         Move the defined vertex.
@@ -328,9 +1333,42 @@ class Graph:
         :param new_y: The new Y position
         """
 
-        for u in self._vertices:
+        with self._lock:
             # Check if there exists a node in the way
-            if u.x_pos == new_x and u.y_pos == new_y:
+            if self._grid.at(*self._index_point(new_x, new_y)) is not None:
                 return
 
+            if self.travel_distance is not None:
+                with self._one_change():
+                    self._move_proximity(v, new_x, new_y)
+                return
+
+            old_x, old_y = v.x_pos, v.y_pos
+            v.move_vertex(new_x, new_y)
+            self._index_move(v)
+            self._touch(coords=(v.id,))
+            self._notify("vertex_moved", v, old_x, old_y)
+
+    def _move_proximity(self, v, new_x, new_y):
+        """
+        Moves v in proximity mode, only looking at the stations near its old
+        and new position. The observers see the edges that get too long go
+        first, then the move, then the new edges, all as one change.
+        """
+
+        d = self.travel_distance
+        for e in list(v.edges):
+            u = self.opposite(e, v)
+            if self._distance_to(u, new_x, new_y) > d:
+                self._unlink(v, e)
+
+        old_x, old_y = v.x_pos, v.y_pos
         v.move_vertex(new_x, new_y)
+        self._index_move(v)
+        self._touch(coords=(v.id,))
+        self._notify("vertex_moved", v, old_x, old_y)
+
+        linked = {self.opposite(e, v).id for e in v.edges}
+        for i in sorted(self._ids_within(new_x, new_y, d)):
+            if i != v.id and i not in linked:
+                self._link(v, self._by_id[i])
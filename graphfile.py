@@ -0,0 +1,145 @@
+"""
+Graph File Module
+=================
+
+Reads and writes the graph in a binary file, laid out so that it can be
+memory mapped and queried straight away without building any objects.
+
+File layout (all numbers little endian):
+
+    header, 32 bytes:
+        magic      8 bytes   b"POLARGR\\0"
+        version    uint32    FORMAT_VERSION
+        flags      uint32    reserved, 0
+        vertices   uint64    number of vertices n
+        edges      uint64    number of items in targets (2 per edge)
+    xs         n float64     X position of every vertex
+    ys         n float64     Y position of every vertex
+    ids        n int64       Vertex.id of every vertex
+    offsets    n + 1 int64   CSR offsets into targets
+    targets    edges int64   CSR neighbours
+    id_order   n int64       the vertices in increasing order of id, so an
+                             id can be found by bisecting whatever order the
+                             vertices are in (e.g. after Graph.reorder()).
+                             Version 2 on, version 1 files are still read.
+
+Usage:
+    Not to be run as main, is used through Graph.save() and Graph.load().
+
+Example:
+    G.save("map.pgr")
+    flat = Graph.load("map.pgr", mmap=True)
+"""
+import mmap as _mmap
+import struct
+import sys
+from array import array
+
+from flatgraph import FlatGraph, _LAYOUT, _ITEM_SIZE, _lengths
+
+MAGIC = b"POLARGR\0"
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct("<8sIIQQ")
+
+# The arrays of each version, in the order they are in the file.
+_LAYOUTS = {1: _LAYOUT, 2: _LAYOUT + (("id_order", "q"),)}
+
+
+def write(flat, path):
+    """
+    Writes the flat graph to a file.
+    :param flat: The graph to write.
+    :param path: Where to write it.
+    :type flat: FlatGraph
+    """
+
+    n, m = len(flat.xs), len(flat.targets)
+    id_order = flat.id_order
+    if id_order is None:
+        id_order = sorted(range(n), key=flat.ids.__getitem__)
+    columns = {field: getattr(flat, field) for field, _ in _LAYOUT}
+    columns["id_order"] = id_order
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, n, m))
+        for field, typecode in _LAYOUTS[FORMAT_VERSION]:
+            data = array(typecode, columns[field])
+            if sys.byteorder != "little":
+                data.byteswap()
+            data.tofile(f)
+
+
+def read_header(buf):
+    """
+    Checks the header of a graph file.
+    :param buf: The start of the file, at least 32 bytes.
+    :return: The (vertices, edges, layout) of the file.
+    """
+
+    if len(buf) < _HEADER.size:
+        raise ValueError("Not a graph file, it is too short.")
+
+    magic, version, _, n, m = _HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError("Not a graph file, bad magic {!r}.".format(magic))
+    if version not in _LAYOUTS:
+        raise ValueError("Unsupported graph file version {}, expected {}."
+                         .format(version, FORMAT_VERSION))
+
+    layout = _LAYOUTS[version]
+    lengths = _lengths(n, m)
+    expected = _HEADER.size + \
+        sum(lengths[field] for field, _ in layout) * _ITEM_SIZE
+    if len(buf) < expected:
+        raise ValueError("Graph file is truncated, expected {} bytes."
+                         .format(expected))
+    return n, m, layout
+
+
+def read(path, mmap=True, metric=None, out_of_core=False):
+    """
+    Reads a graph file into a FlatGraph.
+
+    The file only holds the positions, the metric to measure them with is
+    given here.
+
+    :param path: The file to read.
+    :param mmap: Memory map the file instead of reading it. Opening is then
+                 near instant, and the operating system pages the parts of
+                 the file in as the queries touch them.
+    :param metric: Optional, how distances are measured (see metrics.py).
+    :param out_of_core: For files bigger than the memory, the queries then
+                        only keep what they explored in memory, and read the
+                        file in order (see FlatGraph). Needs mmap.
+    :return: The FlatGraph, close() it when done if it is memory mapped.
+    """
+
+    if out_of_core and not mmap:
+        raise ValueError("Out of core needs the file memory mapped.")
+
+    if mmap and sys.byteorder == "little":
+        with open(path, "rb") as f:
+            mapped = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+        try:
+            n, m, layout = read_header(mapped)
+        except ValueError:
+            mapped.close()
+            raise
+        return FlatGraph._from_buffer(mapped, mapped, n, m,
+                                      start=_HEADER.size, metric=metric,
+                                      out_of_core=out_of_core, layout=layout)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    n, m, layout = read_header(data)
+
+    arrays = {}
+    start = _HEADER.size
+    for field, typecode in layout:
+        end = start + _lengths(n, m)[field] * _ITEM_SIZE
+        arrays[field] = array(typecode, data[start:end])
+        if sys.byteorder != "little":
+            arrays[field].byteswap()
+        start = end
+    return FlatGraph(metric=metric, out_of_core=out_of_core, **arrays)
@@ -0,0 +1,184 @@
+"""
+Hull Module
+===========
+
+Convex layers ("onion peeling") of the stations, to find the stations
+furthest from a point without measuring the distance to every station.
+
+The furthest station from any point is always a corner of the convex hull.
+Peel the hull off, and the hull of what is left is the second layer, and so
+on. A station in layer L is inside layer L - 1, so every layer above it has
+a corner at least as far from any point as it is. The k furthest stations
+are therefore all in the first k layers, which for small k is only a handful
+of stations.
+
+Keeping the layers exact as stations come and go is expensive, so they are
+kept lazily:
+
+    * a new or moved station goes in a side list, which every query also
+      looks at. Once that list gets long, the next query peels again.
+    * removing (or moving) a station from layer j throws away layers j and
+      below, they are peeled again when a query needs them. Removing a
+      station that isn't in any layer changes nothing.
+
+Usage:
+    Not to be run as main, used by the graph to answer the furthest station
+    queries.
+
+Example:
+    layers = ConvexLayers()
+    layers.insert(0, 0, 0)
+    layers.insert(1, 3, 4)
+    layers.farthest(0, 0, 1)  # [(5.0, 1)]
+"""
+import heapq
+import math
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _hull(ids, positions):
+    """
+    Andrew's monotone chain.
+    :param ids: The ids, sorted by position.
+    :param positions: Id to (x, y).
+    :return: The LIST of ids of the corners of the convex hull.
+    """
+
+    if len(ids) <= 2:
+        return list(ids)
+
+    def chain(order):
+        out = []
+        for i in order:
+            p = positions[i]
+            while len(out) >= 2 and \
+                    _cross(positions[out[-2]], positions[out[-1]], p) <= 0:
+                out.pop()
+            out.append(i)
+        return out
+
+    lower = chain(ids)
+    upper = chain(reversed(ids))
+    return lower[:-1] + upper[:-1]
+
+
+class ConvexLayers:
+    """
+    ConvexLayers Class
+    ------------------
+
+    The convex layers of a set of stations, peeled as far as the queries so
+    far needed, and kept up to date lazily.
+
+    Attributes:
+        * last_measured (int): How many distances the last query measured.
+    """
+
+    def __init__(self):
+        self.last_measured = 0
+        # Id to position.
+        self._positions = {}
+        # The layers peeled so far, and the layer each id is in.
+        self._layers = []
+        self._layer_of = {}
+        # The ids not peeled yet, and all of those in order of position as
+        # of the last rebuild (it may have ids that are gone since).
+        self._pool = set()
+        self._sorted = []
+        # New or moved ids, which the layers don't know about.
+        self._extra = set()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def insert(self, i, x, y):
+        """
+        Adds the station with id i at (x, y).
+        """
+
+        self._positions[i] = (x, y)
+        self._extra.add(i)
+
+    def remove(self, i):
+        """
+        Forgets the station with id i.
+        """
+
+        del self._positions[i]
+        if i in self._extra:
+            self._extra.discard(i)
+            return
+        j = self._layer_of.get(i)
+        if j is not None:
+            # The layers below it might have a corner outside them now.
+            for layer in self._layers[j:]:
+                for u in layer:
+                    del self._layer_of[u]
+                    self._pool.add(u)
+            del self._layers[j:]
+        self._pool.discard(i)
+
+    def move(self, i, x, y):
+        """
+        Moves the station with id i to (x, y).
+        """
+
+        self.remove(i)
+        self.insert(i, x, y)
+
+    def _rebuild(self):
+        """
+        Forgets the layers and sorts every station again, so the side list
+        is empty.
+        """
+
+        self._layers = []
+        self._layer_of = {}
+        self._pool = set(self._positions)
+        self._sorted = sorted(self._pool, key=self._positions.__getitem__)
+        self._extra = set()
+
+    def _peel(self):
+        """
+        Peels the next layer off the stations not peeled yet.
+        """
+
+        pool = self._pool
+        # Layers thrown away go back in the pool, so keep the whole order.
+        layer = _hull([i for i in self._sorted if i in pool], self._positions)
+        for i in layer:
+            pool.discard(i)
+            self._layer_of[i] = len(self._layers)
+        self._layers.append(layer)
+
+    def farthest(self, x, y, k, skip=None):
+        """
+        Returns the k stations furthest from (x, y).
+
+        :param skip: Optional id of a station to leave out.
+        :return: The LIST of (distance, id) pairs, furthest first.
+        """
+
+        if len(self._extra) > 4 * math.sqrt(len(self._positions)) + 16:
+            self._rebuild()
+
+        # The station left out might take up a spot in the layers.
+        depth = k + (skip is not None)
+        while len(self._layers) < depth and self._pool:
+            self._peel()
+
+        candidates = set(self._extra)
+        for layer in self._layers[:depth]:
+            candidates.update(layer)
+        candidates.discard(skip)
+        self.last_measured = len(candidates)
+
+        positions = self._positions
+        found = []
+        for i in candidates:
+            px, py = positions[i]
+            found.append((math.sqrt((px - x) ** 2 + (py - y) ** 2), i))
+        return heapq.nlargest(k, found)
@@ -0,0 +1,184 @@
+"""
+Instrumentation Module
+======================
+
+Opt-in counters and per-query traces for the graph, to find out why a query
+was slow.
+
+While instrumentation is off the graph only checks one attribute per public
+call. Once it is on, every instrumented operation counts:
+
+    * vertices_expanded - vertices whose edges were looked at.
+    * edges_relaxed     - edges followed.
+    * distance_evals    - calls to distance().
+    * bfs_calls         - range restricted BFS runs (one per find_path and
+                          minimum_range_path).
+    * elapsed           - wall time in seconds.
+
+Operations called from inside another one (e.g. the find_path a standing
+watch makes inside move_vertex) are counted towards the outer operation.
+
+Usage:
+    Not to be run as main, used through Graph.instrument() and Graph.trace().
+
+Example:
+    G.instrument()
+    G.minimum_range(b, s)
+    print(G.stats["minimum_range"])
+
+    with G.trace() as trace:
+        G.find_path(b, s, r)
+    print(trace.records[0].counters)
+"""
+import functools
+import threading
+import time
+from collections import namedtuple
+
+# One instrumented call, as captured by a trace.
+QueryTrace = namedtuple("QueryTrace", ["operation", "args", "counters"])
+
+
+class Counters:
+    """
+    Counters Class
+    --------------
+
+    The work done by one call, or the total of many calls.
+
+    Attributes:
+        * calls (int): The number of calls added up in here.
+        * vertices_expanded (int): Vertices whose edges were looked at.
+        * edges_relaxed (int): Edges followed.
+        * distance_evals (int): Calls to distance().
+        * bfs_calls (int): Range restricted BFS runs.
+        * elapsed (float): Wall time in seconds.
+    """
+
+    __slots__ = ("calls", "vertices_expanded", "edges_relaxed",
+                 "distance_evals", "bfs_calls", "elapsed")
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, 0)
+
+    def add(self, other):
+        """
+        Adds the other counters to these.
+        """
+        for field in self.__slots__:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return "Counters({})".format(", ".join(
+            "{}={}".format(k, v) for k, v in self.as_dict().items()))
+
+
+class Probe:
+    """
+    Probe Class
+    -----------
+
+    Collects the counters of a graph while instrumentation is on.
+
+    Attributes:
+        * totals (dict): Operation name to the Counters summed over all calls.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._traces = []
+
+    def active(self):
+        """
+        Returns the Counters of the operation running in this thread, or
+        None if there is none.
+        """
+        return getattr(self._local, "counters", None)
+
+    def run(self, operation, method, graph, args, kwargs):
+        """
+        Runs the method, counting it as the given operation.
+        """
+
+        if self.active() is not None:
+            # Part of an outer operation, which gets the counts.
+            return method(graph, *args, **kwargs)
+
+        counters = Counters()
+        counters.calls = 1
+        self._local.counters = counters
+        start = time.perf_counter()
+        try:
+            return method(graph, *args, **kwargs)
+        finally:
+            counters.elapsed = time.perf_counter() - start
+            self._local.counters = None
+            with self._lock:
+                self.totals.setdefault(operation, Counters()).add(counters)
+                for trace in self._traces:
+                    trace.records.append(QueryTrace(operation, args, counters))
+
+    def reset(self):
+        """
+        Clears the totals.
+        """
+        with self._lock:
+            self.totals = {}
+
+
+class Trace:
+    """
+    Trace Class
+    -----------
+
+    The calls made while a Graph.trace() block was open.
+
+    Attributes:
+        * records (list): The QueryTrace of every call, in order.
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self._owns_probe = False
+        self.records = []
+
+    def __enter__(self):
+        if self._graph._probe is None:
+            self._graph._probe = Probe()
+            self._owns_probe = True
+        with self._graph._probe._lock:
+            self._graph._probe._traces.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        probe = self._graph._probe
+        with probe._lock:
+            probe._traces.remove(self)
+        if self._owns_probe:
+            self._graph._probe = None
+        return False
+
+
+def instrumented(operation):
+    """
+    Decorator for the graph methods that count as an operation. Costs one
+    attribute check while instrumentation is off.
+    :param operation: The name to count the calls under.
+    """
+
+    def wrap(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            probe = self._probe
+            if probe is None:
+                return method(self, *args, **kwargs)
+            return probe.run(operation, method, self, args, kwargs)
+        return wrapper
+
+    return wrap
@@ -0,0 +1,427 @@
+"""
+Kinetic Module
+==============
+
+Queries on the map as it will be at some time t, for stations that drift
+(icebergs) at a known velocity, without moving anything on the live graph.
+
+A station with velocity (vx, vy) and acceleration (ax, ay) is at
+
+    x(t) = x + vx * t + ax * t^2 / 2
+    y(t) = y + vy * t + ay * t^2 / 2
+
+t time units from now, where (x, y) is its position on the graph. Moving a
+station with move_vertex() starts it drifting again from the new spot. The
+edges are the graph's as they are now, a proximity graph doesn't get its
+edges worked out again for time t.
+
+A view works off a snapshot of the graph, and only works out the position of
+a station at t when a query needs it.
+
+Certificates say how long an answer holds. With Euclidean distances the
+squared distance between two drifting stations is a polynomial in t (degree
+4 at most), so the first time one station gets further from b than another,
+or leaves range r of b, is the first root of a polynomial:
+
+    * find_path(b, s, r) only depends on which stations near b are within r
+      of it, so it holds until one of them enters or leaves the range.
+    * minimum_range(b, s) and find_emergency_range(b) are the distance from b
+      to a witness station w. The witness stays the same until some station
+      overtakes w in distance from b, and until then the answer at any time
+      is just the distance to w.
+
+Usage:
+    Not to be run as main, views are made by Graph.at(t).
+
+Example:
+    G.set_velocity(iceberg, 0.5, -0.1)
+    tomorrow = G.at(24)
+    p = tomorrow.find_path(b, s, r)
+    cert = tomorrow.certify_minimum_range(b, s)
+    cert.expires  # The answer is cert.value(t) until then.
+"""
+import math
+
+import search
+from metrics import EUCLIDEAN
+
+# How many halvings to find a root, far more than a float can tell apart.
+_BISECTIONS = 100
+
+
+def _evaluate(coeffs, t):
+    """
+    Evaluates a polynomial, coefficients lowest power first.
+    """
+
+    total = 0.0
+    for c in reversed(coeffs):
+        total = total * t + c
+    return total
+
+
+def _multiply(p, q):
+    out = [0.0] * (len(p) + len(q) - 1)
+    for i, a in enumerate(p):
+        for j, b in enumerate(q):
+            out[i + j] += a * b
+    return out
+
+
+def _trim(coeffs):
+    """
+    Drops the leading coefficients that are zero (or rounding error).
+    """
+
+    scale = max((abs(c) for c in coeffs), default=0.0)
+    coeffs = list(coeffs)
+    while coeffs and abs(coeffs[-1]) <= 1e-12 * scale:
+        coeffs.pop()
+    return coeffs
+
+
+def _roots_between(coeffs, lo, hi):
+    """
+    Returns the roots of a polynomial in (lo, hi], in increasing order.
+
+    Between two roots of the derivative the polynomial is monotone, so it
+    has at most one root there, found by bisection.
+    """
+
+    coeffs = _trim(coeffs)
+    if len(coeffs) <= 1:
+        return []
+    if len(coeffs) == 2:
+        root = -coeffs[0] / coeffs[1]
+        return [root] if lo < root <= hi else []
+
+    derivative = [i * c for i, c in enumerate(coeffs)][1:]
+    points = [lo] + _roots_between(derivative, lo, hi) + [hi]
+
+    roots = []
+    for a, b in zip(points, points[1:]):
+        fa, fb = _evaluate(coeffs, a), _evaluate(coeffs, b)
+        if fb == 0:
+            if b > lo and (not roots or roots[-1] != b):
+                roots.append(b)
+        elif fa * fb < 0:
+            for _ in range(_BISECTIONS):
+                middle = (a + b) / 2
+                if middle in (a, b):
+                    break
+                fm = _evaluate(coeffs, middle)
+                if (fm < 0) == (fa < 0):
+                    a, fa = middle, fm
+                else:
+                    b = middle
+            roots.append(b)
+    return roots
+
+
+def _next_root(coeffs, after):
+    """
+    Returns the first root of a polynomial after a time, or inf if there
+    isn't one.
+    """
+
+    coeffs = _trim(coeffs)
+    if len(coeffs) <= 1:
+        return math.inf
+    # Every root is within this bound (Cauchy's).
+    bound = 1 + max(abs(c / coeffs[-1]) for c in coeffs[:-1])
+    if after >= bound:
+        return math.inf
+    roots = _roots_between(coeffs, after, bound)
+    return roots[0] if roots else math.inf
+
+
+class Certificate:
+    """
+    Certificate Class
+    -----------------
+
+    The answer to a query at one time, and how long it is sure to hold.
+
+    Attributes:
+        * time (float): The time the query was asked for.
+        * answer: The answer at that time.
+        * witness (Vertex): For the ranges, the station the range is the
+                            distance to. None for paths.
+        * expires (float): The first time after time the answer can change,
+                           inf if it never can. Before then, a path stays the
+                           same and a range stays the distance to the witness.
+    """
+
+    def __init__(self, view, base, time, answer, witness, expires):
+        self._view = view
+        self._base = base
+        self.time = time
+        self.answer = answer
+        self.witness = witness
+        self.expires = expires
+
+    def valid_at(self, t):
+        """
+        Returns whether the answer is sure to hold at time t.
+        """
+        return self.time <= t < self.expires
+
+    def value(self, t):
+        """
+        Returns the answer at time t, which must be one it holds at. Ranges
+        are worked out again from the witness.
+        """
+
+        if not self.valid_at(t):
+            raise ValueError("The certificate doesn't hold at {}".format(t))
+        if self.witness is None:
+            return self.answer
+        return self._view._distance_at(self._base.id, self.witness.id, t)
+
+    def __repr__(self):
+        return "Certificate(answer={}, expires={})".format(self.answer,
+                                                           self.expires)
+
+
+class KineticView:
+    """
+    KineticView Class
+    -----------------
+
+    A read only view of the graph as it will be at time t, from a snapshot
+    of the graph and the velocities at the time it was made.
+
+    Attributes:
+        * time (float): The time the positions are for, from now.
+        * version (int): The version of the graph this is a view of.
+    """
+
+    def __init__(self, snapshot, motion, time, metric):
+        """
+        Made by Graph.at(), not meant to be called directly.
+        :param snapshot: A GraphSnapshot of the graph.
+        :param motion: Vertex id to (vx, vy, ax, ay), for the ids that move.
+        :param time: The time to look at.
+        :param metric: The graph's metric.
+        """
+        self._snapshot = snapshot
+        self._motion = motion
+        self.time = time
+        self.version = snapshot.version
+        self._metric = metric
+        # The positions (and points, for other metrics) at time, only
+        # worked out once a query needs them.
+        self._positions = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def _position_at(self, i, t):
+        _, x, y, _ = self._snapshot._top.find("coords", i)
+        motion = self._motion.get(i)
+        if motion is None:
+            return x, y
+        vx, vy, ax, ay = motion
+        return x + vx * t + ax * t * t / 2, y + vy * t + ay * t * t / 2
+
+    def _position(self, i):
+        p = self._positions.get(i)
+        if p is None:
+            p = self._positions[i] = self._position_at(i, self.time)
+        return p
+
+    def _distance_at(self, i, j, t):
+        xi, yi = self._position_at(i, t)
+        xj, yj = self._position_at(j, t)
+        return self._metric.distance(xi, yi, xj, yj)
+
+    def _dist_from(self, b):
+        """
+        Returns a function giving the distance of a vertex id from vertex b
+        at the view's time.
+        """
+
+        bx, by = self._position(b)
+        if self._metric == EUCLIDEAN:
+            position = self._position
+
+            def dist(i):
+                x, y = position(i)
+                return math.sqrt(((x - bx)**2) + ((y - by)**2))
+
+            return dist
+
+        kernel, project = self._metric.kernel, self._metric.project
+        points = self._points
+        p = project(bx, by)
+
+        def dist(i):
+            q = points.get(i)
+            if q is None:
+                q = points[i] = project(*self._position(i))
+            return kernel(p, q)
+
+        return dist
+
+    def _vertex(self, i):
+        return self._snapshot._vertex(i)
+
+    def position(self, v):
+        """
+        Returns the (x_pos, y_pos) of v at the view's time.
+        """
+        self._snapshot._entry(v)
+        return self._position(v.id)
+
+    def distance(self, u, v):
+        """
+        The distance between u and v at the view's time.
+        """
+        self._snapshot._entry(v)
+        return self._dist_from(self._snapshot._entry(u)[0].id)(v.id)
+
+    def find_emergency_range(self, v):
+        """
+        Returns the distance to the vertex W that is furthest from V.
+        """
+        self._snapshot._entry(v)
+        return search.farthest(self._snapshot._ids(), self._dist_from(v.id))
+
+    def find_path(self, b, s, r):
+        """
+        Find a path from vertex B to vertex S, such that the distance from B
+        to every vertex in the path is within R, or None if there is none.
+        """
+        self._snapshot._entry(b)
+        self._snapshot._entry(s)
+        p = search.bfs_path(b.id, s.id, r, self._snapshot._neighbours,
+                            self._dist_from(b.id))
+        if p is None:
+            return None
+        return [self._vertex(i) for i in p]
+
+    def minimum_range(self, b, s):
+        """
+        Returns the minimum range required to go from Vertex B to Vertex S.
+        """
+        self._snapshot._entry(b)
+        self._snapshot._entry(s)
+        return search.minimum_range(b.id, s.id, self._snapshot._neighbours,
+                                    self._dist_from(b.id))
+
+    ########################################
+    # Certificates
+    ########################################
+
+    def _squared_distance(self, i, j):
+        """
+        Returns the squared distance between vertex i and j as a polynomial
+        in t, lowest power first.
+        """
+
+        _, xi, yi, _ = self._snapshot._top.find("coords", i)
+        _, xj, yj, _ = self._snapshot._top.find("coords", j)
+        vxi, vyi, axi, ayi = self._motion.get(i, (0, 0, 0, 0))
+        vxj, vyj, axj, ayj = self._motion.get(j, (0, 0, 0, 0))
+
+        dx = [xj - xi, vxj - vxi, (axj - axi) / 2]
+        dy = [yj - yi, vyj - vyi, (ayj - ayi) / 2]
+        return [a + b for a, b in zip(_multiply(dx, dx), _multiply(dy, dy))]
+
+    def _overtaken(self, b, w, ids):
+        """
+        Returns the first time after the view's time that a station in ids
+        gets as far from b as w is, or w gets as far as it.
+        """
+
+        far = self._squared_distance(b, w)
+        first = math.inf
+        for i in ids:
+            if i != w:
+                gap = [a - c for a, c in
+                       zip(self._squared_distance(b, i), far)]
+                first = min(first, _next_root(gap, self.time))
+        return first
+
+    def _check_certifiable(self):
+        if self._metric != EUCLIDEAN:
+            raise ValueError("Certificates need the Euclidean metric, only "
+                             "then is the distance a polynomial in time.")
+
+    def certify_path(self, b, s, r):
+        """
+        Answers find_path(b, s, r), and works out how long the path holds:
+        until a station in or next to the part of the map reachable within r
+        of b enters or leaves the range.
+        :return: The Certificate, with the path as the answer.
+        """
+
+        self._check_certifiable()
+        path = self.find_path(b, s, r)
+
+        dist = self._dist_from(b.id)
+        neighbours = self._snapshot._neighbours
+        reached = {b.id}
+        todo = [b.id]
+        border = set()
+        while todo:
+            u = todo.pop()
+            for w in neighbours(u):
+                if w in reached or w in border:
+                    continue
+                if dist(w) <= r:
+                    reached.add(w)
+                    todo.append(w)
+                else:
+                    border.add(w)
+
+        expires = math.inf
+        for i in reached | border:
+            if i != b.id:
+                gap = self._squared_distance(b.id, i)
+                gap[0] -= r * r
+                expires = min(expires, _next_root(gap, self.time))
+        return Certificate(self, b, self.time, path, None, expires)
+
+    def certify_minimum_range(self, b, s):
+        """
+        Answers minimum_range(b, s), and works out how long the witness (the
+        station whose distance from b is the minimum range) stays the same.
+        :return: The Certificate, with the range as the answer.
+        """
+
+        self._check_certifiable()
+        self._snapshot._entry(s)
+        witness, answer = b.id, None
+        last = -math.inf
+        for u, key in search.bottleneck_sweep(b.id, self._snapshot._neighbours,
+                                              self._dist_from(b.id)):
+            if key > last:
+                witness, last = u, key
+            if u == s.id:
+                answer = key
+                break
+
+        if answer is None:
+            # Moving stations never joins up the map.
+            return Certificate(self, b, self.time, None, None, math.inf)
+        expires = self._overtaken(b.id, witness, self._snapshot._ids())
+        return Certificate(self, b, self.time, answer, self._vertex(witness),
+                           expires)
+
+    def certify_emergency_range(self, v):
+        """
+        Answers find_emergency_range(v), and works out how long the furthest
+        station from v stays the furthest.
+        :return: The Certificate, with the range as the answer.
+        """
+
+        self._check_certifiable()
+        self._snapshot._entry(v)
+        ids = self._snapshot._ids()
+        dist = self._dist_from(v.id)
+        answer, witness = max((dist(i), i) for i in ids)
+        expires = self._overtaken(v.id, witness, ids)
+        return Certificate(self, v, self.time, answer, self._vertex(witness),
+                           expires)
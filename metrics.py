@@ -0,0 +1,190 @@
+"""
+Metrics Module
+==============
+
+The ways of measuring the distance between two stations. A graph is given
+one metric, and every query (find_emergency_range, find_path, minimum_range,
+and everything built on them) measures with it.
+
+A metric works in two steps, so the expensive part is only done once per
+station instead of once per edge:
+
+    * project(x, y) - turns a position into a point, done once when the
+                      station is inserted or moved, and cached.
+    * kernel(p, q)  - the distance between two projected points, which is
+                      as cheap as the planar sqrt.
+
+The metrics:
+
+    * Euclidean          - planar distance, positions are (x, y). The
+                           default, and what the graph always used.
+    * Haversine          - great circle distance on a sphere, positions are
+                           (longitude, latitude) in degrees. Points are unit
+                           vectors, the kernel turns the chord between them
+                           into the arc.
+    * PolarStereographic - planar distance on the polar stereographic
+                           projection of (longitude, latitude) in degrees,
+                           the usual map of the polar regions. Points are
+                           the projected (x, y).
+
+A metric is planar when the kernel is the Euclidean distance between its
+points, which lets the grid and the convex layers index the points directly.
+A metric is spherical when its points are unit vectors and the kernel only
+grows with the chord between them, so chord(r) turns a range into a chord
+and the stations within it can be found with a SphereIndex (see spatial.py).
+
+Usage:
+    Not to be run as main, given to the graph.
+
+Example:
+    G = Graph(metric=Haversine())
+    b = G.insert_vertex(166.67, -77.85)  # McMurdo
+    s = G.insert_vertex(139.99, -66.66)  # Dumont d'Urville
+    G.distance(b, s)  # In kilometres
+"""
+import math
+
+# The mean radius of the Earth, in kilometres.
+EARTH_RADIUS = 6371.0088
+
+
+class Euclidean:
+    """
+    Euclidean Class
+    ---------------
+
+    Planar distance between (x, y) positions.
+    """
+
+    planar = True
+    spherical = False
+
+    def project(self, x, y):
+        return x, y
+
+    def kernel(self, p, q):
+        return math.sqrt(((q[0] - p[0])**2) + ((q[1] - p[1])**2))
+
+    def distance(self, x1, y1, x2, y2):
+        """
+        Returns the distance between two positions.
+        """
+        return math.sqrt(((x2 - x1)**2) + ((y2 - y1)**2))
+
+    def __eq__(self, other):
+        return type(other) is type(self)
+
+    def __hash__(self):
+        return hash(type(self))
+
+    def __repr__(self):
+        return "Euclidean()"
+
+
+class Haversine:
+    """
+    Haversine Class
+    ---------------
+
+    Great circle distance between (longitude, latitude) positions, in
+    degrees.
+
+    Attributes:
+        * radius (float): The radius of the sphere, the distances come out in
+                          the same unit. Kilometres on the Earth by default.
+    """
+
+    planar = False
+    spherical = True
+
+    def __init__(self, radius=EARTH_RADIUS):
+        self.radius = radius
+
+    def project(self, lon, lat):
+        lon, lat = math.radians(lon), math.radians(lat)
+        c = math.cos(lat)
+        return c * math.cos(lon), c * math.sin(lon), math.sin(lat)
+
+    def kernel(self, p, q):
+        # The straight line through the sphere, then the arc over it.
+        chord = math.sqrt(((q[0] - p[0])**2) + ((q[1] - p[1])**2) +
+                          ((q[2] - p[2])**2))
+        return 2 * self.radius * math.asin(min(1.0, chord / 2))
+
+    def chord(self, r):
+        """
+        Returns the chord between two unit vectors an arc of r apart.
+        """
+        return 2 * math.sin(min(r / (2 * self.radius), math.pi / 2))
+
+    def distance(self, x1, y1, x2, y2):
+        """
+        Returns the distance between two positions.
+        """
+        return self.kernel(self.project(x1, y1), self.project(x2, y2))
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.radius == self.radius
+
+    def __hash__(self):
+        return hash((type(self), self.radius))
+
+    def __repr__(self):
+        return "Haversine(radius={})".format(self.radius)
+
+
+class PolarStereographic:
+    """
+    PolarStereographic Class
+    ------------------------
+
+    Planar distance on the polar stereographic projection of (longitude,
+    latitude) positions, in degrees. The scale is true at the pole, and
+    grows away from it.
+
+    Attributes:
+        * pole (str): "south" or "north", the pole the map is centred on.
+        * radius (float): The radius of the sphere, the distances come out in
+                          the same unit. Kilometres on the Earth by default.
+    """
+
+    planar = True
+    spherical = False
+
+    def __init__(self, pole="south", radius=EARTH_RADIUS):
+        if pole not in ("south", "north"):
+            raise ValueError("The pole must be 'south' or 'north'.")
+        self.pole = pole
+        self.radius = radius
+
+    def project(self, lon, lat):
+        lon, lat = math.radians(lon), math.radians(lat)
+        if self.pole == "south":
+            rho = 2 * self.radius * math.tan(math.pi / 4 + lat / 2)
+            return rho * math.sin(lon), rho * math.cos(lon)
+        rho = 2 * self.radius * math.tan(math.pi / 4 - lat / 2)
+        return rho * math.sin(lon), -rho * math.cos(lon)
+
+    def kernel(self, p, q):
+        return math.sqrt(((q[0] - p[0])**2) + ((q[1] - p[1])**2))
+
+    def distance(self, x1, y1, x2, y2):
+        """
+        Returns the distance between two positions.
+        """
+        return self.kernel(self.project(x1, y1), self.project(x2, y2))
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.pole == self.pole and \
+            other.radius == self.radius
+
+    def __hash__(self):
+        return hash((type(self), self.pole, self.radius))
+
+    def __repr__(self):
+        return "PolarStereographic(pole={!r}, radius={})".format(
+            self.pole, self.radius)
+
+
+# The metric of a graph that wasn't given one.
+EUCLIDEAN = Euclidean()
@@ -0,0 +1,126 @@
+"""
+Ordering Module
+===============
+
+Orders of the stations that keep stations close together in the order when
+they are close together on the map (or in the graph), so a search touches
+memory (or a file) in runs instead of jumping about.
+
+The orders:
+
+    * hilbert - along a Hilbert curve over the map. Stations near each other
+                on the map are near each other on the curve.
+    * bfs     - breadth first from the first station of every component, so
+                a station's neighbours come soon after it.
+    * rcm     - reverse Cuthill-McKee, breadth first from a station of the
+                lowest degree, neighbours by increasing degree, then the
+                whole order reversed. Keeps every edge's two ends close in
+                the order.
+
+Every order is a LIST of positions into the list of stations it was given.
+
+Usage:
+    Not to be run as main, used by Graph.reorder().
+
+Example:
+    order = hilbert_order([(0, 0), (5, 5), (0, 1)])  # [0, 2, 1]
+"""
+import collections
+
+STRATEGIES = ("hilbert", "bfs", "rcm")
+
+# The curve goes through a 2^_BITS by 2^_BITS grid over the map.
+_BITS = 16
+
+
+def _hilbert_index(x, y):
+    """
+    Returns where the cell (x, y) of the grid is along the Hilbert curve.
+    """
+
+    n = 1 << _BITS
+    d = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Turn the quadrant so the curve joins up.
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def hilbert_order(points):
+    """
+    Orders points along a Hilbert curve over their bounding box.
+    :param points: The LIST of (x, y).
+    :return: The order, as positions into points.
+    """
+
+    if not points:
+        return []
+    low_x = min(x for x, _ in points)
+    low_y = min(y for _, y in points)
+    span = max(max(x for x, _ in points) - low_x,
+               max(y for _, y in points) - low_y)
+    scale = ((1 << _BITS) - 1) / span if span > 0 else 0
+
+    keys = [_hilbert_index(int((x - low_x) * scale), int((y - low_y) * scale))
+            for x, y in points]
+    return sorted(range(len(points)), key=keys.__getitem__)
+
+
+def bfs_order(n, neighbours):
+    """
+    Orders the handles 0 to n - 1 breadth first, starting each component at
+    its first handle.
+    :param neighbours: Returns the handles next to a handle.
+    :return: The order.
+    """
+
+    order = []
+    seen = [False] * n
+    for root in range(n):
+        if seen[root]:
+            continue
+        seen[root] = True
+        queue = collections.deque([root])
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            for v in neighbours(u):
+                if not seen[v]:
+                    seen[v] = True
+                    queue.append(v)
+    return order
+
+
+def rcm_order(n, neighbours):
+    """
+    Orders the handles 0 to n - 1 by reverse Cuthill-McKee.
+    :param neighbours: Returns the handles next to a handle.
+    :return: The order.
+    """
+
+    degree = [len(neighbours(u)) for u in range(n)]
+    order = []
+    seen = [False] * n
+    for root in sorted(range(n), key=degree.__getitem__):
+        if seen[root]:
+            continue
+        seen[root] = True
+        queue = collections.deque([root])
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            for v in sorted(neighbours(u), key=degree.__getitem__):
+                if not seen[v]:
+                    seen[v] = True
+                    queue.append(v)
+    order.reverse()
+    return order
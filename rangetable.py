@@ -0,0 +1,206 @@
+"""
+Range Table Module
+==================
+
+Keeps minimum_range(b, s) from one base b to every station s up to date while
+the graph changes, without recomputing the whole table each time.
+
+The table remembers the stations in the order the minimum range sweep
+reached them (so in increasing order of range). When the graph changes there
+is a threshold t below which nothing can change:
+
+    * a station moves: the smaller of its old and new distance to b.
+    * an edge is added: the smaller of the ranges of its two ends.
+    * an edge is removed: the larger of the ranges of its two ends (a path
+      through it needs both).
+    * a station is removed: its range.
+
+Any path that goes through the changed part has a range of at least t, so the
+stations with a range below t keep it. The table cuts off everything from t
+onwards, and sweeps again from the edge of what is left, so the cost depends
+on how many stations had a range of at least t, not the size of the map.
+
+Usage:
+    Not to be run as main, tables are made with Graph.range_table(b).
+
+Example:
+    table = G.range_table(b)
+    G.move_vertex(s, 4, 2)
+    table[s]  # Same as minimum_range(b, s), already updated.
+"""
+import bisect
+import heapq
+import math
+
+
+class RangeTable:
+    """
+    RangeTable Class
+    ----------------
+
+    The minimum range from one base station to every other station, kept up
+    to date as the graph changes.
+
+    Attributes:
+        * base (Vertex): The base station b.
+        * last_repaired (int): How many stations the last update had to
+                               sweep again.
+    """
+
+    def __init__(self, graph, b):
+        """
+        Builds the table and starts following the graph's changes.
+        :param graph: The graph.
+        :param b: The base station.
+        """
+
+        self._graph = graph
+        self.base = b
+        self.last_repaired = 0
+        # Station id to its range, and the ids and ranges in sweep order.
+        self._range = {}
+        self._order = []
+        self._values = []
+        with graph._lock:
+            self._repair(-math.inf)
+            graph._observers.append(self)
+
+    def close(self):
+        """
+        Stops following the graph.
+        """
+
+        if self in self._graph._observers:
+            self._graph._observers.remove(self)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, s):
+        return self.get(s)
+
+    def get(self, s):
+        """
+        Returns the minimum range needed to reach s from the base, or None if
+        s can't be reached.
+        """
+
+        if self.base is None:
+            raise ValueError("The base station was removed from the graph.")
+        return self._range.get(s.id)
+
+    def items(self):
+        """
+        Returns the LIST of (station, minimum range) pairs of all the reachable
+        stations, in increasing order of range.
+        """
+
+        by_id = self._graph._by_id
+        return [(by_id[i], r) for i, r in zip(self._order, self._values)]
+
+    ########################################
+    # Updating
+    ########################################
+
+    def _distance(self, i):
+        v = self._graph._by_id[i]
+        return self._graph.distance(self.base, v)
+
+    def _repair(self, t, extra=()):
+        """
+        Forgets every range of at least t, and sweeps again from the stations
+        that are left.
+        :param t: The threshold, all ranges below it are still correct.
+        :param extra: Ids of stations that might have become reachable.
+        """
+
+        graph = self._graph
+        cut = bisect.bisect_left(self._values, t)
+        dropped = self._order[cut:]
+        del self._order[cut:]
+        del self._values[cut:]
+        for i in dropped:
+            del self._range[i]
+        settled = self._range
+
+        # Seed the sweep with every unsettled station next to a settled one.
+        counter = 0
+        heap = []
+        if not settled:
+            heap.append((self._distance(self.base.id), counter, self.base.id))
+        for i in list(dropped) + list(extra):
+            if i in settled or i not in graph._by_id:
+                continue
+            best = math.inf
+            for j in graph._neighbour_ids(i):
+                if j in settled and settled[j] < best:
+                    best = settled[j]
+            if best < math.inf:
+                counter += 1
+                heapq.heappush(heap,
+                               (max(best, self._distance(i)), counter, i))
+
+        repaired = 0
+        while heap:
+            key, _, i = heapq.heappop(heap)
+            if i in settled:
+                continue
+            settled[i] = key
+            self._order.append(i)
+            self._values.append(key)
+            repaired += 1
+            for j in graph._neighbour_ids(i):
+                if j not in settled:
+                    counter += 1
+                    heapq.heappush(heap,
+                                   (max(key, self._distance(j)), counter, j))
+
+        self.last_repaired = repaired
+
+    def vertex_inserted(self, v):
+        # A new station has no edges yet, so it can't be reached.
+        self.last_repaired = 0
+
+    def edge_inserted(self, u, v):
+        t = min(self._range.get(u.id, math.inf),
+                self._range.get(v.id, math.inf))
+        if t == math.inf:
+            # Neither end can be reached, nothing changes.
+            self.last_repaired = 0
+            return
+        self._repair(t, extra=(u.id, v.id))
+
+    def edge_removed(self, u, v):
+        if u.id not in self._range or v.id not in self._range:
+            # It wasn't on the way to anything.
+            self.last_repaired = 0
+            return
+        self._repair(max(self._range[u.id], self._range[v.id]))
+
+    def vertex_removed(self, v, neighbours):
+        if v is self.base:
+            self.close()
+            self.base = None
+            self._range, self._order, self._values = {}, [], []
+            return
+        if v.id not in self._range:
+            self.last_repaired = 0
+            return
+        self._repair(self._range[v.id])
+
+    def change_started(self):
+        # The table is repaired event by event, it is right after each one.
+        pass
+
+    def change_finished(self):
+        pass
+
+    def vertex_moved(self, v, old_x, old_y):
+        if v is self.base:
+            self._repair(-math.inf)
+            return
+        if v.id not in self._range:
+            self.last_repaired = 0
+            return
+        old = self._graph._distance_to(self.base, old_x, old_y)
+        self._repair(min(old, self._distance(v.id)))
@@ -0,0 +1,207 @@
+"""
+Scratch Module
+==============
+
+Arrays for a search to keep its state in (visited, parent, distance), kept
+from one search to the next instead of being made afresh every time.
+
+Every entry has a stamp, and an entry only counts if its stamp is the epoch
+of the search running now. Starting a search just moves the epoch on, which
+forgets every entry at once, so a search costs as much as the part of the
+map it explores, not the size of the map.
+
+The arrays are indexed by vertex id, and grow (doubling) as the graph hands
+out bigger ids. Every thread keeps a small pool of them, see Graph._scratch_arrays().
+
+A path found by a search can be read off the parents in three forms (see
+Graph.find_path()):
+
+    * vertices - the LIST of vertices, as always.
+    * ids      - an array('l') of the vertex ids, 8 bytes a hop instead of a
+                 list slot and a vertex lookup.
+    * lazy     - a LazyPath, reading the parents left in the arrays. Its
+                 length and first hop cost one walk back and nothing else.
+
+Usage:
+    Not to be run as main, used by the graph's searches.
+
+Example:
+    scratch = Scratch()
+    epoch = scratch.begin(size)
+    scratch.visited[i] = epoch          # Visit i
+    scratch.visited[j] == epoch         # Has j been visited?
+"""
+import weakref
+from array import array
+
+PATH_FORMS = ("vertices", "ids", "lazy")
+
+
+class Scratch:
+    """
+    Scratch Class
+    -------------
+
+    One thread's search state, indexed by vertex id.
+
+    Attributes:
+        * epoch (int): The stamp of the search running now.
+        * visited (array): The stamp of the search that visited each id.
+        * parent (array): The id each id was reached from.
+        * parent_stamp (array): The stamp of the search that set the parent.
+        * distance (array): The distance of each id from the start.
+        * distance_stamp (array): The stamp of the search that measured it.
+        * busy (bool): Whether a search is using the arrays.
+        * holder (weakref): The LazyPath still reading the parents, if any.
+    """
+
+    def __init__(self):
+        self.epoch = 0
+        self.visited = array("q")
+        self.parent = array("q")
+        self.parent_stamp = array("q")
+        self.distance = array("d")
+        self.distance_stamp = array("q")
+        self.busy = False
+        self.holder = None
+
+    def __len__(self):
+        return len(self.visited)
+
+    def begin(self, size):
+        """
+        Starts a search, forgetting everything the last one wrote.
+        :param size: One more than the biggest id the search may see.
+        :return: The epoch of the new search.
+        """
+
+        # A lazy path still reading the last search's parents takes a copy
+        # of its ids before they are written over.
+        if self.holder is not None:
+            path = self.holder()
+            if path is not None:
+                path._detach()
+            self.holder = None
+
+        if size > len(self.visited):
+            extra = max(size, 2 * len(self.visited)) - len(self.visited)
+            zeros = array("q", [0]) * extra
+            self.visited.extend(zeros)
+            self.parent.extend(zeros)
+            self.parent_stamp.extend(zeros)
+            self.distance_stamp.extend(zeros)
+            self.distance.extend(array("d", [0.0]) * extra)
+        self.epoch += 1
+        return self.epoch
+
+    def walk(self, b, s):
+        """
+        Walks the parents this search set from s back to b.
+        :param b: The id the search started from.
+        :param s: The id to walk back from.
+        :return: The (hops, first hop id) pair, or None if s wasn't reached.
+        """
+
+        epoch = self.epoch
+        parent, stamp = self.parent, self.parent_stamp
+        hops = 0
+        first = s
+        while s != b:
+            if stamp[s] != epoch:
+                return None
+            first = s
+            s = parent[s]
+            hops += 1
+        return hops, first
+
+    def path_ids(self, b, s, hops):
+        """
+        Returns the ids from b to s, filled in from the back so nothing needs
+        reversing.
+        :param hops: The hops from b to s, see walk().
+        :return: The array('l') of ids.
+        """
+
+        parent = self.parent
+        ids = array("l", [b]) * (hops + 1)
+        for k in range(hops, 0, -1):
+            ids[k] = s
+            s = parent[s]
+        return ids
+
+
+class LazyPath:
+    """
+    LazyPath Class
+    --------------
+
+    A path read straight off the parents a search left in its Scratch. The
+    length and the first hop are known up front, the ids and vertices are
+    only worked out when asked for, and reversed() walks the parents from s
+    back to b without building anything.
+
+    If the thread starts another search while the path is still alive, the
+    path copies its ids out of the arrays first. Read it on the thread that
+    found it (or call ids() before handing it on).
+    """
+
+    def __init__(self, scratch, by_id, b, s, hops, first):
+        self._scratch = scratch
+        self._by_id = by_id
+        self._b = b
+        self._s = s
+        self._hops = hops
+        self._first = first
+        self._ids = None
+        scratch.holder = weakref.ref(self)
+
+    def __len__(self):
+        return self._hops + 1
+
+    def __repr__(self):
+        return "LazyPath({} hops from {} to {})".format(
+            self._hops, self._b, self._s)
+
+    @property
+    def first_hop(self):
+        """
+        The vertex after the start, or None if the path doesn't go anywhere.
+        """
+
+        if self._hops == 0:
+            return None
+        return self._by_id[self._first]
+
+    def ids(self):
+        """
+        Returns the array('l') of the ids from the start to the end.
+        """
+
+        if self._ids is not None:
+            return self._ids
+        return self._scratch.path_ids(self._b, self._s, self._hops)
+
+    def __iter__(self):
+        by_id = self._by_id
+        for i in self.ids():
+            yield by_id[i]
+
+    def __reversed__(self):
+        by_id = self._by_id
+        parent = self._scratch.parent if self._ids is None else None
+        c = self._s
+        for k in range(self._hops, 0, -1):
+            yield by_id[c]
+            # A search in between may have made the path copy its ids out.
+            ids = self._ids
+            c = ids[k - 1] if ids is not None else parent[c]
+        yield by_id[c]
+
+    def _detach(self):
+        """
+        Copies the ids out of the scratch arrays, which are about to be used
+        by another search.
+        """
+
+        self._ids = self._scratch.path_ids(self._b, self._s, self._hops)
+        self._scratch = None
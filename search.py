@@ -0,0 +1,648 @@
+"""
+Search Module
+=============
+
+The range restricted searches, written once so that every view of the map
+(the live graph, snapshots, flat arrays, ...) can share them.
+
+The functions in here don't know anything about Vertex or Edge objects. They
+work on "handles" (vertex ids, array indices, anything hashable) and are given
+two callables:
+
+    * neighbours(u) - returns an iterable of the handles next to u.
+    * dist(u)       - returns the distance of u from the base station b.
+
+Usage:
+    Not to be run as main, is used as an import by the graph views.
+
+Example:
+    path = bfs_path(b, s, r, neighbours, dist)
+"""
+import collections
+import heapq
+import math
+
+
+def farthest(handles, dist):
+    """
+    Returns the largest distance from the base station to any of the handles.
+    :param handles: The handles to look at.
+    :param dist: The distance of a handle from the base station.
+    :return: The largest distance, or 0 if there are no handles.
+    """
+
+    best = 0
+    for u in handles:
+        d = dist(u)
+        if d > best:
+            best = d
+    return best
+
+
+def bfs_path(b, s, r, neighbours, dist, counters=None, in_order=False):
+    """
+    Find the path from b to s with the fewest hops, such that every handle on
+    the path is within r of b.
+
+    :param b: The handle to start from.
+    :param s: The handle to reach.
+    :param r: The range to stay within.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: Returns the distance of a handle from b.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :param in_order: Go through every layer in order of handle (see
+                     bfs_within_in_order).
+    :return: The LIST of handles from b to s, or None if there is no path.
+    """
+
+    evals = 0
+
+    def admissible(v):
+        nonlocal evals
+        evals += 1
+        return dist(v) <= r
+
+    search = bfs_within_in_order if in_order else bfs_within
+    path = search(b, s, neighbours, admissible, counters)
+    if counters is not None:
+        counters.distance_evals += evals
+    return path
+
+
+def bfs_within(b, s, neighbours, admissible, counters=None):
+    """
+    Find the path from b to s with the fewest hops, using only the handles
+    that are admissible.
+
+    :param b: The handle to start from.
+    :param s: The handle to reach.
+    :param neighbours: Returns the handles next to a handle.
+    :param admissible: Returns whether a handle may be used, it is asked at
+                       most once per handle.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: The LIST of handles from b to s, or None if there is no path.
+    """
+
+    if b == s:
+        return [b]
+
+    expanded = relaxed = 0
+    parents = {b: None}
+    rejected = set()
+    current = [b]
+    path = None
+    while current and path is None:
+        following = []
+        for u in current:
+            expanded += 1
+            for v in neighbours(u):
+                relaxed += 1
+                if v in parents or v in rejected:
+                    continue
+                if not admissible(v):
+                    rejected.add(v)
+                    continue
+                parents[v] = u
+                if v == s:
+                    path = trace_path(parents, s)
+                    break
+                following.append(v)
+            if path is not None:
+                break
+        current = following
+
+    if counters is not None:
+        counters.bfs_calls += 1
+        counters.vertices_expanded += expanded
+        counters.edges_relaxed += relaxed
+    return path
+
+
+def bfs_within_in_order(b, s, neighbours, admissible, counters=None):
+    """
+    The same search as bfs_within, but every layer is expanded in order of
+    handle, and the handles of the next layer are checked in order too. When
+    the handles are positions in a memory mapped file, the reads then go
+    forwards through the file once per layer instead of jumping about. The
+    handles must be comparable.
+
+    :return: The LIST of handles from b to s, or None if there is no path.
+    """
+
+    if b == s:
+        return [b]
+
+    expanded = relaxed = 0
+    parents = {b: None}
+    rejected = set()
+    current = [b]
+    path = None
+    while current and path is None:
+        # Every new handle next to the layer, with the first parent found.
+        found = {}
+        for u in current:
+            expanded += 1
+            for v in neighbours(u):
+                relaxed += 1
+                if v not in parents and v not in rejected and v not in found:
+                    found[v] = u
+
+        following = []
+        for v in sorted(found):
+            if not admissible(v):
+                rejected.add(v)
+                continue
+            parents[v] = found[v]
+            if v == s:
+                path = trace_path(parents, s)
+                break
+            following.append(v)
+        current = following
+
+    if counters is not None:
+        counters.bfs_calls += 1
+        counters.vertices_expanded += expanded
+        counters.edges_relaxed += relaxed
+    return path
+
+
+def trace_path(parents, s):
+    """
+    Walks the parent pointers back from s to the root of the search.
+    :param parents: Maps a handle to its parent, the root maps to None.
+    :param s: The handle to finish at.
+    :return: The LIST of handles from the root to s.
+    """
+
+    path = []
+    c = s
+    while c is not None:
+        path.append(c)
+        c = parents[c]
+    path.reverse()
+    return path
+
+
+def bottleneck_sweep(b, neighbours, dist, counters=None):
+    """
+    Sweeps out from b, yielding every reachable handle together with the
+    minimum range needed to reach it from b, in increasing order of range.
+
+    This is Prim's algorithm, with the key of a handle being the largest
+    distance from b seen on the best path to it. Stop consuming it as soon as
+    the station you care about comes out.
+
+    :param b: The handle to start from.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: Returns the distance of a handle from b.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: A generator of (handle, minimum range) pairs.
+    """
+
+    # Every handle's distance is only worked out once.
+    dists = {b: dist(b)}
+    # The counter breaks ties, so the handles never have to be compared.
+    counter = 0
+    best = {b: dists[b]}
+    heap = [(best[b], counter, b)]
+    done = set()
+    expanded = relaxed = 0
+
+    try:
+        while heap:
+            key, _, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            yield u, key
+
+            expanded += 1
+            for v in neighbours(u):
+                relaxed += 1
+                if v in done:
+                    continue
+                d = dists.get(v)
+                if d is None:
+                    d = dists[v] = dist(v)
+                k = key if key > d else d
+                if k < best.get(v, math.inf):
+                    best[v] = k
+                    counter += 1
+                    heapq.heappush(heap, (k, counter, v))
+    finally:
+        if counters is not None:
+            counters.vertices_expanded += expanded
+            counters.edges_relaxed += relaxed
+            counters.distance_evals += len(dists)
+
+
+def minimum_range(b, s, neighbours, dist, counters=None):
+    """
+    Returns the minimum range required to go from b to s.
+    :param b: The handle to start from.
+    :param s: The handle to reach.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: Returns the distance of a handle from b.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: The minimum range, or None if s can't be reached at all.
+    """
+
+    for u, key in bottleneck_sweep(b, neighbours, dist, counters):
+        if u == s:
+            return key
+    return None
+
+
+def threshold_range(b, s, neighbours, dist, counters=None):
+    """
+    Returns the minimum range required to go from b to s, like
+    minimum_range, by raising a threshold step by step instead of sweeping
+    one handle at a time.
+
+    At each threshold everything reachable within it is flooded a layer at
+    a time, each layer in order of handle, and the next threshold is the
+    closest handle on the border of what was reached. So like
+    bfs_within_in_order the reads go forwards through a memory mapped file,
+    and only the handles reached and on the border are kept.
+
+    :param b: The handle to start from.
+    :param s: The handle to reach.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: Returns the distance of a handle from b.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: The minimum range, or None if s can't be reached at all.
+    """
+
+    expanded = relaxed = 0
+    threshold = dist(b)
+    reached = {b}
+    # The handles next to the reached ones but out of range, as a heap.
+    border = []
+    bordered = {}
+    layer = [b]
+
+    try:
+        while s not in reached:
+            while layer:
+                following = set()
+                for u in layer:
+                    expanded += 1
+                    for v in neighbours(u):
+                        relaxed += 1
+                        if v not in reached and v not in bordered:
+                            following.add(v)
+                layer = []
+                for v in sorted(following):
+                    d = dist(v)
+                    if d <= threshold:
+                        reached.add(v)
+                        layer.append(v)
+                    else:
+                        bordered[v] = d
+                        heapq.heappush(border, (d, v))
+                if s in reached:
+                    return threshold
+
+            if not border:
+                return None
+            threshold = border[0][0]
+            while border and border[0][0] <= threshold:
+                _, v = heapq.heappop(border)
+                del bordered[v]
+                reached.add(v)
+                layer.append(v)
+            layer.sort()
+        return threshold
+    finally:
+        if counters is not None:
+            counters.vertices_expanded += expanded
+            counters.edges_relaxed += relaxed
+            counters.distance_evals += len(reached) + len(bordered)
+
+
+def minimum_range_path(b, s, neighbours, dist, counters=None):
+    """
+    Returns the minimum range required to go from b to s, together with the
+    path with the fewest hops that gets there with that range.
+
+    The sweep is carried on past s until the range goes up, so it has found
+    every handle that can be reached with the minimum range. The BFS is then
+    restricted to those handles, without comparing any distances again.
+
+    :param b: The handle to start from.
+    :param s: The handle to reach.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: Returns the distance of a handle from b.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: The (range, LIST of handles) pair, or (None, None) if s can't be
+             reached at all.
+    """
+
+    reached = set()
+    result = None
+    sweep = bottleneck_sweep(b, neighbours, dist, counters)
+    for u, key in sweep:
+        if result is not None and key > result:
+            break
+        reached.add(u)
+        if u == s:
+            result = key
+    sweep.close()
+
+    if result is None:
+        return None, None
+    return result, bfs_within(b, s, neighbours, reached.__contains__,
+                              counters)
+
+
+def range_hop_frontier(b, s, neighbours, dist, counters=None):
+    """
+    Returns every Pareto optimal trade off between range and hops for going
+    from b to s: a bigger range can only be worth it if it saves hops.
+
+    The stations are added in the order the minimum range sweep reaches them,
+    so the admissible region grows one range at a time. The hop counts from
+    b are kept up to date as it grows (a new station can only make the others
+    closer), instead of running a BFS for every range. It stops once s is as
+    few hops away as it would be with an unlimited range.
+
+    :param b: The handle to start from.
+    :param s: The handle to reach.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: Returns the distance of a handle from b.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: The LIST of (range, hops, LIST of handles) tuples, in increasing
+             order of range and decreasing order of hops. Empty if s can't be
+             reached at all.
+    """
+
+    # The fewest hops possible, whatever the range.
+    shortest = bfs_within(b, s, neighbours, lambda v: True, counters)
+    if shortest is None:
+        return []
+    fewest = len(shortest) - 1
+
+    hops = {}
+    parents = {}
+    frontier = []
+    expanded = relaxed = 0
+
+    def add(u):
+        nonlocal expanded, relaxed
+        if u == b:
+            hops[b] = 0
+            parents[b] = None
+            return
+
+        # The sweep only reaches u through a station already added.
+        expanded += 1
+        best = math.inf
+        for w in neighbours(u):
+            relaxed += 1
+            if w in hops and hops[w] + 1 < best:
+                best = hops[w] + 1
+                parents[u] = w
+        hops[u] = best
+
+        # Pass the shortcut on to everything it makes closer.
+        queue = collections.deque([u])
+        while queue:
+            x = queue.popleft()
+            expanded += 1
+            h = hops[x] + 1
+            for w in neighbours(x):
+                relaxed += 1
+                if w in hops and hops[w] > h:
+                    hops[w] = h
+                    parents[w] = x
+                    queue.append(w)
+
+    def record(r):
+        # Only worth it if it saves hops over the smaller ranges.
+        if s in hops and (not frontier or hops[s] < frontier[-1][1]):
+            frontier.append((r, hops[s], trace_path(parents, s)))
+        return bool(frontier) and frontier[-1][1] == fewest
+
+    sweep = bottleneck_sweep(b, neighbours, dist, counters)
+    level = None
+    finished = False
+    for u, key in sweep:
+        if level is not None and key > level and record(level):
+            finished = True
+            break
+        level = key
+        add(u)
+    sweep.close()
+    if not finished:
+        record(level)
+
+    if counters is not None:
+        counters.vertices_expanded += expanded
+        counters.edges_relaxed += relaxed
+    return frontier
+
+
+def shortest_paths(b, targets, r, neighbours, dist, length, estimate=None,
+                   counters=None):
+    """
+    Find the shortest paths, by total edge length, from b to each of the
+    targets, such that every handle on the paths is within r of b.
+
+    This is Dijkstra's algorithm with a binary heap, stopping once every
+    target is settled. With one target, an estimate of the length left turns
+    it into A*: it must never be more than the real length left (the straight
+    line distance to the target is fine).
+
+    :param b: The handle to start from.
+    :param targets: The handles to reach.
+    :param r: The range to stay within.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: Returns the distance of a handle from b.
+    :param length: length(u, v) returns the length of the edge from u to v.
+    :param estimate: Optional, returns a lower bound on the length left from
+                     a handle to the only target.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: Dict of every reachable target to its (length, LIST of handles)
+             pair.
+    """
+
+    remaining = set(targets)
+    if estimate is None:
+        def estimate(v):
+            return 0
+    elif len(remaining) > 1:
+        raise ValueError("An estimate only works with a single target.")
+
+    results = {}
+    lengths = {b: 0}
+    parents = {b: None}
+    in_range = {b: True}
+    counter = 0
+    heap = [(estimate(b), counter, b)]
+    done = set()
+    expanded = relaxed = evals = 0
+
+    while heap and remaining:
+        _, _, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        if u in remaining:
+            remaining.discard(u)
+            results[u] = (lengths[u], trace_path(parents, u))
+
+        expanded += 1
+        for v in neighbours(u):
+            relaxed += 1
+            if v in done:
+                continue
+            ok = in_range.get(v)
+            if ok is None:
+                evals += 1
+                ok = in_range[v] = dist(v) <= r
+            if not ok:
+                continue
+            evals += 1
+            g = lengths[u] + length(u, v)
+            if g < lengths.get(v, math.inf):
+                lengths[v] = g
+                parents[v] = u
+                counter += 1
+                evals += 1
+                heapq.heappush(heap, (g + estimate(v), counter, v))
+
+    if counters is not None:
+        counters.vertices_expanded += expanded
+        counters.edges_relaxed += relaxed
+        counters.distance_evals += evals
+    return results
+
+
+########################################
+# Several base stations
+########################################
+
+def multi_bfs_path(bases, s, r, neighbours, dist, counters=None):
+    """
+    Find the path with the fewest hops from any of the bases to s, such that
+    every handle on the path is within r of the base it started from.
+
+    One BFS is run from all the bases at once. Which handles are in range
+    depends on the base, so the search is over (base, handle) pairs, and the
+    first pair to reach s is the best of all the bases.
+
+    :param bases: The handles to start from.
+    :param s: The handle to reach.
+    :param r: The range to stay within.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: dist(a, u) returns the distance of handle u from base a.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: The LIST of handles from a base to s, or None if there is no
+             path from any of them.
+    """
+
+    parents = {}
+    current = []
+    for a in bases:
+        if (a, a) not in parents:
+            parents[(a, a)] = None
+            current.append((a, a))
+        if a == s:
+            return [a]
+
+    expanded = relaxed = evals = 0
+    rejected = set()
+    found = None
+    while current and found is None:
+        following = []
+        for state in current:
+            a, u = state
+            expanded += 1
+            for v in neighbours(u):
+                relaxed += 1
+                pair = (a, v)
+                if pair in parents or pair in rejected:
+                    continue
+                evals += 1
+                if dist(a, v) > r:
+                    rejected.add(pair)
+                    continue
+                parents[pair] = state
+                if v == s:
+                    found = pair
+                    break
+                following.append(pair)
+            if found is not None:
+                break
+        current = following
+
+    if counters is not None:
+        counters.bfs_calls += 1
+        counters.vertices_expanded += expanded
+        counters.edges_relaxed += relaxed
+        counters.distance_evals += evals
+    if found is None:
+        return None
+    return [u for _, u in trace_path(parents, found)]
+
+
+def multi_minimum_range(bases, s, neighbours, dist, counters=None):
+    """
+    Returns the smallest minimum range from any of the bases to s, and the
+    base that achieves it.
+
+    One bottleneck sweep is run from all the bases at once, over (base,
+    handle) pairs, so the range of a pair is measured from its own base. The
+    first pair for s to come out is the answer.
+
+    :param bases: The handles to start from.
+    :param s: The handle to reach.
+    :param neighbours: Returns the handles next to a handle.
+    :param dist: dist(a, u) returns the distance of handle u from base a.
+    :param counters: Optional instrumentation Counters to add the work to.
+    :return: The (range, base) pair, or (None, None) if s can't be reached
+             from any of them.
+    """
+
+    counter = 0
+    best = {}
+    heap = []
+    for a in bases:
+        if (a, a) not in best:
+            best[(a, a)] = key = dist(a, a)
+            counter += 1
+            heap.append((key, counter, a, a))
+    heapq.heapify(heap)
+
+    done = set()
+    expanded = relaxed = 0
+    evals = len(heap)
+    result = (None, None)
+    while heap:
+        key, _, a, u = heapq.heappop(heap)
+        if (a, u) in done:
+            continue
+        done.add((a, u))
+        if u == s:
+            result = (key, a)
+            break
+
+        expanded += 1
+        for v in neighbours(u):
+            relaxed += 1
+            pair = (a, v)
+            if pair in done:
+                continue
+            evals += 1
+            d = dist(a, v)
+            k = key if key > d else d
+            if k < best.get(pair, math.inf):
+                best[pair] = k
+                counter += 1
+                heapq.heappush(heap, (k, counter, a, v))
+
+    if counters is not None:
+        counters.vertices_expanded += expanded
+        counters.edges_relaxed += relaxed
+        counters.distance_evals += evals
+    return result
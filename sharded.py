@@ -0,0 +1,636 @@
+"""
+Sharded Module
+==============
+
+The map cut into spatial tiles, each held by its own worker process, for
+maps too big to keep as Vertex and Edge objects in one process.
+
+The bounding box of the map is cut into tiles x tiles squares, and every
+station belongs to the shard of the tile it is in. A shard keeps its own
+stations in CSR form, plus a ghost copy (just the position and the owning
+shard) of every station in another tile that one of its stations has an
+edge to. So a shard can measure and expand everything next to its own
+stations, and only has to talk to the others to hand a search over the
+border.
+
+Every worker cuts its own shard out of the graph (memory mapping the file,
+for a graph file, or attaching to a copy in shared memory that is freed once
+every shard is built) and then lets go of it, so no worker holds the whole
+map. Besides the graph itself, the front-end (this process) only holds the
+box around the map and which tiles are in use. It works out the shard of a
+station from its position.
+
+The queries are run by the front-end, which only passes messages between
+the shards:
+
+    * find_emergency_range asks every shard for its furthest station at
+      once.
+    * find_path is a BFS one layer at a time. Each round every shard expands
+      its part of the layer, and the ghosts it reached are sent to their
+      owners as part of the next layer. Every shard keeps the parents of
+      its own stations, the path is traced back shard by shard.
+    * minimum_range steps a threshold up. At each threshold the shards flood
+      everything reachable within it, passing ghosts over until nobody has
+      anything left to send. Each shard reports the closest station on the
+      border of what it reached, and the smallest of those is the next
+      threshold. When only one shard is busy it keeps raising the threshold
+      itself (Prim's algorithm) for as long as it is below every other
+      shard's border, so a search that stays in one tile costs one message.
+
+Usage:
+    Not to be run as main, made from a graph or a graph file.
+
+Example:
+    with ShardedGraph.load("antarctica.graph", tiles=4) as sharded:
+        i, j = sharded.index(b_id), sharded.index(s_id)
+        r = sharded.minimum_range(i, j)
+"""
+import heapq
+import math
+import multiprocessing
+from array import array
+from collections import namedtuple
+
+import graphfile
+from flatgraph import FlatGraph, SharedGraphInfo
+from metrics import EUCLIDEAN
+
+
+# How the map is cut up: the box around the map, the tiles along each side,
+# and the shard of every tile that has stations in it.
+_Tiling = namedtuple("_Tiling", ["low_x", "low_y", "high_x", "high_y",
+                                 "tiles", "shards"])
+
+
+def _tile(tiling, x, y):
+    """
+    Returns the tile the position (x, y) is in.
+    """
+
+    def cut(value, low, high):
+        if high == low:
+            return 0
+        return min(int((value - low) / (high - low) * tiling.tiles),
+                   tiling.tiles - 1)
+
+    return cut(x, tiling.low_x, tiling.high_x) * tiling.tiles + \
+        cut(y, tiling.low_y, tiling.high_y)
+
+
+def _shard_of(tiling, x, y):
+    """
+    Returns the shard the station at (x, y) belongs to.
+    """
+    return tiling.shards[_tile(tiling, x, y)]
+
+
+def _partition(flat, tiles):
+    """
+    Works out how to cut the map up, going over the positions without
+    keeping anything per station.
+    :return: The _Tiling, and the number of shards (the tiles with stations
+             in them).
+    """
+
+    n = len(flat)
+    if n == 0:
+        return None, 0
+    xs, ys = flat.xs, flat.ys
+    tiling = _Tiling(min(xs), min(ys), max(xs), max(ys), tiles, {})
+    used = {_tile(tiling, xs[i], ys[i]) for i in range(n)}
+    # Number the tiles that have stations in them.
+    tiling.shards.update((t, k) for k, t in enumerate(sorted(used)))
+    return tiling, len(used)
+
+
+def _build_shard(flat, tiling, k):
+    """
+    Cuts shard k out of the graph, keeping only its own stations and their
+    ghosts.
+    :return: The _Shard.
+    """
+
+    xs, ys = flat.xs, flat.ys
+    owned = [i for i in range(len(flat))
+             if _shard_of(tiling, xs[i], ys[i]) == k]
+    local = {g: j for j, g in enumerate(owned)}
+    globals_ = array("q", owned)
+    ghost_owners = array("l")
+    offsets = array("q", [0])
+    targets = array("q")
+    for g in owned:
+        for w in flat.neighbours(g):
+            j = local.get(w)
+            if j is None:
+                j = local[w] = len(globals_)
+                globals_.append(w)
+                ghost_owners.append(_shard_of(tiling, xs[w], ys[w]))
+            targets.append(j)
+        offsets.append(len(targets))
+    return _Shard(len(owned), globals_,
+                  array("d", (xs[g] for g in globals_)),
+                  array("d", (ys[g] for g in globals_)),
+                  offsets, targets, ghost_owners, flat.metric, local)
+
+
+class _Shard:
+    """
+    The stations of one tile, and their ghosts. Runs in a worker process.
+
+    The stations are numbered locally, its own stations first and then the
+    ghosts. The queries work in global indices.
+    """
+
+    def __init__(self, owned, globals_, xs, ys, offsets, targets,
+                 ghost_owners, metric, local=None):
+        """
+        :param owned: How many of the stations are its own.
+        :param globals_: The global index of every local station.
+        :param xs: The X position of every local station.
+        :param ys: The Y position of every local station.
+        :param offsets: Where each own station's neighbours start in targets.
+        :param targets: The local neighbours of the own stations.
+        :param ghost_owners: The shard of every ghost.
+        :param metric: How distances are measured.
+        :param local: Optional, the local index of every global index.
+        """
+        self.owned = owned
+        self.globals = globals_
+        self.xs = xs
+        self.ys = ys
+        self.offsets = offsets
+        self.targets = targets
+        self.ghost_owners = ghost_owners
+        self.metric = metric
+        # Built on first use if not given.
+        self._local = local
+        self._points = None
+
+    def _local_index(self, g):
+        if self._local is None:
+            self._local = {g: j for j, g in enumerate(self.globals)}
+        return self._local.get(g)
+
+    def _neighbours(self, j):
+        return self.targets[self.offsets[j]:self.offsets[j + 1]]
+
+    def _owner(self, j):
+        return self.ghost_owners[j - self.owned]
+
+    def _dist_from(self, x, y):
+        """
+        Returns a function giving the distance of a local station from (x, y).
+        """
+
+        xs, ys = self.xs, self.ys
+        if self.metric == EUCLIDEAN:
+            def dist(j):
+                return math.sqrt(((xs[j] - x)**2) + ((ys[j] - y)**2))
+            return dist
+
+        if self._points is None:
+            project = self.metric.project
+            self._points = [project(px, py) for px, py in zip(xs, ys)]
+        points, kernel = self._points, self.metric.kernel
+        p = self.metric.project(x, y)
+
+        def dist(j):
+            return kernel(p, points[j])
+        return dist
+
+    def farthest(self, x, y):
+        """
+        Returns the largest distance from (x, y) to a station of its own.
+        """
+        dist = self._dist_from(x, y)
+        return max(dist(j) for j in range(self.owned))
+
+    def start(self, x, y, r, target):
+        """
+        Forgets the last query, and gets ready for one from (x, y).
+        :param r: The range, for find_path.
+        :param target: The global index of the station to reach.
+        """
+
+        measure = self._dist_from(x, y)
+        dists = {}
+
+        def dist(j):
+            d = dists.get(j)
+            if d is None:
+                d = dists[j] = measure(j)
+            return d
+
+        self._dist = dist
+        self._r = r
+        self._target = None
+        if target is not None:
+            j = self._local_index(target)
+            if j is not None and j < self.owned:
+                self._target = j
+        # Ghosts already handed to their owners.
+        self._sent = set()
+        # find_path: own station to the global index of its parent (-1 for
+        # the base), and its stations in the current layer.
+        self._parent = {}
+        self._layer = []
+        # minimum_range: own stations reached, and a heap of the own
+        # stations next to them that are out of range.
+        self._reached = set()
+        self._border = []
+
+    ########################################
+    # find_path
+    ########################################
+
+    def bfs_step(self, entries):
+        """
+        Expands one layer of the BFS.
+        :param entries: The (global index, parent) pairs of the own stations
+                        the other shards reached in this layer.
+        :return: (outbound, found, size), the ghosts reached as a dict of
+                 shard to (global index, parent) pairs, whether the target
+                 has been reached, and how many own stations are in the next
+                 layer.
+        """
+
+        parent = self._parent
+        layer = self._layer
+        for g, p in entries:
+            j = self._local_index(g)
+            if j not in parent:
+                parent[j] = p
+                layer.append(j)
+
+        r, dist, globals_ = self._r, self._dist, self.globals
+        outbound = {}
+        next_layer = []
+        for u in layer:
+            for k in self._neighbours(u):
+                if k in parent or k in self._sent or dist(k) > r:
+                    continue
+                if k < self.owned:
+                    parent[k] = globals_[u]
+                    next_layer.append(k)
+                else:
+                    self._sent.add(k)
+                    outbound.setdefault(self._owner(k), []).append(
+                        (globals_[k], globals_[u]))
+
+        self._layer = next_layer
+        found = self._target is not None and self._target in parent
+        return outbound, found, len(next_layer)
+
+    def trace(self, g):
+        """
+        Follows the parents back from own station g while they are its own.
+        :return: The LIST of global indices followed, and the parent it
+                 stopped at (-1 at the base).
+        """
+
+        chain = []
+        while g != -1:
+            j = self._local_index(g)
+            if j is None or j >= self.owned:
+                break
+            chain.append(g)
+            g = self._parent[j]
+        return chain, g
+
+    ########################################
+    # minimum_range
+    ########################################
+
+    def flood(self, threshold, seeds, ceiling):
+        """
+        Reaches everything within the threshold from the seeds and the
+        border, then keeps raising the threshold to its own closest border
+        station while that is below the ceiling and nothing needs sending.
+        :param threshold: The range to flood within.
+        :param seeds: The global indices of own stations the other shards
+                      reached.
+        :param ceiling: How far it may raise the threshold on its own.
+        :return: (outbound, found, low, threshold), the ghosts reached as a
+                 dict of shard to global indices, whether the target has
+                 been reached, the distance of its closest border station
+                 (inf if none), and the threshold it got to.
+        """
+
+        dist, reached, border = self._dist, self._reached, self._border
+        stack = []
+        for g in seeds:
+            j = self._local_index(g)
+            if j not in reached:
+                heapq.heappush(border, (dist(j), j))
+
+        outbound = {}
+        while True:
+            while border and border[0][0] <= threshold:
+                _, j = heapq.heappop(border)
+                if j not in reached:
+                    reached.add(j)
+                    stack.append(j)
+
+            while stack:
+                u = stack.pop()
+                for k in self._neighbours(u):
+                    if k >= self.owned:
+                        if k not in self._sent:
+                            self._sent.add(k)
+                            outbound.setdefault(self._owner(k), []).append(
+                                self.globals[k])
+                    elif k not in reached:
+                        d = dist(k)
+                        if d <= threshold:
+                            reached.add(k)
+                            stack.append(k)
+                        else:
+                            heapq.heappush(border, (d, k))
+
+            while border and border[0][1] in reached:
+                heapq.heappop(border)
+            low = border[0][0] if border else math.inf
+            found = self._target is not None and self._target in reached
+            if found or outbound or not low < ceiling:
+                return outbound, found, low, threshold
+            threshold = low
+
+
+def _serve(conn, source, tiling, k):
+    """
+    The loop of a worker process: builds shard k, then runs the shard's
+    methods it is sent until it is sent None. The whole graph is only open
+    while the shard is built.
+    :param source: The SharedGraphInfo of the graph in shared memory, or the
+                   (path, metric) of a graph file to memory map, to cut the
+                   shard out of.
+    """
+
+    try:
+        if isinstance(source, SharedGraphInfo):
+            flat = FlatGraph.attach(source)
+        else:
+            path, metric = source
+            flat = graphfile.read(path, mmap=True, metric=metric)
+        try:
+            shard = _build_shard(flat, tiling, k)
+        finally:
+            flat.close()
+    except Exception as e:
+        conn.send((False, e))
+        conn.close()
+        return
+    conn.send((True, None))
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        name, args = message
+        try:
+            conn.send((True, getattr(shard, name)(*args)))
+        except Exception as e:
+            conn.send((False, e))
+    conn.close()
+
+
+class ShardedGraph:
+    """
+    ShardedGraph Class
+    ------------------
+
+    A read only graph cut into spatial tiles, one worker process per tile.
+    All queries take and return vertex indices, as with FlatGraph.
+
+    Attributes:
+        * shards (int): The number of shards.
+        * last_rounds (int): How many rounds of messages the last query took.
+    """
+
+    def __init__(self, flat, tiles=2, processes=True, path=None):
+        """
+        Cuts up a FlatGraph and starts the workers. Every worker builds its
+        own shard, so this process only holds the graph it was given (memory
+        mapped, for a file) and how the map is cut up.
+        :param flat: The graph, as a FlatGraph.
+        :param tiles: The tiles along each side of the map.
+        :param processes: Run every shard in its own process. Without, the
+                          shards run in this process (for debugging).
+        :param path: Optional, the graph file flat was read from. The workers
+                     then map the file themselves. Without, the graph is
+                     placed in shared memory for them until their shards are
+                     built.
+        """
+
+        if tiles < 1:
+            raise ValueError("tiles must be at least 1")
+        self._flat = flat
+        self._tiling, self.shards = _partition(flat, tiles)
+        self.last_rounds = 0
+        self._workers = []
+        self._conns = []
+
+        if not processes:
+            self._local = [_build_shard(flat, self._tiling, k)
+                           for k in range(self.shards)]
+            return
+        self._local = None
+        shared = flat.to_shared_memory() if path is None else None
+        source = (path, flat.metric) if shared is None else shared.info
+        error = None
+        try:
+            for k in range(self.shards):
+                parent_conn, child_conn = multiprocessing.Pipe()
+                worker = multiprocessing.Process(
+                    target=_serve, args=(child_conn, source, self._tiling, k),
+                    daemon=True)
+                worker.start()
+                child_conn.close()
+                self._workers.append(worker)
+                self._conns.append(parent_conn)
+
+            # Wait for every shard to be built, they are built all at once.
+            for conn in self._conns:
+                ok, value = conn.recv()
+                if not ok and error is None:
+                    error = value
+        finally:
+            if shared is not None:
+                shared.close()
+        if error is not None:
+            self.close()
+            raise error
+
+    @classmethod
+    def from_graph(cls, graph, tiles=2, processes=True):
+        """
+        Shards a Graph.
+        :type graph: Graph
+        """
+        return cls(FlatGraph.from_graph(graph), tiles, processes)
+
+    @classmethod
+    def load(cls, path, tiles=2, processes=True, metric=None):
+        """
+        Shards a graph file. The front-end and every worker memory map the
+        file, and each worker only keeps its own shard, so no process holds
+        the whole map.
+        :param metric: Optional, how distances are measured (see metrics.py).
+        """
+        return cls(graphfile.read(path, mmap=True, metric=metric), tiles,
+                   processes, path)
+
+    def __len__(self):
+        return len(self._flat)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Stops the workers. The graph can't be used after this.
+        """
+
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join()
+        for conn in self._conns:
+            conn.close()
+        self._workers = []
+        self._conns = []
+        self._flat.close()
+
+    def index(self, vertex_id):
+        """
+        Returns the index of the vertex with the given Vertex.id.
+        """
+        return self._flat.index(vertex_id)
+
+    def shard_of(self, i):
+        """
+        Returns the shard vertex i belongs to.
+        """
+        return _shard_of(self._tiling, self._flat.xs[i], self._flat.ys[i])
+
+    def _call(self, calls):
+        """
+        Runs shard methods, all at once.
+        :param calls: Shard to (method name, args).
+        :return: Shard to what the method returned.
+        """
+
+        self.last_rounds += 1
+        if self._local is not None:
+            return {k: getattr(self._local[k], name)(*args)
+                    for k, (name, args) in calls.items()}
+
+        for k, message in calls.items():
+            self._conns[k].send(message)
+        results = {}
+        error = None
+        for k in calls:
+            ok, value = self._conns[k].recv()
+            if ok:
+                results[k] = value
+            elif error is None:
+                error = value
+        if error is not None:
+            raise error
+        return results
+
+    def _start(self, b, r=None, target=None):
+        self.last_rounds = 0
+        args = (self._flat.xs[b], self._flat.ys[b], r, target)
+        self._call({k: ("start", args) for k in range(self.shards)})
+
+    def find_emergency_range(self, v):
+        """
+        Returns the distance to the vertex furthest from vertex v.
+        """
+
+        self.last_rounds = 0
+        if not self.shards:
+            # Nobody to reach, as with Graph.find_emergency_range.
+            return 0
+        args = (self._flat.xs[v], self._flat.ys[v])
+        found = self._call({k: ("farthest", args) for k in range(self.shards)})
+        return max(found.values())
+
+    def find_path(self, b, s, r):
+        """
+        Returns the LIST of indices on a minimum hop path from b to s that
+        stays within range r of b, or None if there is no such path.
+        """
+
+        self._start(b, r, s)
+        owner = self.shard_of
+        inbound = {owner(b): [(b, -1)]}
+        busy = set()
+        found = False
+        while (inbound or busy) and not found:
+            calls = {k: ("bfs_step", (inbound.get(k, []),))
+                     for k in set(inbound) | busy}
+            inbound = {}
+            busy = set()
+            for k, (outbound, hit, size) in self._call(calls).items():
+                found = found or hit
+                if size:
+                    busy.add(k)
+                for shard, entries in outbound.items():
+                    inbound.setdefault(shard, []).extend(entries)
+        if not found:
+            return None
+
+        path = []
+        g = s
+        while g != -1:
+            k = owner(g)
+            chain, g = self._call({k: ("trace", (g,))})[k]
+            path.extend(chain)
+        path.reverse()
+        return path
+
+    def minimum_range(self, b, s):
+        """
+        Returns the minimum range required to go from b to s, or None if s
+        can't be reached.
+        """
+
+        self._start(b, None, s)
+        threshold = 0.0
+        lows = {}
+        inbound = {self.shard_of(b): [b]}
+        while True:
+            while inbound:
+                if len(inbound) == 1:
+                    # Nothing else going on, it may carry on by itself.
+                    (only,) = inbound
+                    ceiling = min((low for k, low in lows.items()
+                                   if k != only), default=math.inf)
+                else:
+                    ceiling = threshold
+                calls = {k: ("flood", (threshold, seeds, ceiling))
+                         for k, seeds in inbound.items()}
+                inbound = {}
+                found = False
+                for k, (outbound, hit, low, reached) in \
+                        self._call(calls).items():
+                    lows[k] = low
+                    threshold = max(threshold, reached)
+                    found = found or hit
+                    for shard, seeds in outbound.items():
+                        inbound.setdefault(shard, []).extend(seeds)
+                if found:
+                    return threshold
+
+            threshold = min(lows.values(), default=math.inf)
+            if threshold == math.inf:
+                return None
+            inbound = {k: [] for k, low in lows.items() if low <= threshold}
@@ -0,0 +1,229 @@
+"""
+Snapshot Module
+===============
+
+Immutable, versioned views of the graph, so readers never see a half applied
+move.
+
+A snapshot is a stack of layers. Each layer only holds the vertices that
+changed since the layer under it (their position, and the ids of their
+neighbours), so taking a snapshot costs as much as the number of vertices
+that changed, not the size of the map. Every layer below the top one is
+shared with older snapshots.
+
+To stop the stack getting tall, a new layer swallows the one under it
+whenever that one is not much bigger (much like a binary counter). Looking up
+a vertex then only walks O(log V) layers.
+
+Usage:
+    Not to be run as main, snapshots are made by Graph.snapshot().
+
+Example:
+    snap = G.snapshot()
+    # Safe to use from any thread, even while G keeps moving.
+    p = snap.find_path(b, s, r)
+"""
+import search
+
+
+class _Layer:
+    """
+    The vertices that changed between two snapshots.
+
+    Attributes:
+        * coords (dict): Vertex id to (vertex, x_pos, y_pos, point), where
+                         point is the position projected by the graph's
+                         metric, or None if the vertex was removed.
+        * adj (dict)   : Vertex id to the tuple of neighbouring ids, or None
+                         if the vertex was removed.
+        * parent (_Layer): The layer underneath, or None for the bottom.
+    """
+
+    __slots__ = ("coords", "adj", "parent")
+
+    def __init__(self, coords, adj, parent):
+        self.coords = coords
+        self.adj = adj
+        self.parent = parent
+
+    def size(self):
+        return len(self.coords) + len(self.adj)
+
+    @staticmethod
+    def stack(parent, coords, adj):
+        """
+        Puts the changes on top of the parent layer, merging with the layers
+        underneath while they are not much bigger than the changes.
+        :param parent: The current top layer (or None).
+        :param coords: The changed positions.
+        :param adj: The changed neighbours.
+        :return: The new top layer.
+        """
+
+        while parent is not None and \
+                parent.size() <= 2 * (len(coords) + len(adj)):
+            merged_coords = dict(parent.coords)
+            merged_coords.update(coords)
+            merged_adj = dict(parent.adj)
+            merged_adj.update(adj)
+            coords, adj = merged_coords, merged_adj
+            parent = parent.parent
+
+        if parent is None:
+            # Nothing underneath, so the removals don't need remembering.
+            coords = {i: c for i, c in coords.items() if c is not None}
+            adj = {i: a for i, a in adj.items() if a is not None}
+
+        return _Layer(coords, adj, parent)
+
+    def find(self, table, i):
+        """
+        Looks up vertex i, starting at this layer and walking down.
+        :param table: Either "coords" or "adj".
+        :param i: The vertex id.
+        :return: The stored value, or None if the vertex doesn't exist.
+        """
+
+        layer = self
+        while layer is not None:
+            values = getattr(layer, table)
+            if i in values:
+                return values[i]
+            layer = layer.parent
+        return None
+
+
+class GraphSnapshot:
+    """
+    GraphSnapshot Class
+    -------------------
+
+    A read only copy of the graph as it was at one version. All queries are
+    answered with the positions and edges of that version, so any number of
+    threads can use it while the graph itself keeps changing.
+
+    The vertices handed back are the live Vertex objects, their x_pos and
+    y_pos may have moved on since. Use position(v) for the snapshot's view.
+
+    Attributes:
+        * version (int): The version of the graph this is a copy of.
+    """
+
+    def __init__(self, top, version, count, metric):
+        """
+        Made by Graph.snapshot(), not meant to be called directly.
+        :param top: The top layer.
+        :param version: The graph version.
+        :param count: The number of vertices at that version.
+        :param metric: The graph's metric, the layers hold its points.
+        """
+        self._top = top
+        self.version = version
+        self._count = count
+        self._kernel = metric.kernel
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, v):
+        return v.id is not None and self._top.find("coords", v.id) is not None
+
+    def _entry(self, v):
+        """
+        Returns the (vertex, x_pos, y_pos, point) stored for v.
+        """
+
+        entry = None if v.id is None else self._top.find("coords", v.id)
+        if entry is None:
+            raise ValueError("Vertex {} is not in this snapshot!".format(v))
+        return entry
+
+    def _ids(self):
+        """
+        Returns every vertex id alive in this snapshot.
+        """
+
+        seen = set()
+        alive = []
+        layer = self._top
+        while layer is not None:
+            for i, entry in layer.coords.items():
+                if i not in seen:
+                    seen.add(i)
+                    if entry is not None:
+                        alive.append(i)
+            layer = layer.parent
+        return alive
+
+    def _neighbours(self, i):
+        return self._top.find("adj", i) or ()
+
+    def _dist_from(self, b):
+        """
+        Returns a function giving the distance of a vertex id from vertex b.
+        """
+
+        p = self._entry(b)[3]
+        top = self._top
+        kernel = self._kernel
+
+        def dist(i):
+            return kernel(p, top.find("coords", i)[3])
+
+        return dist
+
+    def _vertex(self, i):
+        return self._top.find("coords", i)[0]
+
+    def vertices(self):
+        """
+        Returns the LIST of vertices in this snapshot.
+        """
+        return [self._vertex(i) for i in self._ids()]
+
+    def position(self, v):
+        """
+        Returns the (x_pos, y_pos) of v in this snapshot.
+        """
+        _, x, y, _ = self._entry(v)
+        return x, y
+
+    def neighbours(self, v):
+        """
+        Returns the LIST of vertices connected to v in this snapshot.
+        """
+        self._entry(v)
+        return [self._vertex(i) for i in self._neighbours(v.id)]
+
+    def distance(self, u, v):
+        """
+        The distance between u and v in this snapshot, measured by the
+        graph's metric.
+        """
+        return self._kernel(self._entry(u)[3], self._entry(v)[3])
+
+    def find_emergency_range(self, v):
+        """
+        Returns the distance to the vertex W that is furthest from V.
+        """
+        return search.farthest(self._ids(), self._dist_from(v))
+
+    def find_path(self, b, s, r):
+        """
+        Find a path from vertex B to vertex S, such that the distance from B
+        to every vertex in the path is within R, or None if there is none.
+        """
+        self._entry(s)
+        p = search.bfs_path(b.id, s.id, r, self._neighbours,
+                            self._dist_from(b))
+        if p is None:
+            return None
+        return [self._vertex(i) for i in p]
+
+    def minimum_range(self, b, s):
+        """
+        Returns the minimum range required to go from Vertex B to Vertex S.
+        """
+        self._entry(s)
+        return search.minimum_range(b.id, s.id, self._neighbours,
+                                    self._dist_from(b))
@@ -0,0 +1,372 @@
+"""
+Spatial Module
+==============
+
+A uniform grid over the map, to find the stations near a point without
+looking at every station.
+
+The map is cut into square cells, and every cell keeps the ids of the
+stations in it. Finding the stations within r of a point only looks at the
+cells the circle overlaps, so with cells about as big as the usual query
+range the cost is the number of stations found, not the size of the map.
+Moving a station only touches its old and new cell.
+
+Without a cell width the grid picks one itself, aiming for a couple of
+stations per cell. It picks again as soon as the number of stations has
+doubled or dropped to a quarter, so inserts and removals pay O(1) amortised
+for it, and the cells stay small for the queries and the taken spot checks.
+
+SphereIndex does the same for points on the unit sphere (the Haversine
+metric). Every point goes on the face of a cube around the sphere whose axis
+it is closest to, and each face keeps a GridIndex over the other two
+coordinates. Dropping a coordinate never brings two points further apart,
+so a point within chord c of another is within c of it on the face's grid,
+and the coordinate dropped is always at least 1/sqrt(3), so the grid doesn't
+squash the sphere much.
+
+Usage:
+    Not to be run as main, used by the graph to answer the range and nearest
+    station queries, and to build and maintain the edges of a proximity
+    graph.
+
+Example:
+    grid = GridIndex(5)
+    grid.insert(0, 1.5, 2.0)
+    grid.within(0, 0, 3)  # [0]
+    grid.nearest(0, 0, 1)  # [(2.5, 0)]
+"""
+import heapq
+import math
+
+# How many stations an automatic grid aims to have in each cell.
+_PER_CELL = 2
+# The automatic grid doesn't bother picking a width below this many stations.
+_SMALL = 16
+# Every point on a face of the SphereIndex has at least this big a coordinate
+# along the face's axis (less a bit for rounding).
+_FACE = 1 / math.sqrt(3) - 1e-9
+
+
+class GridIndex:
+    """
+    GridIndex Class
+    ---------------
+
+    Station ids bucketed by square cells of the map.
+
+    Attributes:
+        * cell (float): The width of a cell.
+    """
+
+    def __init__(self, cell=None):
+        """
+        :param cell: The width of a cell, should be about the range of the
+                     usual query. None picks it automatically.
+        """
+
+        if cell is not None and not cell > 0:
+            raise ValueError("The cell width must be positive.")
+        self._auto = cell is None
+        self.cell = 1.0 if cell is None else cell
+        # Cell to the set of ids in it, and id to its position.
+        self._cells = {}
+        self._positions = {}
+        # A box around every station, it only grows between rebuilds.
+        self._box = None
+        # The automatic grid picks its width again outside of these sizes.
+        self._rebuild_at = _SMALL
+        self._shrink_at = 0
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, i):
+        return i in self._positions
+
+    def _key(self, x, y):
+        return math.floor(x / self.cell), math.floor(y / self.cell)
+
+    def insert(self, i, x, y):
+        """
+        Adds the station with id i at (x, y).
+        """
+
+        self._positions[i] = (x, y)
+        self._cells.setdefault(self._key(x, y), set()).add(i)
+        self._grow(x, y)
+        self._refresh()
+
+    def remove(self, i):
+        """
+        Forgets the station with id i.
+        """
+
+        x, y = self._positions.pop(i)
+        key = self._key(x, y)
+        bucket = self._cells[key]
+        bucket.discard(i)
+        if not bucket:
+            del self._cells[key]
+        self._refresh()
+
+    def move(self, i, x, y):
+        """
+        Moves the station with id i to (x, y).
+        """
+
+        old = self._key(*self._positions[i])
+        new = self._key(x, y)
+        self._positions[i] = (x, y)
+        self._grow(x, y)
+        if old != new:
+            bucket = self._cells[old]
+            bucket.discard(i)
+            if not bucket:
+                del self._cells[old]
+            self._cells.setdefault(new, set()).add(i)
+
+    def _grow(self, x, y):
+        if self._box is None:
+            self._box = [x, y, x, y]
+            return
+        box = self._box
+        if x < box[0]:
+            box[0] = x
+        elif x > box[2]:
+            box[2] = x
+        if y < box[1]:
+            box[1] = y
+        elif y > box[3]:
+            box[3] = y
+
+    def _refresh(self):
+        """
+        Picks the cell width again if the number of stations has changed a
+        lot since it was last picked.
+        """
+
+        n = len(self._positions)
+        if self._auto and not self._shrink_at <= n < self._rebuild_at:
+            self._rebuild()
+
+    def _rebuild(self):
+        """
+        Picks the cell width again for the stations there are now, and the
+        box around them.
+        """
+
+        n = len(self._positions)
+        self._rebuild_at = max(_SMALL, 2 * n)
+        self._shrink_at = n // 4
+        if n == 0:
+            self._box = None
+            return
+
+        xs = [x for x, _ in self._positions.values()]
+        ys = [y for _, y in self._positions.values()]
+        self._box = [min(xs), min(ys), max(xs), max(ys)]
+        width = self._box[2] - self._box[0]
+        height = self._box[3] - self._box[1]
+        if width > 0 and height > 0:
+            self.cell = math.sqrt(_PER_CELL * width * height / n)
+        elif width > 0 or height > 0:
+            # All in a line.
+            self.cell = _PER_CELL * max(width, height) / n
+        else:
+            self.cell = 1.0
+
+        self._cells = {}
+        for i, (x, y) in self._positions.items():
+            self._cells.setdefault(self._key(x, y), set()).add(i)
+
+    def covers(self, x, y, r):
+        """
+        Returns whether every station is sure to be within r of (x, y).
+        """
+
+        if self._box is None:
+            return True
+        low_x, low_y, high_x, high_y = self._box
+        far_x = max(x - low_x, high_x - x)
+        far_y = max(y - low_y, high_y - y)
+        return far_x * far_x + far_y * far_y <= r * r
+
+    def at(self, x, y):
+        """
+        Returns the id of the station exactly at (x, y), or None.
+        """
+
+        for i in self._cells.get(self._key(x, y), ()):
+            if self._positions[i] == (x, y):
+                return i
+        return None
+
+    def within(self, x, y, r):
+        """
+        Returns the ids of the stations within r of (x, y), in no particular
+        order.
+        """
+
+        self._refresh()
+        low_x, low_y = self._key(x - r, y - r)
+        high_x, high_y = self._key(x + r, y + r)
+        span = (high_x - low_x + 1) * (high_y - low_y + 1)
+
+        if span <= len(self._cells):
+            buckets = (self._cells.get((cx, cy))
+                       for cx in range(low_x, high_x + 1)
+                       for cy in range(low_y, high_y + 1))
+        else:
+            # A huge circle, cheaper to go through the cells that are used.
+            buckets = (bucket for (cx, cy), bucket in self._cells.items()
+                       if low_x <= cx <= high_x and low_y <= cy <= high_y)
+
+        found = []
+        positions = self._positions
+        r2 = r * r
+        for bucket in buckets:
+            if not bucket:
+                continue
+            for i in bucket:
+                px, py = positions[i]
+                if (px - x) ** 2 + (py - y) ** 2 <= r2:
+                    found.append(i)
+        return found
+
+    def nearest(self, x, y, k, skip=None):
+        """
+        Returns the k stations nearest to (x, y).
+
+        Looks at the cells in rings around the cell of (x, y), until the k
+        best found are all closer than anything in the next ring can be.
+
+        :param skip: Optional id of a station to leave out.
+        :return: The LIST of (distance, id) pairs, nearest first.
+        """
+
+        self._refresh()
+        total = len(self._positions) - (skip in self._positions)
+        k = min(k, total)
+        if k <= 0:
+            return []
+
+        positions = self._positions
+        cx, cy = self._key(x, y)
+        # The k best so far, as a max heap on the squared distance.
+        best = []
+        seen = 0
+        ring = 0
+        while seen < total:
+            if (2 * ring + 1) ** 2 > 4 * len(self._cells):
+                # Far from everything, cheaper to look at all of them.
+                return self._nearest_all(x, y, k, skip)
+
+            if ring == 0:
+                keys = [(cx, cy)]
+            else:
+                keys = [(cx + dx, cy + dy)
+                        for dx in range(-ring, ring + 1)
+                        for dy in (-ring, ring)]
+                keys += [(cx + dx, cy + dy)
+                         for dx in (-ring, ring)
+                         for dy in range(-ring + 1, ring)]
+            for key in keys:
+                for i in self._cells.get(key, ()):
+                    if i == skip:
+                        continue
+                    seen += 1
+                    px, py = positions[i]
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if len(best) < k:
+                        heapq.heappush(best, (-d2, i))
+                    elif d2 < -best[0][0]:
+                        heapq.heapreplace(best, (-d2, i))
+
+            # Anything not seen yet is outside the rings looked at.
+            bound = ring * self.cell
+            if len(best) == k and -best[0][0] <= bound * bound:
+                break
+            ring += 1
+
+        return sorted((math.sqrt(-d2), i) for d2, i in best)
+
+    def _nearest_all(self, x, y, k, skip):
+        found = ((math.sqrt((px - x) ** 2 + (py - y) ** 2), i)
+                 for i, (px, py) in self._positions.items() if i != skip)
+        return heapq.nsmallest(k, found)
+
+
+class SphereIndex:
+    """
+    SphereIndex Class
+    -----------------
+
+    Station ids of unit vectors, bucketed by the faces of a cube around the
+    sphere, with a GridIndex per face.
+    """
+
+    def __init__(self):
+        # (axis, sign) of a face to its grid, and id to the face it is on.
+        self._grids = {}
+        self._faces = {}
+
+    def __len__(self):
+        return len(self._faces)
+
+    @staticmethod
+    def _face(p):
+        axis = max(range(3), key=lambda a: abs(p[a]))
+        return axis, 1 if p[axis] >= 0 else -1
+
+    @staticmethod
+    def _flat(p, axis):
+        """
+        Returns p without the coordinate along axis.
+        """
+        return (p[1], p[2]) if axis == 0 else \
+            (p[0], p[2]) if axis == 1 else (p[0], p[1])
+
+    def insert(self, i, p):
+        """
+        Adds the station with id i at the unit vector p.
+        """
+
+        face = self._face(p)
+        self._faces[i] = face
+        grid = self._grids.get(face)
+        if grid is None:
+            grid = self._grids[face] = GridIndex()
+        grid.insert(i, *self._flat(p, face[0]))
+
+    def remove(self, i):
+        """
+        Forgets the station with id i.
+        """
+
+        self._grids[self._faces.pop(i)].remove(i)
+
+    def move(self, i, p):
+        """
+        Moves the station with id i to the unit vector p.
+        """
+
+        face = self._face(p)
+        if face == self._faces[i]:
+            self._grids[face].move(i, *self._flat(p, face[0]))
+        else:
+            self.remove(i)
+            self.insert(i, p)
+
+    def within(self, p, c):
+        """
+        Returns the ids of every station within chord c of the unit vector p,
+        and maybe some a little further, in no particular order.
+        """
+
+        found = []
+        for (axis, sign), grid in self._grids.items():
+            # Nothing on a face is within c if p is too far off its axis.
+            if sign * p[axis] + c < _FACE:
+                continue
+            found.extend(grid.within(*self._flat(p, axis), c))
+        return found
@@ -0,0 +1,90 @@
+"""
+Tests the batch minimum_range solver against one minimum_range at a time.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_batch.py
+"""
+
+import math
+import unittest
+import timeout_decorator
+
+from graph import Graph
+from batch import minimum_range_matrix
+
+# Tolerance for the threshold of distances
+TOLERANCE_THRESHOLD = 0.001
+
+
+def approx_value(a, b):
+    """
+    Asserts that the value of a and b are approximately close.
+    :param a: A number to compare to.
+    :param b: A number to compare against.
+    :return: The bool if they're approximate
+    """
+
+    return math.isclose(a, b, abs_tol=TOLERANCE_THRESHOLD)
+
+
+def make_ring():
+    """
+    Builds the ring of stations around m from the interaction tests.
+    """
+
+    G = Graph()
+    coords = [(0, 0), (0, 7), (7, 7), (7, 0), (7, -7), (0, -7), (-7, -7),
+              (-7, 0), (-7, 7)]
+    vs = [G.insert_vertex(x, y) for x, y in coords]
+    for u, v in zip(vs, vs[1:]):
+        G.insert_edge(u, v)
+    G.insert_edge(vs[2], vs[7])
+    return G, vs
+
+
+class TestBatch(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_matrix_matches_minimum_range(self):
+        G, vs = make_ring()
+
+        rows = minimum_range_matrix(G, vs, vs, max_workers=1)
+
+        for i, b in enumerate(vs):
+            for j, s in enumerate(vs):
+                expected = G.minimum_range(b, s)
+                assert approx_value(rows[i][j], expected), \
+                    "[{}, {}] Expected: {} | Got: {}".format(
+                        b, s, expected, rows[i][j])
+
+    @timeout_decorator.timeout(20)
+    def test_matrix_with_worker_processes(self):
+        G, vs = make_ring()
+
+        expected = minimum_range_matrix(G, vs, vs[::-1], max_workers=1)
+        rows = minimum_range_matrix(G, vs, vs[::-1], max_workers=2,
+                                    chunk_size=4)
+
+        assert [list(r) for r in rows] == [list(r) for r in expected], \
+            "Workers disagree: {} | {}".format(rows, expected)
+
+        rows = minimum_range_matrix(G, vs, vs[::-1], max_workers=2,
+                                    chunk_size=3, shared=False)
+
+        assert [list(r) for r in rows] == [list(r) for r in expected], \
+            "Pickled workers disagree: {} | {}".format(rows, expected)
+
+    @timeout_decorator.timeout(1)
+    def test_unreachable_station_is_inf(self):
+        G, vs = make_ring()
+        lonely = G.insert_vertex(100, 100)
+
+        rows = minimum_range_matrix(G, [vs[0]], [lonely, vs[1]], max_workers=1)
+
+        assert rows[0][0] == math.inf, "Expected inf, got {}".format(rows[0][0])
+        assert approx_value(rows[0][1], 7), "Expected 7, got {}".format(rows[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
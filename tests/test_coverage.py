@@ -0,0 +1,80 @@
+"""
+Tests the coverage curve against a find_path for every station at every
+range.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_coverage.py
+"""
+
+import unittest
+import timeout_decorator
+
+from coveragecurve import CoverageCurve
+from graph import Graph
+from benchmarks.generators import random_geometric
+
+
+def reachable(G, b, r):
+    """
+    Counts the stations other than b that find_path reaches within r.
+    """
+
+    return sum(1 for s in G._vertices
+               if s is not b and G.find_path(b, s, r) is not None)
+
+
+class TestCoverageCurve(unittest.TestCase):
+
+    @timeout_decorator.timeout(20)
+    def test_matches_find_path(self):
+        G, vs = random_geometric(150, seed=1, degree=5)
+        b = vs[0]
+        curve = G.coverage_curve(b)
+
+        # Right on every step, just below it, and in between.
+        steps = curve.steps()
+        ranges = [r for r, _ in steps[::10]]
+        ranges += [r - 1e-9 for r in ranges] + [0, 0.25, 0.7, 100]
+        for r in ranges:
+            assert curve(r) == reachable(G, b, r), \
+                "Range {}: curve {}, find_path {}".format(
+                    r, curve(r), reachable(G, b, r))
+
+        counts = [c for _, c in steps]
+        assert counts == sorted(counts) and \
+            [r for r, _ in steps] == sorted(r for r, _ in steps), \
+            "The steps should go up"
+        assert curve.total == counts[-1] == \
+            sum(1 for s in vs[1:] if G.minimum_range(b, s) is not None), \
+            "Expected every reachable station in the end"
+
+    @timeout_decorator.timeout(1)
+    def test_small_map(self):
+        G = Graph()
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(3, 4)
+        C = G.insert_vertex(0, 5)
+        D = G.insert_vertex(6, 8)
+        G.insert_vertex(1, 1)  # Never connected
+        G.insert_edge(A, B)
+        G.insert_edge(B, C)
+        G.insert_edge(B, D)
+
+        curve = G.coverage_curve(A)
+        # B and C both need 5, D needs 10.
+        assert curve.steps() == [(5, 2), (10, 3)], \
+            "Expected: {} | Got: {}".format([(5, 2), (10, 3)], curve.steps())
+        assert [curve(r) for r in (0, 4.9, 5, 9, 10, 11)] == \
+            [0, 0, 2, 2, 3, 3], "Wrong counts"
+        assert [curve.range_for(n) for n in (0, 1, 2, 3, 4)] == \
+            [0.0, 5, 5, 10, None], "Wrong ranges"
+        assert curve.total == 3 and len(curve) == 2, "Expected 2 steps"
+
+        alone = CoverageCurve(A, [])
+        assert alone(100) == 0 and alone.range_for(1) is None, \
+            "Nothing to reach"
+
+
+if __name__ == "__main__":
+    unittest.main()
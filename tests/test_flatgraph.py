@@ -0,0 +1,121 @@
+"""
+Tests the flat array copy of the graph, in normal and shared memory.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_flatgraph.py
+"""
+
+import math
+import pickle
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import timeout_decorator
+
+from graph import Graph
+from flatgraph import FlatGraph
+
+# Tolerance for the threshold of distances
+TOLERANCE_THRESHOLD = 0.001
+
+
+def approx_value(a, b):
+    """
+    Asserts that the value of a and b are approximately close.
+    :param a: A number to compare to.
+    :param b: A number to compare against.
+    :return: The bool if they're approximate
+    """
+
+    return math.isclose(a, b, abs_tol=TOLERANCE_THRESHOLD)
+
+
+def make_layers():
+    """
+    Builds the usual layered graph.
+    :return: The graph and the vertices A to F.
+    """
+
+    G = Graph()
+
+    A = G.insert_vertex(0, 0)
+    B = G.insert_vertex(2, 0)
+    C = G.insert_vertex(2, 20)
+    D = G.insert_vertex(2, 6)
+    E = G.insert_vertex(3, 3)
+    F = G.insert_vertex(4, 6)
+
+    G.insert_edge(A, B)
+    G.insert_edge(A, C)
+    G.insert_edge(A, D)
+    G.insert_edge(C, E)
+    G.insert_edge(C, F)
+    G.insert_edge(D, F)
+
+    return G, (A, B, C, D, E, F)
+
+
+def query_in_worker(info):
+    """
+    Attaches to the shared graph in a worker process and runs the queries.
+    """
+
+    flat = FlatGraph.attach(info)
+    try:
+        return (flat.find_path(0, 5, 7.7), flat.minimum_range(0, 5),
+                flat.find_emergency_range(0))
+    finally:
+        flat.close()
+
+
+class TestFlatGraph(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_flat_queries_match_graph(self):
+        G, vs = make_layers()
+        A, B, C, D, E, F = vs
+        flat = FlatGraph.from_graph(G)
+        i = {v: flat.index(v.id) for v in vs}
+
+        p = flat.find_path(i[A], i[F], 7.7)
+        assert p == [i[A], i[D], i[F]], "Flat path was {}".format(p)
+        assert flat.find_path(i[A], i[F], 3) is None, "Path out of range"
+
+        expected = G.minimum_range(A, F)
+        res = flat.minimum_range(i[A], i[F])
+        assert approx_value(expected, res), \
+            "[minimum_range] Expected: {} | Got: {}".format(expected, res)
+
+        expected = G.find_emergency_range(E)
+        res = flat.find_emergency_range(i[E])
+        assert approx_value(expected, res), \
+            "[emergency_range] Expected: {} | Got: {}".format(expected, res)
+
+        copy = pickle.loads(pickle.dumps(flat))
+        assert copy.find_path(i[A], i[F], 7.7) == p, "Pickled copy differs"
+
+    @timeout_decorator.timeout(20)
+    def test_shared_memory_workers(self):
+        G, vs = make_layers()
+        flat = FlatGraph.from_graph(G)
+        expected = (flat.find_path(0, 5, 7.7), flat.minimum_range(0, 5),
+                    flat.find_emergency_range(0))
+
+        with flat.to_shared_memory() as shared:
+            local = shared.graph
+            assert local.find_path(0, 5, 7.7) == expected[0], \
+                "Shared view path differs"
+            with self.assertRaises(TypeError):
+                local.xs[0] = 5
+
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                results = list(pool.map(query_in_worker, [shared.info] * 3))
+
+        for res in results:
+            assert res == expected, \
+                "Worker got {}, expected {}".format(res, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,13 @@ Test more complex interaction between functions, e.g. path + move + path
 """
 
 import math
+import random
 import unittest
 import timeout_decorator
 
 from vertex import Vertex
-from graph import Graph
+from graph import Graph, EdgeAlreadyExists
+from benchmarks.generators import random_geometric
 
 # Tolerance for the threshold of distances
 TOLERANCE_THRESHOLD=0.001
@@ -541,3 +543,105 @@ class TestComplexInteractions(unittest.TestCase):
         p = G.find_path(M, D, 2)
 
         assert p is None, "Path {} was returned when it is outside of range".format(p)
+
+    @timeout_decorator.timeout(10)
+    def test_range_hop_frontier_matches_find_path(self):
+        G, vs = random_geometric(120, seed=3, degree=4)
+        b = vs[0]
+
+        # Some long edges, so a bigger range can save hops.
+        rng = random.Random(3)
+        for _ in range(40):
+            u, v = rng.sample(vs, 2)
+            try:
+                G.insert_edge(u, v)
+            except EdgeAlreadyExists:
+                pass
+
+        for s in vs[1:20]:
+            # Brute force: find_path at every range that could matter.
+            expected = []
+            for r in sorted({G.distance(b, v) for v in vs}):
+                p = G.find_path(b, s, r)
+                if p is not None and (not expected or
+                                      len(p) - 1 < expected[-1][1]):
+                    expected.append((r, len(p) - 1))
+
+            frontier = G.range_hop_frontier(b, s)
+            got = [(r, hops) for r, hops, _ in frontier]
+            assert len(got) == len(expected) and all(
+                approx_value(r1, r2) and h1 == h2
+                for (r1, h1), (r2, h2) in zip(got, expected)), \
+                "Frontier to {} was {}, expected {}".format(s, got, expected)
+
+            for r, hops, path in frontier:
+                check_is_path(G, b, path, r)
+                assert len(path) - 1 == hops, \
+                    "Path {} doesn't have {} hops".format(path, hops)
+
+    @timeout_decorator.timeout(10)
+    def test_several_bases_match_each_base(self):
+        G, vs = random_geometric(150, seed=5, degree=4)
+        bases = vs[:5]
+
+        for s in vs[::7]:
+            # Each base on its own, the combined search must agree.
+            ranges = [G.minimum_range(b, s) for b in bases]
+            r, b = G.minimum_range_from_bases(bases, s)
+            assert approx_value(r, min(ranges)), \
+                "Range to {} was {}, expected {}".format(s, r, min(ranges))
+            assert approx_value(G.minimum_range(b, s), r), \
+                "Base {} needs {} to reach {}, not {}".format(
+                    b, G.minimum_range(b, s), s, r)
+
+            limit = sorted(ranges)[len(ranges) // 2]
+            paths = [G.find_path(b, s, limit) for b in bases]
+            fewest = min(len(p) for p in paths if p is not None)
+            p = G.find_path_from_bases(bases, s, limit)
+            assert p is not None and len(p) == fewest, \
+                "Path {} to {} wasn't {} long".format(p, s, fewest)
+            assert p[0] in bases, "Path {} doesn't start at a base".format(p)
+            check_is_path(G, p[0], p, limit)
+
+    @timeout_decorator.timeout(1)
+    def test_several_bases_unreachable(self):
+        G = Graph()
+
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(5, 0)
+        C = G.insert_vertex(9, 9)
+        D = G.insert_vertex(6, 0)
+        G.insert_edge(B, D)
+
+        assert G.minimum_range_from_bases([A, B], C) == (None, None), \
+            "C can't be reached from anywhere"
+        assert G.find_path_from_bases([A, B], C, 100) is None, \
+            "C can't be reached from anywhere"
+        assert G.find_path_from_bases([A, B], D, 1) == [B, D], \
+            "D is one hop from B"
+        assert G.find_path_from_bases([A, B], B, 0) == [B], \
+            "B is a base itself"
+        assert G.minimum_range_from_bases([A, B], D) == (1, B), \
+            "D needs range 1 from B"
+
+    @timeout_decorator.timeout(10)
+    def test_shortest_path_astar_matches_batched(self):
+        G, vs = random_geometric(200, seed=7, degree=5)
+        b = vs[0]
+        r = G.find_emergency_range(b) * 0.6
+        targets = vs[::5]
+
+        batched = G.find_shortest_paths(b, targets, r)
+        for s, (length, p) in zip(targets, batched):
+            one = G.find_shortest_path(b, s, r)
+            hops = G.find_path(b, s, r)
+            assert (one[1] is None) == (hops is None) == (p is None), \
+                "Reachability of {} disagrees".format(s)
+            if p is None:
+                continue
+            assert approx_value(one[0], length), \
+                "A* found {} to {}, Dijkstra {}".format(one[0], s, length)
+            check_is_path(G, b, one[1], r)
+            walked = sum(G.distance(u, v) for u, v in zip(p, p[1:]))
+            assert approx_value(walked, length), \
+                "Path {} is {} long, not {}".format(p, walked, length)
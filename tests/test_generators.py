@@ -0,0 +1,60 @@
+"""
+Tests the map generators used by the benchmarks.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_generators.py
+"""
+
+import unittest
+import timeout_decorator
+
+from benchmarks.generators import GENERATORS
+
+
+def is_connected(G, vs):
+    """
+    Checks every vertex can be reached from the first one.
+    """
+
+    seen = {vs[0].id}
+    stack = [vs[0]]
+    while stack:
+        u = stack.pop()
+        for e in u.edges:
+            w = G.opposite(e, u)
+            if w.id not in seen:
+                seen.add(w.id)
+                stack.append(w)
+    return len(seen) == len(vs)
+
+
+class TestGenerators(unittest.TestCase):
+
+    @timeout_decorator.timeout(10)
+    def test_generators_make_connected_maps(self):
+        for name, generator in GENERATORS.items():
+            for n in (1, 2, 50, 500):
+                G, vs = generator(n, seed=3)
+                assert len(vs) == n and len(G._vertices) == n, \
+                    "{} made {} vertices, expected {}".format(name, len(vs), n)
+                assert is_connected(G, vs), \
+                    "{} made a disconnected map of {}".format(name, n)
+                assert len({(v.x_pos, v.y_pos) for v in vs}) == n, \
+                    "{} put two stations on the same spot".format(name)
+
+    @timeout_decorator.timeout(10)
+    def test_generators_are_seeded(self):
+        for name, generator in GENERATORS.items():
+            _, first = generator(300, seed=7)
+            _, again = generator(300, seed=7)
+            assert [(v.x_pos, v.y_pos) for v in first] == \
+                [(v.x_pos, v.y_pos) for v in again], \
+                "{} isn't repeatable".format(name)
+            assert [len(v.edges) for v in first] == \
+                [len(v.edges) for v in again], \
+                "{} edges aren't repeatable".format(name)
+
+
+if __name__ == "__main__":
+    unittest.main()
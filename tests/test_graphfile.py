@@ -0,0 +1,271 @@
+"""
+Tests saving and loading the graph, e.g. save + load + query.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_graphfile.py
+"""
+
+import math
+import os
+import random
+import tempfile
+import tracemalloc
+import unittest
+import timeout_decorator
+from array import array
+
+import graphfile
+from flatgraph import FlatGraph
+from graph import Graph
+
+# Tolerance for the threshold of distances
+TOLERANCE_THRESHOLD = 0.001
+
+
+def approx_value(a, b):
+    """
+    Asserts that the value of a and b are approximately close.
+    :param a: A number to compare to.
+    :param b: A number to compare against.
+    :return: The bool if they're approximate
+    """
+
+    return math.isclose(a, b, abs_tol=TOLERANCE_THRESHOLD)
+
+
+def make_layers():
+    """
+    Builds the usual layered graph, with one vertex removed so the ids have
+    a gap in them.
+    :return: The graph and the vertices A to F.
+    """
+
+    G = Graph()
+
+    A = G.insert_vertex(0, 0)
+    gone = G.insert_vertex(9, 9)
+    B = G.insert_vertex(2, 0)
+    C = G.insert_vertex(2, 20)
+    D = G.insert_vertex(2, 6)
+    E = G.insert_vertex(3, 3)
+    F = G.insert_vertex(4.5, 6.25)
+
+    G.insert_edge(A, B)
+    G.insert_edge(A, C)
+    G.insert_edge(A, D)
+    G.insert_edge(C, E)
+    G.insert_edge(C, F)
+    G.insert_edge(D, F)
+    G.insert_edge(A, gone)
+    G.remove_vertex(gone)
+
+    return G, (A, B, C, D, E, F)
+
+
+class TestGraphFile(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".pgr")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    @timeout_decorator.timeout(1)
+    def test_round_trip_graph(self):
+        G, vs = make_layers()
+        G.save(self.path)
+
+        H = Graph.load(self.path, mmap=False)
+
+        loaded = {v.id: v for v in H._vertices}
+        for v in vs:
+            w = loaded[v.id]
+            assert (w.x_pos, w.y_pos) == (v.x_pos, v.y_pos), \
+                "Vertex {} came back as {}".format(v, w)
+            assert sorted(u.id for u in (H.opposite(e, w) for e in w.edges)) \
+                == sorted(u.id for u in (G.opposite(e, v) for e in v.edges)), \
+                "Edges of {} differ".format(v)
+
+        A, F = loaded[vs[0].id], loaded[vs[5].id]
+        assert H.find_path(A, F, 8) == [A, loaded[vs[3].id], F], \
+            "Loaded graph found a different path"
+        assert approx_value(H.minimum_range(A, F), G.minimum_range(vs[0], vs[5]))
+
+        new = H.insert_vertex(50, 50)
+        assert new.id not in [v.id for v in vs], "Loaded graph reused an id"
+
+    @timeout_decorator.timeout(1)
+    def test_round_trip_mmap(self):
+        G, vs = make_layers()
+        A, B, C, D, E, F = vs
+        G.save(self.path)
+
+        flat = Graph.load(self.path, mmap=True)
+        try:
+            i = {v: flat.index(v.id) for v in vs}
+            assert len(flat) == 6, "Expected 6 vertices, got {}".format(len(flat))
+
+            p = flat.find_path(i[A], i[F], 8)
+            assert p == [i[A], i[D], i[F]], "Mapped path was {}".format(p)
+
+            for b, s in ((A, F), (E, B), (F, C)):
+                expected = G.minimum_range(b, s)
+                res = flat.minimum_range(i[b], i[s])
+                assert approx_value(expected, res), \
+                    "[minimum_range] Expected: {} | Got: {}".format(expected, res)
+
+            expected = G.find_emergency_range(B)
+            res = flat.find_emergency_range(i[B])
+            assert approx_value(expected, res), \
+                "[emergency_range] Expected: {} | Got: {}".format(expected, res)
+        finally:
+            flat.close()
+
+    @timeout_decorator.timeout(1)
+    def test_rejects_bad_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"definitely not a graph file at all")
+        for mmap in (True, False):
+            with self.assertRaises(ValueError):
+                Graph.load(self.path, mmap=mmap)
+
+        G, _ = make_layers()
+        G.save(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 8)
+        with self.assertRaises(ValueError):
+            Graph.load(self.path, mmap=True)
+
+
+class TestOutOfCore(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".pgr")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    @timeout_decorator.timeout(10)
+    def test_matches_graph(self):
+        rng = random.Random(1)
+        G = Graph()
+        vs = [G.insert_vertex(rng.uniform(0, 10), rng.uniform(0, 10))
+              for _ in range(300)]
+        for i, u in enumerate(vs):
+            for w in vs[i + 1:]:
+                if G.distance(u, w) <= 0.9:
+                    G.insert_edge(u, w)
+        for v in vs[::7]:
+            G.remove_vertex(v)
+        vs = [v for v in vs if v.id in G._by_id]
+        G.save(self.path)
+
+        flat = Graph.load(self.path, out_of_core=True)
+        try:
+            for _ in range(40):
+                b, s = rng.sample(vs, 2)
+                i, j = flat.index(b.id), flat.index(s.id)
+                assert flat.minimum_range(i, j) == G.minimum_range(b, s), \
+                    "[minimum_range] {} to {}".format(b, s)
+
+                r = rng.uniform(1, 8)
+                expected = G.find_path(b, s, r)
+                got = flat.find_path(i, j, r)
+                assert (got is None) == (expected is None) and \
+                    (got is None or len(got) == len(expected)), \
+                    "[find_path] {} to {} within {}: expected {}, got {}" \
+                    .format(b, s, r, expected, got)
+                if got is not None:
+                    assert all(flat.distance(i, k) <= r for k in got) and \
+                        all(k in flat.neighbours(h)
+                            for h, k in zip(got, got[1:])), \
+                        "[find_path] Not a path within range: {}".format(got)
+            assert flat._index is None, "Built a lookup of every id"
+        finally:
+            flat.close()
+
+    @timeout_decorator.timeout(10)
+    def test_memory_bounded_by_explored(self):
+        # 6000 islands of 10 stations in a ring, the ids out of order.
+        islands, size = 6000, 10
+        n = islands * size
+        xs = array("d", (float(k % size) for k in range(n)))
+        ys = array("d", (float(k // size) for k in range(n)))
+        ids = array("q", (n - k for k in range(n)))
+        offsets = array("q", [0])
+        targets = array("q")
+        for k in range(n):
+            start = k - k % size
+            targets.extend((start + (k + 1) % size, start + (k - 1) % size))
+            offsets.append(len(targets))
+        graphfile.write(FlatGraph(xs, ys, offsets, targets, ids), self.path)
+
+        flat = Graph.load(self.path, out_of_core=True)
+        try:
+            tracemalloc.start()
+            b, s = flat.index(n - 50000), flat.index(n - 50005)
+            assert flat.minimum_range(b, s) == 5, "Expected 5"
+            assert len(flat.find_path(b, s, 5)) == 6, "Expected 5 hops"
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            flat.close()
+        assert peak < 64 * 1024, \
+            "Peaked at {} bytes for {} stations".format(peak, n)
+
+    @timeout_decorator.timeout(10)
+    def test_index_after_reorder(self):
+        rng = random.Random(2)
+        G = Graph()
+        vs = [G.insert_vertex(rng.uniform(0, 10), rng.uniform(0, 10))
+              for _ in range(500)]
+        G.reorder("hilbert")
+        G.save(self.path)
+
+        flat = Graph.load(self.path, out_of_core=True)
+        try:
+            assert list(flat.ids) != sorted(flat.ids), \
+                "Expected the ids out of order"
+            for v in vs:
+                assert flat.ids[flat.index(v.id)] == v.id, \
+                    "Wrong index for {}".format(v.id)
+            with self.assertRaises(KeyError):
+                flat.index(10 ** 6)
+            assert flat._ids_sorted is None, "Went through every id"
+        finally:
+            flat.close()
+
+    @timeout_decorator.timeout(5)
+    def test_reads_version_1(self):
+        G, _ = make_layers()
+        flat = FlatGraph.from_graph(G)
+        n, m = len(flat.xs), len(flat.targets)
+        # The same file without the id order at the end.
+        with open(self.path, "wb") as f:
+            f.write(graphfile._HEADER.pack(graphfile.MAGIC, 1, 0, n, m))
+            for field, typecode in graphfile._LAYOUTS[1]:
+                array(typecode, getattr(flat, field)).tofile(f)
+
+        for mmap in (True, False):
+            loaded = graphfile.read(self.path, mmap=mmap)
+            assert loaded.id_order is None and list(loaded.ids) == \
+                list(flat.ids), "Version 1 read wrong"
+            loaded.close()
+        loaded = graphfile.read(self.path, out_of_core=True)
+        assert all(loaded.index(i) == k for k, i in enumerate(flat.ids)), \
+            "Version 1 index wrong"
+        loaded.close()
+
+    @timeout_decorator.timeout(1)
+    def test_needs_mmap(self):
+        G, _ = make_layers()
+        G.save(self.path)
+        with self.assertRaises(ValueError):
+            Graph.load(self.path, mmap=False, out_of_core=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
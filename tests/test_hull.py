@@ -0,0 +1,144 @@
+"""
+Tests the furthest station queries answered from the convex layers, against
+measuring the distance to every station.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_hull.py
+"""
+
+import math
+import random
+import unittest
+import timeout_decorator
+
+from graph import Graph
+from hull import ConvexLayers
+
+
+def brute_force(positions, x, y, k, skip=None):
+    """
+    Returns the k largest distances from (x, y), largest first.
+    """
+
+    return sorted((math.hypot(px - x, py - y)
+                   for i, (px, py) in positions.items() if i != skip),
+                  reverse=True)[:k]
+
+
+def same_distances(got, expected):
+    return len(got) == len(expected) and \
+        all(math.isclose(d, e) for (d, _), e in zip(got, expected))
+
+
+class TestConvexLayers(unittest.TestCase):
+
+    @timeout_decorator.timeout(10)
+    def test_matches_brute_force_while_changing(self):
+        rng = random.Random(1)
+        layers = ConvexLayers()
+        positions = {}
+        next_id = 0
+
+        for step in range(600):
+            action = rng.random()
+            if action < 0.5 or len(positions) < 5:
+                positions[next_id] = (rng.uniform(0, 100), rng.uniform(0, 50))
+                layers.insert(next_id, *positions[next_id])
+                next_id += 1
+            elif action < 0.75:
+                i = rng.choice(list(positions))
+                positions[i] = (rng.uniform(0, 100), rng.uniform(0, 50))
+                layers.move(i, *positions[i])
+            else:
+                i = rng.choice(list(positions))
+                del positions[i]
+                layers.remove(i)
+
+            x, y = rng.uniform(-20, 120), rng.uniform(-20, 70)
+            k = rng.choice((1, 2, 5))
+            skip = rng.choice(list(positions))
+            got = layers.farthest(x, y, k, skip)
+            expected = brute_force(positions, x, y, k, skip)
+            assert same_distances(got, expected), \
+                "Step {}: expected {}, got {}".format(step, expected, got)
+            assert all(math.isclose(d, math.hypot(positions[i][0] - x,
+                                                  positions[i][1] - y))
+                       for d, i in got), \
+                "Distances don't match the ids: {}".format(got)
+
+    @timeout_decorator.timeout(1)
+    def test_lines_and_repeats(self):
+        layers = ConvexLayers()
+        positions = {}
+        for i in range(40):
+            # A line, with every spot taken twice.
+            positions[i] = (i // 2, 0)
+            layers.insert(i, *positions[i])
+
+        for x, y in ((0, 0), (7.5, 1), (30, -3)):
+            for k in (1, 3, 10):
+                got = layers.farthest(x, y, k)
+                expected = brute_force(positions, x, y, k)
+                assert same_distances(got, expected), \
+                    "From ({}, {}): expected {}, got {}".format(
+                        x, y, expected, got)
+
+    @timeout_decorator.timeout(5)
+    def test_measures_few_stations(self):
+        rng = random.Random(2)
+        layers = ConvexLayers()
+        for i in range(5000):
+            layers.insert(i, rng.gauss(0, 10), rng.gauss(0, 10))
+
+        layers.farthest(0, 0, 3)
+        assert layers.last_measured < 500, \
+            "Measured {} of 5000 stations".format(layers.last_measured)
+
+
+class TestFarthestStations(unittest.TestCase):
+
+    @timeout_decorator.timeout(5)
+    def test_graph_queries(self):
+        rng = random.Random(3)
+        G = Graph()
+        vs = [G.insert_vertex(rng.uniform(-30, 30), rng.uniform(-30, 30))
+              for _ in range(300)]
+
+        for step in range(50):
+            v = rng.choice(vs)
+            if step % 5 == 0:
+                vs.remove(v)
+                G.remove_vertex(v)
+            else:
+                G.move_vertex(v, rng.uniform(-40, 40), rng.uniform(-40, 40))
+
+            b = rng.choice(vs)
+            expected = sorted((G.distance(b, u) for u in vs if u is not b),
+                              reverse=True)[:4]
+            got = G.farthest_stations(b, 4)
+            assert same_distances(got, expected), \
+                "From {}: expected {}, got {}".format(b, expected, got)
+            assert all(math.isclose(d, G.distance(b, u)) for d, u in got), \
+                "Distances don't match the stations: {}".format(got)
+
+            d, w = G.find_emergency_range(b, witness=True)
+            assert math.isclose(d, expected[0]) and \
+                math.isclose(G.distance(b, w), d), \
+                "Emergency range {} with {}, expected {}".format(
+                    d, w, expected[0])
+            assert math.isclose(G.find_emergency_range(b), d), \
+                "Emergency range without the witness differs"
+
+    @timeout_decorator.timeout(1)
+    def test_single_station(self):
+        G = Graph()
+        A = G.insert_vertex(3, 3)
+
+        assert G.find_emergency_range(A, witness=True) == (0, A), \
+            "A is the only station"
+        assert G.farthest_stations(A, 3) == [], "There are no other stations"
+
+
+if __name__ == "__main__":
+    unittest.main()
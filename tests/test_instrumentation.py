@@ -0,0 +1,99 @@
+"""
+Tests the query counters and traces of the graph.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_instrumentation.py
+"""
+
+import unittest
+import timeout_decorator
+
+from graph import Graph
+
+
+def make_line(n):
+    """
+    Builds a line of n stations, one unit apart.
+    """
+
+    G = Graph()
+    vs = [G.insert_vertex(i, 0) for i in range(n)]
+    for u, v in zip(vs, vs[1:]):
+        G.insert_edge(u, v)
+    return G, vs
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_off_by_default(self):
+        G, vs = make_line(5)
+        G.find_path(vs[0], vs[4], 10)
+
+        assert G.stats == {}, "Counted while off: {}".format(G.stats)
+        assert G._probe is None, "A probe was made while off"
+
+    @timeout_decorator.timeout(1)
+    def test_counts_find_path(self):
+        # The range mustn't take in the whole line, or nothing is measured.
+        G, vs = make_line(6)
+        G.instrument()
+
+        G.find_path(vs[0], vs[4], 4.5)
+        G.find_path(vs[0], vs[4], 4.5)
+
+        stats = G.stats["find_path"]
+        assert stats.calls == 2, "Expected 2 calls, got {}".format(stats.calls)
+        assert stats.bfs_calls == 2, "Expected 2 BFS, got {}".format(stats.bfs_calls)
+        assert stats.vertices_expanded >= 8, \
+            "Expanded only {} vertices".format(stats.vertices_expanded)
+        assert stats.edges_relaxed >= stats.vertices_expanded, \
+            "Relaxed {} edges".format(stats.edges_relaxed)
+        assert stats.distance_evals >= 8, \
+            "Only {} distance calls".format(stats.distance_evals)
+        assert stats.elapsed > 0, "No time was recorded"
+
+        G.instrument(False)
+        assert G.stats == {}, "Stats kept after turning off"
+
+    @timeout_decorator.timeout(1)
+    def test_find_path_skips_tests_when_range_covers_map(self):
+        G, vs = make_line(6)
+        G.instrument()
+
+        assert G.find_path(vs[0], vs[5], 5) == vs, "Wrong path"
+        stats = G.stats["find_path"]
+        assert stats.distance_evals == 0, \
+            "Measured {} distances".format(stats.distance_evals)
+
+    @timeout_decorator.timeout(1)
+    def test_trace_nested_queries(self):
+        G, vs = make_line(6)
+
+        with G.trace() as trace:
+            G.minimum_range(vs[0], vs[5])
+            G.find_emergency_range(vs[2])
+
+        ops = [record.operation for record in trace.records]
+        assert ops == ["minimum_range", "find_emergency_range"], \
+            "Traced {}".format(ops)
+
+        counters = trace.records[0].counters
+        # One sweep, no BFS at all.
+        assert counters.bfs_calls == 0, \
+            "minimum_range ran {} BFS".format(counters.bfs_calls)
+        assert counters.vertices_expanded >= 5, \
+            "minimum_range expanded {} vertices".format(
+                counters.vertices_expanded)
+        assert trace.records[1].counters.distance_evals == 6, \
+            "Emergency range measured {} distances".format(
+                trace.records[1].counters.distance_evals)
+
+        assert G._probe is None, "Trace left instrumentation on"
+        G.find_path(vs[0], vs[1], 2)
+        assert len(trace.records) == 2, "Trace kept recording after the block"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+"""
+Tests the queries at a future time, against a graph with the stations
+actually moved there, and that the certificates hold until they expire.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_kinetic.py
+"""
+
+import math
+import random
+import unittest
+import timeout_decorator
+
+from graph import Graph
+from kinetic import _next_root
+from metrics import PolarStereographic
+
+
+def drifting_map(n, seed):
+    """
+    Returns a random map where most of the stations drift, some speeding up
+    or slowing down.
+    """
+
+    rng = random.Random(seed)
+    G = Graph()
+    vs = [G.insert_vertex(rng.uniform(0, 10), rng.uniform(0, 10))
+          for _ in range(n)]
+    for i, u in enumerate(vs):
+        for w in vs[i + 1:]:
+            if G.distance(u, w) <= 2:
+                G.insert_edge(u, w)
+    for v in vs:
+        if rng.random() < 0.8:
+            G.set_velocity(v, rng.uniform(-1, 1), rng.uniform(-1, 1),
+                           rng.uniform(-0.1, 0.1), rng.uniform(-0.1, 0.1))
+    return G, vs
+
+
+def moved_copy(G, vs, t):
+    """
+    Returns a copy of G with every station moved to where it is at time t,
+    and the copies of vs.
+    """
+
+    H = Graph()
+    copies = {}
+    for v in vs:
+        vx, vy, ax, ay = G.velocity(v)
+        copies[v.id] = H.insert_vertex(v.x_pos + vx * t + ax * t * t / 2,
+                                       v.y_pos + vy * t + ay * t * t / 2)
+    for v in vs:
+        for e in v.edges:
+            u = G.opposite(e, v)
+            if v.id < u.id:
+                H.insert_edge(copies[v.id], copies[u.id])
+    return H, copies
+
+
+class TestRoots(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_next_root(self):
+        # (t - 1)(t - 2)(t - 3)(t - 4)
+        quartic = [24, -50, 35, -10, 1]
+        for after, expected in ((0, 1), (1, 2), (2.5, 3), (4, math.inf)):
+            got = _next_root(quartic, after)
+            assert math.isclose(got, expected, abs_tol=1e-9) or \
+                got == expected, \
+                "After {}: expected {}, got {}".format(after, expected, got)
+
+        assert _next_root([1, 0, 1], 0) == math.inf, "t^2 + 1 has no roots"
+        assert math.isclose(_next_root([1, -2, 1], 0), 1), \
+            "(t - 1)^2 touches 0 at 1"
+        assert _next_root([5], 0) == math.inf, "A constant has no roots"
+        assert math.isclose(_next_root([-3, 2], -10), 1.5), "2t - 3"
+
+
+class TestViews(unittest.TestCase):
+
+    @timeout_decorator.timeout(10)
+    def test_matches_moved_graph(self):
+        G, vs = drifting_map(80, seed=1)
+        version = G.version
+        positions = [(v.x_pos, v.y_pos) for v in vs]
+
+        for t in (0, 0.5, 3, 10):
+            view = G.at(t)
+            H, copies = moved_copy(G, vs, t)
+            for b in vs[:4]:
+                assert math.isclose(view.find_emergency_range(b),
+                                    H.find_emergency_range(copies[b.id])), \
+                    "Emergency range from {} at {}".format(b, t)
+                for s in vs[-4:]:
+                    expected = H.minimum_range(copies[b.id], copies[s.id])
+                    got = view.minimum_range(b, s)
+                    assert got == expected or math.isclose(got, expected), \
+                        "Minimum range {} to {} at {}".format(b, s, t)
+
+                    expected = H.find_path(copies[b.id], copies[s.id], 3)
+                    got = view.find_path(b, s, 3)
+                    assert (None if got is None else
+                            [copies[v.id] for v in got]) == expected, \
+                        "Path {} to {} at {}".format(b, s, t)
+
+        assert G.version == version and \
+            [(v.x_pos, v.y_pos) for v in vs] == positions, \
+            "Asking about the future moved the graph"
+
+    @timeout_decorator.timeout(1)
+    def test_moves_and_velocities(self):
+        G = Graph()
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(1, 0)
+        G.set_velocity(B, 1, 0, 0, 2)
+
+        assert G.at(2).position(B) == (3, 4), "B drifts and speeds up"
+        G.move_vertex(B, 10, 10)
+        assert G.at(1).position(B) == (11, 11), "B drifts from its new spot"
+        G.set_velocity(B, 0, 0)
+        assert G.velocity(B) == (0, 0, 0, 0), "B stopped"
+        assert G.at(5).position(B) == (10, 10), "B stays put"
+
+        G.set_velocity(A, 1, 1)
+        view = G.at(1)
+        G.remove_vertex(A)
+        assert view.position(A) == (1, 1), "The view keeps A"
+        with self.assertRaises(ValueError):
+            G.at(1).position(A)
+        with self.assertRaises(ValueError):
+            G.set_velocity(A, 1, 1)
+
+    @timeout_decorator.timeout(1)
+    def test_other_metrics(self):
+        G = Graph(metric=PolarStereographic())
+        A = G.insert_vertex(0, -80)
+        B = G.insert_vertex(0, -75)
+        G.insert_edge(A, B)
+        G.set_velocity(B, 0, -5)
+
+        assert math.isclose(G.at(1).minimum_range(A, B), 0,
+                            abs_tol=1e-6), "B drifted onto A"
+        with self.assertRaises(ValueError):
+            G.at(1).certify_minimum_range(A, B)
+
+
+class TestCertificates(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_simple_expiry(self):
+        G = Graph()
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(1, 0)
+        C = G.insert_vertex(5, 0)
+        G.insert_edge(A, B)
+        G.insert_edge(B, C)
+        G.set_velocity(C, -1, 0)
+
+        cert = G.at(0).certify_minimum_range(A, C)
+        assert cert.answer == 5 and cert.witness is C and \
+            math.isclose(cert.expires, 4), \
+            "C is the witness until it passes B: {}".format(cert)
+        assert math.isclose(cert.value(3), 2), "C is 2 from A at 3"
+        with self.assertRaises(ValueError):
+            cert.value(4.5)
+
+        cert = G.at(0).certify_path(A, C, 3)
+        assert cert.answer is None and math.isclose(cert.expires, 2), \
+            "C comes within 3 at 2: {}".format(cert)
+
+        G.set_velocity(C, 0, 0)
+        cert = G.at(0).certify_emergency_range(A)
+        assert cert.expires == math.inf, "Nothing moves"
+
+    @timeout_decorator.timeout(20)
+    def test_answers_hold_until_expiry(self):
+        G, vs = drifting_map(40, seed=2)
+        rng = random.Random(2)
+
+        for _ in range(10):
+            t = rng.uniform(0, 5)
+            b, s = rng.sample(vs, 2)
+            view = G.at(t)
+            certs = (view.certify_path(b, s, 3),
+                     view.certify_minimum_range(b, s),
+                     view.certify_emergency_range(b))
+            for cert in certs:
+                assert cert.expires > t, "Expired straight away"
+                end = min(cert.expires, t + 20)
+                for k in range(1, 10):
+                    u = t + (end - t) * k / 10
+                    later = G.at(u)
+                    if cert is certs[0]:
+                        got = later.find_path(b, s, 3)
+                    elif cert is certs[1]:
+                        got = later.minimum_range(b, s)
+                    else:
+                        got = later.find_emergency_range(b)
+                    expected = cert.value(u)
+                    assert got == expected or math.isclose(got, expected), \
+                        "At {} (certified until {}): expected {}, got {}" \
+                        .format(u, cert.expires, expected, got)
+
+
+if __name__ == "__main__":
+    unittest.main()
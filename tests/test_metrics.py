@@ -0,0 +1,292 @@
+"""
+Tests the metrics, and that every query measures with the metric the graph
+was given, against working the answers out by brute force.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_metrics.py
+"""
+
+import math
+import os
+import random
+import tempfile
+import unittest
+import timeout_decorator
+
+from flatgraph import FlatGraph
+from graph import Graph
+from metrics import EARTH_RADIUS, Euclidean, Haversine, PolarStereographic
+
+
+def antarctica(metric, n, seed, travel_distance=None):
+    """
+    Returns a graph of n stations scattered over Antarctica, as (longitude,
+    latitude), with random edges unless it is a proximity graph.
+    """
+
+    rng = random.Random(seed)
+    G = Graph(travel_distance=travel_distance, metric=metric)
+    vs = [G.insert_vertex(rng.uniform(-180, 180), rng.uniform(-89, -65))
+          for _ in range(n)]
+    if travel_distance is None:
+        for u in vs:
+            for w in rng.sample(vs, 3):
+                if u is not w and not any(G.opposite(e, u) is w
+                                          for e in u.edges):
+                    G.insert_edge(u, w)
+    return G, vs
+
+
+def reachable(G, b, r):
+    """
+    Returns the set of stations reachable from b without leaving range r.
+    """
+
+    seen = {b}
+    todo = [b]
+    while todo:
+        u = todo.pop()
+        for e in u.edges:
+            w = G.opposite(e, u)
+            if w not in seen and G.metric.distance(
+                    b.x_pos, b.y_pos, w.x_pos, w.y_pos) <= r:
+                seen.add(w)
+                todo.append(w)
+    return seen
+
+
+def brute_minimum_range(G, vs, b, s):
+    """
+    Tries the distance to every station as the range, smallest first.
+    """
+
+    for r in sorted(G.distance(b, v) for v in vs):
+        if s in reachable(G, b, r):
+            return r
+    return None
+
+
+class TestMetrics(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_haversine_known_distances(self):
+        h = Haversine()
+        quarter = math.pi * EARTH_RADIUS / 2
+        assert math.isclose(h.distance(0, 0, 90, 0), quarter), \
+            "A quarter of the equator"
+        assert math.isclose(h.distance(37, -90, 0, 0), quarter), \
+            "The south pole to the equator"
+        assert math.isclose(h.distance(-120, -90, 45, -90), 0, abs_tol=1e-6), \
+            "The pole is one place whatever the longitude"
+        assert math.isclose(h.distance(179.5, -70, -179.5, -70),
+                            h.distance(0, -70, 1, -70)), \
+            "Across the date line"
+
+        # McMurdo to Dumont d'Urville, by the usual haversine formula.
+        lon1, lat1, lon2, lat2 = map(math.radians,
+                                     (166.67, -77.85, 139.99, -66.66))
+        a = math.sin((lat2 - lat1) / 2)**2 + math.cos(lat1) * \
+            math.cos(lat2) * math.sin((lon2 - lon1) / 2)**2
+        expected = 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+        assert math.isclose(h.distance(166.67, -77.85, 139.99, -66.66),
+                            expected), "McMurdo to Dumont d'Urville"
+
+    @timeout_decorator.timeout(1)
+    def test_polar_stereographic(self):
+        south = PolarStereographic()
+        assert all(math.isclose(c, 0, abs_tol=1e-6)
+                   for c in south.project(75, -90)), \
+            "The south pole is the centre of the map"
+        # Near the pole the map is true to scale.
+        assert math.isclose(south.distance(0, -90, 0, -89.9),
+                            Haversine().distance(0, -90, 0, -89.9),
+                            rel_tol=1e-5), "Not true to scale at the pole"
+
+        north = PolarStereographic("north")
+        assert math.isclose(north.distance(10, 80, 100, 80),
+                            south.distance(10, -80, 100, -80)), \
+            "The poles should mirror each other"
+
+        with self.assertRaises(ValueError):
+            PolarStereographic("east")
+
+    @timeout_decorator.timeout(1)
+    def test_equality(self):
+        assert Euclidean() == Euclidean(), "Euclidean metrics are equal"
+        assert Haversine() == Haversine() and Haversine() != Haversine(1), \
+            "Haversine metrics are equal by radius"
+        assert PolarStereographic() != PolarStereographic("north"), \
+            "Different poles are different metrics"
+
+    @timeout_decorator.timeout(1)
+    def test_distance_on_the_class(self):
+        G = Graph(metric=Haversine())
+        u = G.insert_vertex(0, 0)
+        v = G.insert_vertex(3, 4)
+        assert Graph.distance(u, v) == 5, \
+            "Graph.distance(u, v) should stay Euclidean"
+        assert math.isclose(G.distance(u, v),
+                            Haversine().distance(0, 0, 3, 4)), \
+            "G.distance(u, v) should use the graph's metric"
+
+
+class TestGraphQueries(unittest.TestCase):
+
+    metrics = (Haversine(), PolarStereographic())
+
+    @timeout_decorator.timeout(10)
+    def test_queries_match_brute_force(self):
+        for metric in self.metrics:
+            G, vs = antarctica(metric, 120, seed=1)
+            rng = random.Random(1)
+            for v in rng.sample(vs, 20):
+                G.move_vertex(v, rng.uniform(-180, 180), rng.uniform(-89, -65))
+
+            for b in vs[:5]:
+                far = max(G.metric.distance(b.x_pos, b.y_pos,
+                                            v.x_pos, v.y_pos) for v in vs)
+                assert math.isclose(G.find_emergency_range(b), far), \
+                    "{}: emergency range from {}".format(metric, b)
+
+                for s in vs[-5:]:
+                    expected = brute_minimum_range(G, vs, b, s)
+                    got = G.minimum_range(b, s)
+                    assert got == expected or math.isclose(got, expected), \
+                        "{}: minimum range {} to {}, expected {}, got {}" \
+                        .format(metric, b, s, expected, got)
+
+                    r = far / 2
+                    path = G.find_path(b, s, r)
+                    assert (path is not None) == (s in reachable(G, b, r)), \
+                        "{}: path {} to {} within {}".format(metric, b, s, r)
+                    if path is not None:
+                        assert all(G.distance(b, v) <= r for v in path), \
+                            "{}: path leaves the range".format(metric)
+
+    @timeout_decorator.timeout(10)
+    def test_station_queries_match_brute_force(self):
+        for metric in self.metrics:
+            G, vs = antarctica(metric, 300, seed=2)
+            for b in vs[:10]:
+                others = sorted((G.distance(b, v), v.id)
+                                for v in vs if v is not b)
+
+                got = [v.id for v in G.stations_within(b, 500)]
+                assert got == [i for d, i in others if d <= 500], \
+                    "{}: stations within 500 of {}".format(metric, b)
+
+                got = [d for d, _ in G.nearest_stations(b, 5)]
+                assert all(math.isclose(d, e)
+                           for d, (e, _) in zip(got, others[:5])), \
+                    "{}: nearest to {}".format(metric, b)
+
+                got = [d for d, _ in G.farthest_stations(b, 5)]
+                assert all(math.isclose(d, e)
+                           for d, (e, _) in zip(got, others[::-1][:5])), \
+                    "{}: furthest from {}".format(metric, b)
+
+    @timeout_decorator.timeout(10)
+    def test_proximity_edges(self):
+        for metric in self.metrics:
+            G, vs = antarctica(metric, 150, seed=3, travel_distance=300)
+            rng = random.Random(3)
+            for v in rng.sample(vs, 30):
+                G.move_vertex(v, rng.uniform(-180, 180), rng.uniform(-89, -65))
+
+            expected = {(u.id, v.id) for u in vs for v in vs
+                        if u.id < v.id and G.distance(u, v) <= 300}
+            got = {(min(u.id, v.id), max(u.id, v.id))
+                   for u in vs for v in (G.opposite(e, u) for e in u.edges)}
+            assert got == expected, "{}: {} edges, expected {}".format(
+                metric, len(got), len(expected))
+
+    @timeout_decorator.timeout(10)
+    def test_proximity_all_over_the_globe(self):
+        measured = []
+
+        class Counting(Haversine):
+            def kernel(self, p, q):
+                measured.append(1)
+                return Haversine.kernel(self, p, q)
+
+        rng = random.Random(6)
+        G = Graph(travel_distance=800, metric=Counting())
+        vs = [G.insert_vertex(rng.uniform(-180, 180),
+                              math.degrees(math.asin(rng.uniform(-1, 1))))
+              for _ in range(600)]
+        # Each insert only measures the stations on nearby cells.
+        assert len(measured) < 600 * 600 / 20, \
+            "Measured {} pairs building the map".format(len(measured))
+
+        for v in rng.sample(vs, 60):
+            G.move_vertex(v, rng.uniform(-180, 180), rng.uniform(-90, 90))
+        for v in rng.sample(vs, 60):
+            G.remove_vertex(v)
+            vs.remove(v)
+        expected = {(u.id, v.id) for u in vs for v in vs
+                    if u.id < v.id and G.distance(u, v) <= 800}
+        got = {(min(u.id, v.id), max(u.id, v.id))
+               for u in vs for v in (G.opposite(e, u) for e in u.edges)}
+        assert got == expected, "{} edges, expected {}".format(
+            len(got), len(expected))
+
+    @timeout_decorator.timeout(10)
+    def test_range_table_follows_moves(self):
+        G, vs = antarctica(Haversine(), 100, seed=4)
+        rng = random.Random(4)
+        table = G.range_table(vs[0])
+
+        for _ in range(30):
+            v = rng.choice(vs[1:])
+            G.move_vertex(v, rng.uniform(-180, 180), rng.uniform(-89, -65))
+            s = rng.choice(vs[1:])
+            expected = G.minimum_range(vs[0], s)
+            got = table[s]
+            assert (expected is None and got == math.inf) or \
+                math.isclose(got, expected), \
+                "Range to {}: expected {}, got {}".format(s, expected, got)
+
+
+class TestCopies(unittest.TestCase):
+
+    @timeout_decorator.timeout(10)
+    def test_snapshot_flat_and_file_agree(self):
+        G, vs = antarctica(Haversine(), 80, seed=5)
+        b, s = vs[0], vs[-1]
+        expected = (G.find_emergency_range(b), G.minimum_range(b, s))
+
+        snap = G.snapshot()
+        G.move_vertex(b, 0, -89.5)
+        assert (snap.find_emergency_range(b), snap.minimum_range(b, s)) \
+            == expected, "The snapshot measures differently"
+        assert math.isclose(snap.distance(b, s), Haversine().distance(
+            *snap.position(b), *snap.position(s))), \
+            "The snapshot distance isn't great circle"
+
+        G.move_vertex(b, *snap.position(b))
+        flat = FlatGraph.from_graph(G)
+        i, j = flat.index(b.id), flat.index(s.id)
+        assert (flat.find_emergency_range(i), flat.minimum_range(i, j)) \
+            == expected, "The flat graph measures differently"
+        with flat.to_shared_memory() as shared:
+            attached = FlatGraph.attach(shared.info)
+            assert attached.minimum_range(i, j) == expected[1], \
+                "The shared flat graph measures differently"
+            attached.close()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "map.graph")
+            G.save(path)
+            H = Graph.load(path, mmap=False, metric=Haversine())
+            h = H._by_id[b.id]
+            assert H.minimum_range(h, H._by_id[s.id]) == expected[1], \
+                "The loaded graph measures differently"
+            mapped = Graph.load(path, metric=Haversine())
+            assert mapped.find_emergency_range(i) == expected[0], \
+                "The mapped graph measures differently"
+            mapped.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Tests the locality orders, and that reordering the graph doesn't change the
+answers to any query.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_ordering.py
+"""
+
+import math
+import os
+import random
+import tempfile
+import unittest
+import timeout_decorator
+
+import ordering
+from flatgraph import FlatGraph
+from graph import Graph
+from benchmarks.generators import random_geometric
+
+
+def step_length(G):
+    """
+    Returns the mean distance between stations one after the other.
+    """
+
+    vs = G._vertices
+    return sum(G.distance(u, w) for u, w in zip(vs, vs[1:])) / (len(vs) - 1)
+
+
+def bandwidth(G):
+    """
+    Returns the mean gap in the order between the two ends of an edge.
+    """
+
+    rank = {v.id: k for k, v in enumerate(G._vertices)}
+    gaps = [abs(rank[v.id] - rank[G.opposite(e, v).id])
+            for v in G._vertices for e in v.edges]
+    return sum(gaps) / len(gaps)
+
+
+class TestOrders(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_hilbert_curve(self):
+        # On a 4 x 4 grid the curve only ever steps to a cell next door.
+        points = [(x, y) for x in range(4) for y in range(4)]
+        order = ordering.hilbert_order(points)
+        assert sorted(order) == list(range(16)), "Not a permutation"
+        for a, b in zip(order, order[1:]):
+            (ax, ay), (bx, by) = points[a], points[b]
+            assert abs(ax - bx) + abs(ay - by) == 1, \
+                "Jumped from {} to {}".format(points[a], points[b])
+
+        assert ordering.hilbert_order([]) == [], "Nothing to order"
+        assert ordering.hilbert_order([(1, 1), (1, 1)]) == [0, 1], \
+            "Stations in one spot"
+
+    @timeout_decorator.timeout(1)
+    def test_graph_orders(self):
+        # Two components, a path 0 - 2 - 4 - 1 and a pair 3 - 5.
+        adjacency = {0: [2], 2: [0, 4], 4: [2, 1], 1: [4], 3: [5], 5: [3]}
+        assert ordering.bfs_order(6, adjacency.__getitem__) == \
+            [0, 2, 4, 1, 3, 5], "Breadth first from 0, then from 3"
+        order = ordering.rcm_order(6, adjacency.__getitem__)
+        assert sorted(order) == list(range(6)), "Not a permutation"
+        assert order in ([5, 3, 0, 2, 4, 1], [5, 3, 1, 4, 2, 0]), \
+            "Expected each component in a run, got {}".format(order)
+
+
+class TestReorder(unittest.TestCase):
+
+    @timeout_decorator.timeout(10)
+    def test_answers_unchanged(self):
+        G, vs = random_geometric(300, seed=1)
+        rng = random.Random(1)
+        pairs = [rng.sample(vs, 2) for _ in range(30)]
+        expected = [(G.minimum_range(b, s), G.find_path(b, s, 0.3))
+                    for b, s in pairs]
+        edges = {v.id: sorted(G.opposite(e, v).id for e in v.edges)
+                 for v in vs}
+
+        for strategy in ordering.STRATEGIES:
+            G.reorder(strategy)
+            assert sorted(v.id for v in G._vertices) == \
+                sorted(v.id for v in vs), "{}: lost stations".format(strategy)
+            assert all(sorted(G.opposite(e, v).id for e in v.edges)
+                       == edges[v.id] for v in vs), \
+                "{}: edges changed".format(strategy)
+
+            snap = G.snapshot()
+            flat = FlatGraph.from_graph(G)
+            for (b, s), (r, path) in zip(pairs, expected):
+                assert G.minimum_range(b, s) == r and \
+                    snap.minimum_range(b, s) == r and \
+                    flat.minimum_range(flat.index(b.id),
+                                       flat.index(s.id)) == r, \
+                    "{}: minimum range {} to {}".format(strategy, b, s)
+                for got in (G.find_path(b, s, 0.3),
+                            snap.find_path(b, s, 0.3)):
+                    assert (got is None) == (path is None) and \
+                        (got is None or len(got) == len(path)), \
+                        "{}: path {} to {}".format(strategy, b, s)
+
+    @timeout_decorator.timeout(10)
+    def test_locality(self):
+        G, _ = random_geometric(1000, seed=2)
+        before = step_length(G), bandwidth(G)
+
+        G.reorder("hilbert")
+        assert step_length(G) < before[0] / 4, \
+            "Hilbert steps {}, inserted {}".format(step_length(G), before[0])
+        G.reorder("rcm")
+        assert bandwidth(G) < before[1] / 4, \
+            "RCM bandwidth {}, inserted {}".format(bandwidth(G), before[1])
+
+        # The edges are in the order too.
+        rank = {v.id: k for k, v in enumerate(G._vertices)}
+        for v in G._vertices:
+            ranks = [rank[G.opposite(e, v).id] for e in v.edges]
+            assert ranks == sorted(ranks), "Edges of {} out of order".format(v)
+
+    @timeout_decorator.timeout(5)
+    def test_saved_in_order(self):
+        G, vs = random_geometric(200, seed=3)
+        G.reorder("bfs")
+        fd, path = tempfile.mkstemp(suffix=".pgr")
+        os.close(fd)
+        try:
+            G.save(path)
+            flat = Graph.load(path)
+            assert list(flat.ids) == [v.id for v in G._vertices], \
+                "The file isn't in the new order"
+            b, s = vs[0], vs[-1]
+            assert math.isclose(
+                flat.minimum_range(flat.index(b.id), flat.index(s.id)),
+                G.minimum_range(b, s)), "The file answers differently"
+            flat.close()
+        finally:
+            os.remove(path)
+
+    @timeout_decorator.timeout(1)
+    def test_bad_strategy(self):
+        G = Graph()
+        G.insert_vertex(0, 0)
+        with self.assertRaises(ValueError):
+            G.reorder("alphabetical")
+
+
+if __name__ == "__main__":
+    unittest.main()
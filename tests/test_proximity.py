@@ -0,0 +1,196 @@
+"""
+Tests the proximity graph mode, where the edges are made automatically
+between stations within travel distance, against working the pairs out by
+brute force.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_proximity.py
+"""
+
+import math
+import random
+import unittest
+import timeout_decorator
+
+from graph import Graph
+from spatial import GridIndex
+
+
+def brute_force_edges(G, d):
+    """
+    Returns the set of id pairs of the stations within d of each other.
+    """
+
+    vs = list(G._by_id.values())
+    return {(min(u.id, v.id), max(u.id, v.id))
+            for i, u in enumerate(vs) for v in vs[i + 1:]
+            if G.distance(u, v) <= d}
+
+
+def graph_edges(G):
+    """
+    Returns the set of id pairs of the edges in the graph.
+    """
+
+    pairs = set()
+    for v in G._by_id.values():
+        for e in v.edges:
+            u = G.opposite(e, v)
+            pairs.add((min(u.id, v.id), max(u.id, v.id)))
+    return pairs
+
+
+class TestGridIndex(unittest.TestCase):
+
+    @timeout_decorator.timeout(5)
+    def test_within_matches_brute_force(self):
+        rng = random.Random(1)
+        grid = GridIndex(2.5)
+        points = {}
+        for i in range(300):
+            points[i] = (rng.uniform(-20, 20), rng.uniform(-20, 20))
+            grid.insert(i, *points[i])
+
+        for i in range(0, 300, 3):
+            points[i] = (rng.uniform(-20, 20), rng.uniform(-20, 20))
+            grid.move(i, *points[i])
+        for i in range(1, 300, 7):
+            del points[i]
+            grid.remove(i)
+
+        assert len(grid) == len(points), \
+            "Grid has {} stations, expected {}".format(len(grid), len(points))
+
+        for r in (0.5, 2.5, 7, 100):
+            x, y = rng.uniform(-20, 20), rng.uniform(-20, 20)
+            expected = sorted(i for i, (px, py) in points.items()
+                              if math.hypot(px - x, py - y) <= r)
+            got = sorted(grid.within(x, y, r))
+            assert got == expected, \
+                "Within {} of ({}, {}): expected {}, got {}".format(
+                    r, x, y, expected, got)
+
+    def test_bad_cell(self):
+        with self.assertRaises(ValueError):
+            GridIndex(0)
+
+
+class TestProximityGraph(unittest.TestCase):
+
+    @timeout_decorator.timeout(5)
+    def test_inserted_edges_match_brute_force(self):
+        rng = random.Random(2)
+        G = Graph(travel_distance=3)
+        for _ in range(300):
+            G.insert_vertex(rng.uniform(0, 40), rng.uniform(0, 40))
+
+        expected = brute_force_edges(G, 3)
+        got = graph_edges(G)
+        assert got == expected, \
+            "{} edges missing, {} extra".format(len(expected - got),
+                                                len(got - expected))
+
+    @timeout_decorator.timeout(5)
+    def test_edges_follow_moves(self):
+        rng = random.Random(3)
+        G = Graph(travel_distance=4)
+        vs = [G.insert_vertex(rng.uniform(0, 30), rng.uniform(0, 30))
+              for _ in range(200)]
+
+        for step in range(100):
+            v = rng.choice(vs)
+            G.move_vertex(v, rng.uniform(0, 30), rng.uniform(0, 30))
+            if step % 10 == 0:
+                w = vs.pop(rng.randrange(len(vs)))
+                G.remove_vertex(w)
+
+        expected = brute_force_edges(G, 4)
+        got = graph_edges(G)
+        assert got == expected, \
+            "{} edges missing, {} extra".format(len(expected - got),
+                                                len(got - expected))
+
+    @timeout_decorator.timeout(1)
+    def test_move_into_taken_spot(self):
+        G = Graph(travel_distance=1.5)
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(1, 0)
+        C = G.insert_vertex(5, 0)
+
+        G.move_vertex(C, 1, 0)
+        assert (C.x_pos, C.y_pos) == (5, 0), "C moved on top of B"
+
+        G.move_vertex(C, 2, 0)
+        assert G.find_path(A, C, 2) == [A, B, C], \
+            "C should be joined to B after moving"
+
+        G.move_vertex(B, 0, 9)
+        assert G.find_path(A, C, 2) is None, \
+            "B moved away, A and C are not joined any more"
+        assert G.minimum_range(A, C) is None, \
+            "B moved away, A and C are not joined any more"
+
+    @timeout_decorator.timeout(1)
+    def test_twins_move_apart(self):
+        G = Graph(travel_distance=1.5)
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(0, 0)
+        C = G.insert_vertex(1, 0)
+
+        # B is equal to A (same spot), only B's edge to C should go.
+        G.move_vertex(B, 9, 9)
+        assert [G.opposite(e, C) for e in C.edges][0] is A and \
+            len(C.edges) == 1 and not B.edges, \
+            "C should only be joined to A after B moved away"
+        G.remove_vertex(A)
+        assert not C.edges, "A was removed, C has nothing next to it"
+
+    @timeout_decorator.timeout(10)
+    def test_observers_follow_edge_changes(self):
+        rng = random.Random(4)
+        G = Graph(travel_distance=5)
+        vs = [G.insert_vertex(rng.uniform(0, 30), rng.uniform(0, 30))
+              for _ in range(120)]
+        b, s = vs[0], vs[1]
+
+        table = G.range_table(b)
+        range_watch = G.watch_range(b, s, lambda old, new: None)
+        watch = G.watch_path(b, s, 15, lambda old, new: None)
+
+        for _ in range(60):
+            G.move_vertex(rng.choice(vs[2:]), rng.uniform(0, 30),
+                          rng.uniform(0, 30))
+            G.snapshot()
+
+            for v in vs[::10]:
+                expected = G.minimum_range(b, v)
+                got = table[v]
+                assert (expected is None and got is None) or \
+                    math.isclose(expected, got), \
+                    "Table has {} for {}, expected {}".format(got, v, expected)
+
+            expected = G.minimum_range(b, s)
+            got = range_watch.answer
+            assert (expected is None and got is None) or \
+                math.isclose(expected, got), \
+                "Range watch has {}, expected {}".format(got, expected)
+
+            expected = G.find_path(b, s, 15)
+            assert (expected is None) == (watch.answer is None), \
+                "Watch has {}, expected {}".format(watch.answer, expected)
+            if expected is not None:
+                assert len(expected) == len(watch.answer), \
+                    "Watch has {}, expected {}".format(watch.answer, expected)
+
+        snap = G.snapshot()
+        for v in vs[::10]:
+            expected = G.minimum_range(b, v)
+            got = snap.minimum_range(b, v)
+            assert (expected is None and got is None) or \
+                math.isclose(expected, got), \
+                "Snapshot has {} for {}, expected {}".format(got, v, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
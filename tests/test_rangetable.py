@@ -0,0 +1,138 @@
+"""
+Tests the range tables kept up to date under moves, against recomputing the
+whole table from scratch.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_rangetable.py
+"""
+
+import math
+import random
+import unittest
+import timeout_decorator
+
+from graph import Graph
+from flatgraph import FlatGraph
+from benchmarks.generators import random_geometric
+
+# Tolerance for the threshold of distances
+TOLERANCE_THRESHOLD = 0.001
+
+
+def approx_value(a, b):
+    """
+    Asserts that the value of a and b are approximately close.
+    :param a: A number to compare to.
+    :param b: A number to compare against.
+    :return: The bool if they're approximate
+    """
+
+    return math.isclose(a, b, abs_tol=TOLERANCE_THRESHOLD)
+
+
+def check_table(G, table):
+    """
+    Compares every entry of the table against a full recomputation.
+    """
+
+    flat = FlatGraph.from_graph(G)
+    b = flat.index(table.base.id)
+    expected = flat.minimum_ranges(b, range(len(flat)))
+    for i, v in enumerate(G._vertices):
+        got = table[v]
+        if expected[i] == math.inf:
+            assert got is None, "{} should be unreachable, got {}".format(v, got)
+        else:
+            assert got is not None and approx_value(got, expected[i]), \
+                "[{}] Expected: {} | Got: {}".format(v, expected[i], got)
+
+    values = [r for _, r in table.items()]
+    assert values == sorted(values), "Table is out of order"
+
+
+class TestRangeTable(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_simple_table(self):
+        G = Graph()
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(2, 0)
+        C = G.insert_vertex(2, 4)
+        D = G.insert_vertex(2, 6)
+        F = G.insert_vertex(4, 6)
+        for u, v in ((A, B), (A, C), (A, D), (C, F), (D, F)):
+            G.insert_edge(u, v)
+
+        table = G.range_table(A)
+        assert approx_value(table[F], 7.2111), "Got {}".format(table[F])
+
+        # Move C out of the way, the route through D is next best.
+        G.move_vertex(C, 2, 10)
+        assert approx_value(table[F], 7.2111), "Got {}".format(table[F])
+        G.move_vertex(F, 4, 7)
+        assert approx_value(table[F], math.sqrt(65)), "Got {}".format(table[F])
+        check_table(G, table)
+
+        E = G.insert_vertex(1, 1)
+        assert table[E] is None, "New station shouldn't be reachable"
+        G.insert_edge(B, E)
+        G.insert_edge(E, F)
+        assert approx_value(table[F], math.sqrt(65)), "Got {}".format(table[F])
+        check_table(G, table)
+
+        G.remove_vertex(D)
+        check_table(G, table)
+
+        table.close()
+        G.move_vertex(F, 50, 50)
+        assert approx_value(table[F], math.sqrt(65)), "Closed table changed"
+
+    @timeout_decorator.timeout(10)
+    def test_random_moves_match_recomputation(self):
+        G, vs = random_geometric(300, seed=4)
+        rng = random.Random(4)
+        table = G.range_table(vs[0])
+
+        for step in range(150):
+            v = rng.choice(vs)
+            G.move_vertex(v, v.x_pos + rng.uniform(-0.05, 0.05),
+                          v.y_pos + rng.uniform(-0.05, 0.05))
+            if step % 10 == 0:
+                u, w = rng.choice(vs), rng.choice(vs)
+                if u is not w and not any(G.opposite(e, u) is w
+                                          for e in u.edges):
+                    G.insert_edge(u, w)
+            check_table(G, table)
+
+    @timeout_decorator.timeout(5)
+    def test_far_moves_only_repair_the_tail(self):
+        G, vs = random_geometric(2000, seed=5)
+        b = vs[0]
+        table = G.range_table(b)
+        assert table.last_repaired == 2000, \
+            "First build swept {}".format(table.last_repaired)
+
+        far = max(vs, key=lambda v: G.distance(b, v))
+        G.move_vertex(far, far.x_pos + 0.001, far.y_pos)
+        assert table.last_repaired < 200, \
+            "A move at the edge of the map swept {} stations".format(
+                table.last_repaired)
+        check_table(G, table)
+
+    @timeout_decorator.timeout(1)
+    def test_removing_base(self):
+        G = Graph()
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(1, 0)
+        G.insert_edge(A, B)
+        table = G.range_table(A)
+
+        G.remove_vertex(A)
+        with self.assertRaises(ValueError):
+            table.get(B)
+        assert table not in G._observers, "Table still following the graph"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+"""
+Scaling Tests
+-------------
+
+Catches algorithmic regressions, e.g. find_path quietly going quadratic.
+
+Two checks are made:
+
+    * Growth: every operation is timed on maps of several sizes, and the
+      growth exponent k of time ~ n^k is fitted. It must not go over the
+      bound declared in BOUNDS (plus some slack for noise).
+
+    * Baseline: the work counters of the queries (see instrumentation.py) are
+      deterministic on the seeded maps, so they are compared against the
+      numbers stored in perf_baseline.json, with a tolerance.
+
+After a change that is meant to alter the amount of work, refresh the
+baseline with:
+
+UPDATE_PERF_BASELINE=1 python3 -m unittest tests/test_scaling.py
+"""
+
+import json
+import math
+import os
+import random
+import time
+import unittest
+import timeout_decorator
+
+from graph import EdgeAlreadyExists
+from benchmarks.generators import random_geometric
+
+# The map sizes to time each operation at.
+SIZES = (500, 1000, 2000, 4000)
+
+# The declared growth exponent of every operation, in the number of vertices.
+BOUNDS = {
+    "insert_vertex": 0,
+    "insert_edge": 0,
+    "move_vertex": 0,
+    "find_emergency_range": 1,
+    "find_path": 1,
+    # A search that only explores next door doesn't pay for the whole map.
+    "find_path_local": 0,
+    # One sweep, the heap adds a log factor.
+    "minimum_range": 1,
+}
+
+# How far over the bound the fitted exponent may go before failing.
+SLACK = 0.5
+
+# How many times each measurement is repeated, the fastest one is kept.
+REPEAT = 3
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "perf_baseline.json")
+BASELINE_SIZES = (500, 2000)
+# How much more work than the baseline is tolerated.
+BASELINE_TOLERANCE = 0.10
+COUNTERS = ("vertices_expanded", "edges_relaxed", "distance_evals",
+            "bfs_calls")
+
+
+def growth_exponent(sizes, times):
+    """
+    Fits time = c * n^k by least squares on the logs.
+    :return: The exponent k.
+    """
+
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    top = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    bottom = sum((x - mean_x) ** 2 for x in xs)
+    return top / bottom
+
+
+def far_pair(G, vs):
+    """
+    Returns a vertex and the vertex furthest from it, so a search between
+    them has to cross the whole map.
+    """
+
+    b = vs[0]
+    s = max(vs, key=lambda v: G.distance(b, v))
+    return b, s
+
+
+def workloads(G, vs, seed=0):
+    """
+    Builds one callable per operation, each doing a fixed amount of calls on
+    the map G.
+    :return: Dict of operation to (callable, number of calls it makes).
+    """
+
+    rng = random.Random(seed)
+    b, s = far_pair(G, vs)
+    pairs = [(rng.choice(vs), rng.choice(vs)) for _ in range(200)]
+    mover = vs[len(vs) // 2]
+    x, y = mover.x_pos, mover.y_pos
+    # Just enough range to get across, so the search measures distances
+    # instead of the grid saying the range takes in the whole map.
+    r_far = G.minimum_range(b, s)
+    near = G.opposite(b.edges[0], b)
+    r_near = G.distance(b, near)
+
+    # As many inserts as there are stations, so the grid picking its cell
+    # width again (once the stations double) is paid for over the window,
+    # as it is over the life of a graph.
+    inserts = len(vs)
+
+    def insert_vertex():
+        for _ in range(inserts):
+            G.insert_vertex(rng.random() + 2, rng.random())
+
+    def insert_edge():
+        for u, v in pairs:
+            if u is not v:
+                try:
+                    G.insert_edge(u, v)
+                except EdgeAlreadyExists:
+                    pass
+
+    def move_vertex():
+        for _ in range(10):
+            G.move_vertex(mover, x + 1e-9, y)
+            G.move_vertex(mover, x, y)
+
+    return {
+        "insert_vertex": (insert_vertex, inserts),
+        "insert_edge": (insert_edge, len(pairs)),
+        "move_vertex": (move_vertex, 20),
+        "find_emergency_range": (lambda: G.find_emergency_range(b), 1),
+        "find_path": (lambda: G.find_path(b, s, r_far), 1),
+        "find_path_local": (lambda: [G.find_path(b, near, r_near)
+                                     for _ in range(200)], 200),
+        "minimum_range": (lambda: G.minimum_range(b, s), 1),
+    }
+
+
+def measure(operation, n):
+    """
+    Times one operation on a fresh map of n vertices.
+    :return: The fastest time per call, in seconds.
+    """
+
+    best = math.inf
+    for attempt in range(REPEAT):
+        G, vs = random_geometric(n, seed=attempt)
+        fn, calls = workloads(G, vs, seed=attempt)[operation]
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def count_work(n):
+    """
+    Runs the queries once on the seeded map of n vertices with the counters
+    on.
+    :return: Dict of operation to dict of counter to value.
+    """
+
+    G, vs = random_geometric(n, seed=0)
+    jobs = workloads(G, vs)
+    G.instrument()
+    for operation in ("find_emergency_range", "find_path", "minimum_range"):
+        jobs[operation][0]()
+    return {operation: {k: getattr(c, k) for k in COUNTERS}
+            for operation, c in G.stats.items()}
+
+
+class TestScaling(unittest.TestCase):
+
+    def check_growth(self, operation):
+        times = [measure(operation, n) for n in SIZES]
+        k = growth_exponent(SIZES, times)
+        assert k <= BOUNDS[operation] + SLACK, \
+            """
+            {} grows like n^{:.2f}, the bound is n^{}.
+            Times per call: {}""".format(
+                operation, k, BOUNDS[operation],
+                ", ".join("{}: {:.2e}s".format(n, t)
+                          for n, t in zip(SIZES, times)))
+
+    @timeout_decorator.timeout(60)
+    def test_insert_vertex_growth(self):
+        self.check_growth("insert_vertex")
+
+    @timeout_decorator.timeout(60)
+    def test_insert_edge_growth(self):
+        self.check_growth("insert_edge")
+
+    @timeout_decorator.timeout(60)
+    def test_move_vertex_growth(self):
+        self.check_growth("move_vertex")
+
+    @timeout_decorator.timeout(60)
+    def test_find_emergency_range_growth(self):
+        self.check_growth("find_emergency_range")
+
+    @timeout_decorator.timeout(60)
+    def test_find_path_growth(self):
+        self.check_growth("find_path")
+
+    @timeout_decorator.timeout(60)
+    def test_find_path_local_growth(self):
+        self.check_growth("find_path_local")
+
+    @timeout_decorator.timeout(60)
+    def test_minimum_range_growth(self):
+        self.check_growth("minimum_range")
+
+    @timeout_decorator.timeout(60)
+    def test_work_against_baseline(self):
+        current = {str(n): count_work(n) for n in BASELINE_SIZES}
+
+        if os.environ.get("UPDATE_PERF_BASELINE"):
+            with open(BASELINE_PATH, "w") as f:
+                json.dump(current, f, indent=2, sort_keys=True)
+                f.write("\n")
+            return
+
+        assert os.path.exists(BASELINE_PATH), \
+            "{} is missing, make it with UPDATE_PERF_BASELINE=1".format(
+                BASELINE_PATH)
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+        for n, operations in baseline.items():
+            for operation, counters in operations.items():
+                for counter, expected in counters.items():
+                    got = current[n][operation][counter]
+                    limit = expected * (1 + BASELINE_TOLERANCE)
+                    assert got <= limit, \
+                        "{} on {} vertices: {} went from {} to {}".format(
+                            operation, n, counter, expected, got)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+"""
+Tests the scratch arrays the searches keep their state in, and that the
+searches using them give the same answers however they are interleaved.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_scratch.py
+"""
+
+import random
+import threading
+import unittest
+from array import array
+import timeout_decorator
+
+from graph import Graph
+from scratch import Scratch
+from benchmarks.generators import random_geometric
+
+
+class TestScratch(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_epochs_forget(self):
+        scratch = Scratch()
+        epoch = scratch.begin(10)
+        assert len(scratch) == 10, "Expected room for 10 ids"
+        scratch.visited[3] = epoch
+        scratch.parent[3] = 7
+        scratch.parent_stamp[3] = epoch
+
+        epoch = scratch.begin(10)
+        assert scratch.visited[3] != epoch and \
+            scratch.parent_stamp[3] != epoch, "The last search leaked"
+
+        scratch.begin(11)
+        assert len(scratch) == 20, "Expected the arrays to double"
+        assert all(len(a) == 20 for a in (
+            scratch.parent, scratch.parent_stamp, scratch.distance,
+            scratch.distance_stamp)), "The arrays grew apart"
+
+
+class TestSearches(unittest.TestCase):
+
+    @timeout_decorator.timeout(10)
+    def test_dfs_and_bfs_agree(self):
+        G, vs = random_geometric(200, seed=1)
+        rng = random.Random(1)
+        for _ in range(50):
+            b, s = rng.sample(vs, 2)
+            # The DFS always finds s if it can reach a station next to it,
+            # so only ask for stations in range.
+            r = max(rng.uniform(0.1, 0.8), G.distance(b, s))
+            bfs = G._BFS_path(b, s, r)
+            dfs = G._DFS_path(b, s, r)
+            assert (bfs is None) == (dfs is None), \
+                "{} to {} within {}: BFS {}, DFS {}".format(b, s, r, bfs, dfs)
+            for path in (bfs, dfs):
+                if path is not None:
+                    assert path[0] is b and path[-1] is s and \
+                        all(G.distance(b, v) <= r for v in path), \
+                        "Bad path {}".format(path)
+            # A vertex added since the last search gets room too.
+            if rng.random() < 0.2:
+                w = G.insert_vertex(rng.random(), rng.random())
+                G.insert_edge(w, b)
+                vs.append(w)
+
+    @timeout_decorator.timeout(5)
+    def test_search_inside_a_search(self):
+        G, vs = random_geometric(100, seed=2)
+        b, s = vs[0], vs[-1]
+        expected = G.find_path(b, s, 2)
+
+        with G._scratch_arrays() as outer:
+            outer.visited[b.id] = outer.epoch
+            assert G.find_path(b, s, 2) == expected, \
+                "The inner search differs"
+            assert outer.visited[b.id] == outer.epoch, \
+                "The inner search used the outer one's arrays"
+
+    @timeout_decorator.timeout(20)
+    def test_threads(self):
+        G, vs = random_geometric(300, seed=3)
+        rng = random.Random(3)
+        queries = [(b, s, rng.uniform(0.2, 0.8))
+                   for b, s in (rng.sample(vs, 2) for _ in range(100))]
+        expected = [G.find_path(b, s, r) for b, s, r in queries]
+        failures = []
+
+        def run(offset):
+            for k in range(len(queries)):
+                k = (k + offset) % len(queries)
+                if G.find_path(*queries[k]) != expected[k]:
+                    failures.append(queries[k])
+
+        threads = [threading.Thread(target=run, args=(offset,))
+                   for offset in range(0, 100, 25)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not failures, "Threads got different paths: {}".format(
+            failures[:3])
+
+
+class TestPathForms(unittest.TestCase):
+
+    @timeout_decorator.timeout(10)
+    def test_forms_agree(self):
+        G, vs = random_geometric(200, seed=4)
+        rng = random.Random(4)
+        for _ in range(50):
+            b, s = rng.sample(vs, 2)
+            r = rng.uniform(0.1, 0.8)
+            path = G.find_path(b, s, r)
+            ids = G.find_path(b, s, r, form="ids")
+            lazy = G.find_path(b, s, r, form="lazy")
+            if path is None:
+                assert ids is None and lazy is None, \
+                    "Expected no path from {} to {}".format(b, s)
+                continue
+            assert isinstance(ids, array) and ids.typecode == "l" and \
+                list(ids) == [v.id for v in path], \
+                "Ids {} for path {}".format(ids, path)
+            assert len(lazy) == len(path) and lazy.first_hop is path[1], \
+                "Lazy path {} for path {}".format(lazy, path)
+            assert list(lazy) == path and \
+                list(reversed(lazy)) == path[::-1] and \
+                lazy.ids() == ids, "The lazy path reads differently"
+
+    @timeout_decorator.timeout(5)
+    def test_lazy_outlives_the_search(self):
+        G, vs = random_geometric(200, seed=5)
+        b, s = vs[0], vs[-1]
+        path = G.find_path(b, s, 2)
+        lazy = G.find_path(b, s, 2, form="lazy")
+        backwards = reversed(lazy)
+        halfway = [next(backwards) for _ in range(len(path) // 2)]
+
+        # Later searches write over the parents the lazy path was reading.
+        for u in vs[1:20]:
+            G.find_path(u, vs[-2], 2)
+        assert list(lazy) == path, "The lazy path changed"
+        assert halfway + list(backwards) == path[::-1], \
+            "Walking back was cut up by the other searches"
+
+    @timeout_decorator.timeout(1)
+    def test_start_is_end(self):
+        G = Graph()
+        b = G.insert_vertex(0, 0)
+        assert list(G.find_path(b, b, 1, form="ids")) == [b.id], \
+            "Expected just the start"
+        lazy = G.find_path(b, b, 1, form="lazy")
+        assert len(lazy) == 1 and lazy.first_hop is None and \
+            list(lazy) == [b], "Expected just the start"
+        with self.assertRaises(ValueError):
+            G.find_path(b, b, 1, form="tuple")
+
+
+class TestProgressive(unittest.TestCase):
+
+    @timeout_decorator.timeout(10)
+    def test_ends_with_the_path(self):
+        G, vs = random_geometric(300, seed=6)
+        rng = random.Random(6)
+        for _ in range(40):
+            b, s = rng.sample(vs, 2)
+            r = rng.uniform(0.1, 0.8)
+            chunk = rng.choice([None, 1, 3, 10])
+            frontiers = list(G.find_path_progressive(b, s, r, chunk))
+            last = frontiers.pop()
+            assert last.done and not any(f.done for f in frontiers), \
+                "Expected only the last to be done"
+            assert last.path == G.find_path(b, s, r), \
+                "{} to {} within {}: got {}".format(b, s, r, last.path)
+
+            reached = [v for f in frontiers for v in f.vertices]
+            assert len(set(v.id for v in reached)) == len(reached) and \
+                all(G.distance(b, v) <= r for v in reached), \
+                "Every vertex should come once, within range"
+            hops = [f.hops for f in frontiers]
+            assert hops == sorted(hops) and \
+                (last.path is None or last.path[-1] in reached), \
+                "The layers came out of order"
+            if chunk is not None:
+                assert all(len(f.vertices) <= chunk for f in frontiers), \
+                    "Chunks bigger than {}".format(chunk)
+
+    @timeout_decorator.timeout(5)
+    def test_stop_early(self):
+        G, vs = random_geometric(300, seed=7)
+        b, s = vs[0], vs[-1]
+        expected = G.find_path(b, s, 2)
+
+        search = G.find_path_progressive(b, s, 2, chunk=5)
+        next(search)
+        next(search)
+        # Other searches can run while it's suspended.
+        assert G.find_path(b, s, 2) == expected, "The inner search differs"
+        search.close()
+        assert len(G._scratch.pool) == 2 and \
+            not any(scratch.busy for scratch in G._scratch.pool), \
+            "Stopping didn't free the arrays"
+
+        with self.assertRaises(ValueError):
+            G.find_path_progressive(b, s, 2, chunk=0)
+
+
+    @timeout_decorator.timeout(5)
+    def test_paused_search_reuses_arrays(self):
+        G, vs = random_geometric(300, seed=8)
+        b, s = vs[0], vs[-1]
+        search = G.find_path_progressive(b, s, 2, chunk=5)
+        next(search)
+        G.find_path(b, s, 2)
+        pool = list(G._scratch.pool)
+        for u in vs[1:20]:
+            G.find_path(u, s, 2)
+        assert len(pool) == 1 and G._scratch.pool == pool, \
+            "The searches made new arrays while the other was paused"
+        search.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
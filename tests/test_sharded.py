@@ -0,0 +1,191 @@
+"""
+Tests the sharded graph's distributed searches against the same queries on
+the graph itself.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_sharded.py
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import tracemalloc
+import unittest
+import timeout_decorator
+
+from graph import Graph
+from metrics import Haversine
+from flatgraph import FlatGraph
+from sharded import ShardedGraph, _partition, _serve
+from benchmarks import generators
+
+
+def check_queries(test, G, vs, sharded, pairs, rng):
+    for b, s in pairs:
+        i, j = sharded.index(b.id), sharded.index(s.id)
+
+        expected = G.minimum_range(b, s)
+        got = sharded.minimum_range(i, j)
+        test.assertEqual(got, expected,
+                         "Minimum range {} to {}".format(b, s))
+
+        assert math.isclose(sharded.find_emergency_range(i),
+                            G.find_emergency_range(b)), \
+            "Emergency range from {}".format(b)
+
+        r = rng.uniform(0.5, 1.5) * (expected or 0.5)
+        expected = G.find_path(b, s, r)
+        got = sharded.find_path(i, j, r)
+        if expected is None:
+            assert got is None, "Path {} to {} within {}".format(b, s, r)
+            continue
+        assert got is not None and len(got) == len(expected), \
+            "Path {} to {} within {}: expected {}, got {}".format(
+                b, s, r, expected, got)
+        assert got[0] == i and got[-1] == j, "Wrong ends: {}".format(got)
+        path = [G._vertices[k] for k in got]
+        assert all(G.distance(b, v) <= r for v in path), "Out of range"
+        assert all(any(G.opposite(e, u) is w for e in u.edges)
+                   for u, w in zip(path, path[1:])), "Not a path"
+
+
+class TestShardedGraph(unittest.TestCase):
+
+    @timeout_decorator.timeout(20)
+    def test_matches_graph_in_process(self):
+        G, vs = generators.random_geometric(400, seed=1)
+        rng = random.Random(1)
+        pairs = [rng.sample(vs, 2) for _ in range(40)] + [(vs[0], vs[0])]
+        for tiles in (1, 3, 5):
+            with ShardedGraph.from_graph(G, tiles, processes=False) as sharded:
+                assert 1 <= sharded.shards <= tiles * tiles, \
+                    "{} shards".format(sharded.shards)
+                check_queries(self, G, vs, sharded, pairs, rng)
+
+    @timeout_decorator.timeout(30)
+    def test_matches_graph_in_workers(self):
+        G, vs = generators.random_geometric(200, seed=2,
+                                               degree=6)
+        rng = random.Random(2)
+        pairs = [rng.sample(vs, 2) for _ in range(15)]
+        sharded = ShardedGraph.from_graph(G, tiles=2)
+        try:
+            check_queries(self, G, vs, sharded, pairs, rng)
+        finally:
+            workers = list(sharded._workers)
+            sharded.close()
+        assert workers and not any(w.is_alive() for w in workers), \
+            "The workers should have stopped"
+
+    @timeout_decorator.timeout(20)
+    def test_unreachable_and_loaded(self):
+        # Two islands, joined up by nothing, a degree across each.
+        G, vs = generators.random_geometric(150, seed=3)
+        far = [G.insert_vertex(40 + v.x_pos, v.y_pos) for v in vs[:30]]
+        for u, w in zip(far, far[1:]):
+            G.insert_edge(u, w)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "map.graph")
+            G.save(path)
+            # The same map measured on the globe.
+            G = Graph.load(path, mmap=False, metric=Haversine())
+            vs = [v for v in G._vertices if v.x_pos < 40]
+            far = [v for v in G._vertices if v.x_pos >= 40]
+            with ShardedGraph.load(path, tiles=4, processes=False,
+                                   metric=Haversine()) as sharded:
+                i, j = sharded.index(vs[0].id), sharded.index(far[-1].id)
+                assert sharded.minimum_range(i, j) is None, \
+                    "The islands aren't joined"
+                assert sharded.find_path(i, j, math.inf) is None, \
+                    "The islands aren't joined"
+                rng = random.Random(3)
+                check_queries(self, G, vs + far, sharded,
+                              [rng.sample(vs, 2) for _ in range(10)] +
+                              [rng.sample(far, 2) for _ in range(5)], rng)
+
+    @timeout_decorator.timeout(10)
+    def test_empty_graph(self):
+        G = Graph()
+        v = G.insert_vertex(0, 0)
+        G.remove_vertex(v)
+        expected = G.find_emergency_range(v)
+        for processes in (False, True):
+            with ShardedGraph.from_graph(G, 2, processes=processes) as sharded:
+                assert sharded.shards == 0, "Expected no shards"
+                assert sharded.find_emergency_range(0) == expected, \
+                    "Expected {} like the graph".format(expected)
+
+    @timeout_decorator.timeout(60)
+    def test_workers_build_their_own_shards(self):
+        G, vs = generators.random_geometric(10000, seed=4)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "map.graph")
+            G.save(path)
+            tracemalloc.start()
+            try:
+                with ShardedGraph.load(path, tiles=2) as sharded:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    i, j = sharded.index(vs[0].id), sharded.index(vs[-1].id)
+                    assert sharded.minimum_range(i, j) == \
+                        G.minimum_range(vs[0], vs[-1]), "Wrong range"
+            finally:
+                tracemalloc.stop()
+        # The shards alone would take over 1MB here.
+        assert peak < 512 * 1024, \
+            "The front-end peaked at {} bytes".format(peak)
+
+    @timeout_decorator.timeout(10)
+    def test_workers_let_go_of_the_graph(self):
+        G, vs = generators.random_geometric(300, seed=5)
+        flat = FlatGraph.from_graph(G)
+        tiling, _ = _partition(flat, 2)
+        shared = flat.to_shared_memory()
+        conn, child_conn = multiprocessing.Pipe()
+        worker = threading.Thread(target=_serve,
+                                  args=(child_conn, shared.info, tiling, 0))
+        worker.start()
+        try:
+            assert conn.recv() == (True, None), "The shard wasn't built"
+        finally:
+            # Fails if the worker still has a view of the block.
+            shared.close()
+        conn.send(("farthest", (0.5, 0.5)))
+        ok, d = conn.recv()
+        assert ok and 0 < d < 1, "The shard answered {}".format(d)
+        conn.send(None)
+        worker.join()
+
+    @timeout_decorator.timeout(10)
+    def test_search_in_one_tile_takes_few_rounds(self):
+        G = Graph()
+        line = [G.insert_vertex(x * 0.1, 0) for x in range(50)]
+        for u, w in zip(line, line[1:]):
+            G.insert_edge(u, w)
+        # Stations far away, in other tiles.
+        for x in range(20):
+            G.insert_vertex(100 + x, 100)
+
+        with ShardedGraph.from_graph(G, tiles=2, processes=False) as sharded:
+            i, j = sharded.index(line[0].id), sharded.index(line[-1].id)
+            assert sharded.shard_of(i) == sharded.shard_of(j), \
+                "The line should be in one tile"
+            assert math.isclose(sharded.minimum_range(i, j), 4.9), \
+                "The range is the length of the line"
+            assert sharded.last_rounds <= 3, \
+                "Took {} rounds".format(sharded.last_rounds)
+
+    @timeout_decorator.timeout(1)
+    def test_bad_tiles(self):
+        G = Graph()
+        G.insert_vertex(0, 0)
+        with self.assertRaises(ValueError):
+            ShardedGraph.from_graph(G, tiles=0, processes=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -725,3 +725,195 @@ class SingularFunctionTest(unittest.TestCase):
         assert approx_value(expected_r, r), \
             "[find_minimum_range] Expected: {} | Got: {}".format(expected_r, r)
 
+
+    @timeout_decorator.timeout(0.5)
+    def test_minimum_range_path_fewest_hops(self):
+        G = Graph()
+
+        A = G.insert_vertex(0, 0)
+        # A long way round close to A, and a short way through X, which is
+        # exactly as far from A as S is.
+        P = G.insert_vertex(1, 0)
+        Q = G.insert_vertex(2, 1)
+        X = G.insert_vertex(4, 3)
+        S = G.insert_vertex(3, 4)
+
+        G.insert_edge(A, P)
+        G.insert_edge(P, Q)
+        G.insert_edge(Q, S)
+        G.insert_edge(A, X)
+        G.insert_edge(X, S)
+
+        r, p = G.minimum_range_path(A, S)
+
+        assert approx_value(5, r), \
+            "[minimum_range_path] Expected: 5 | Got: {}".format(r)
+        assert approx_value(G.minimum_range(A, S), r), \
+            "[minimum_range_path] Disagrees with minimum_range: {}".format(r)
+        check_is_path(G, A, p, r)
+        assert p == [A, X, S], \
+            "[minimum_range_path] Expected: {} | Got: {}".format([A, X, S], p)
+
+    @timeout_decorator.timeout(0.5)
+    def test_minimum_range_path_unreachable_and_same_node(self):
+        G = Graph()
+
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(2, 0)
+        C = G.insert_vertex(9, 9)
+        G.insert_edge(A, B)
+
+        res = G.minimum_range_path(A, C)
+        assert res == (None, None), \
+            "[minimum_range_path] Expected: (None, None) | Got: {}".format(res)
+
+        res = G.minimum_range_path(B, B)
+        assert res == (0, [B]), \
+            "[minimum_range_path] Expected: (0, [B]) | Got: {}".format(res)
+
+    @timeout_decorator.timeout(0.5)
+    def test_range_hop_frontier_simple(self):
+        G = Graph()
+
+        A = G.insert_vertex(0, 0)
+        # Three hops staying close to A, two hops going a bit further out,
+        # and one hop to S which is far away.
+        P = G.insert_vertex(1, 0)
+        Q = G.insert_vertex(2, 0)
+        X = G.insert_vertex(4, 4)
+        S = G.insert_vertex(3, 0)
+
+        G.insert_edge(A, P)
+        G.insert_edge(P, Q)
+        G.insert_edge(Q, S)
+        G.insert_edge(A, X)
+        G.insert_edge(X, S)
+
+        frontier = G.range_hop_frontier(A, S)
+
+        got = [(round(r, 4), hops, path) for r, hops, path in frontier]
+        expected = [(3, 3, [A, P, Q, S]), (round(math.sqrt(32), 4), 2,
+                                            [A, X, S])]
+        assert got == expected, \
+            "[range_hop_frontier] Expected: {} | Got: {}".format(expected, got)
+
+        for r, hops, path in frontier:
+            check_is_path(G, A, path, r)
+
+    @timeout_decorator.timeout(0.5)
+    def test_range_hop_frontier_unreachable_and_same_node(self):
+        G = Graph()
+
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(2, 0)
+        C = G.insert_vertex(9, 9)
+        G.insert_edge(A, B)
+
+        res = G.range_hop_frontier(A, C)
+        assert res == [], \
+            "[range_hop_frontier] Expected: [] | Got: {}".format(res)
+
+        res = G.range_hop_frontier(A, A)
+        assert res == [(0, 0, [A])], \
+            "[range_hop_frontier] Expected: [(0, 0, [A])] | Got: {}".format(res)
+
+    @timeout_decorator.timeout(0.5)
+    def test_find_shortest_path_prefers_length_over_hops(self):
+        G = Graph()
+
+        A = G.insert_vertex(0, 0)
+        # One hop via a detour, or two short hops straight along.
+        X = G.insert_vertex(2, 5)
+        P = G.insert_vertex(1, 0)
+        Q = G.insert_vertex(2, 0)
+        S = G.insert_vertex(3, 0)
+
+        G.insert_edge(A, X)
+        G.insert_edge(X, S)
+        G.insert_edge(A, P)
+        G.insert_edge(P, Q)
+        G.insert_edge(Q, S)
+
+        length, p = G.find_shortest_path(A, S, 10)
+        assert p == [A, P, Q, S] and approx_value(length, 3), \
+            "[find_shortest_path] Expected: 3, {} | Got: {}, {}".format(
+                [A, P, Q, S], length, p)
+
+        # Q and X are both out of range.
+        length, p = G.find_shortest_path(A, S, 1.9)
+        assert p is None and length is None, \
+            "[find_shortest_path] Expected no path | Got: {}".format(p)
+
+        # Without Q, the detour (moved closer) is all that is left.
+        G.remove_vertex(Q)
+        G.move_vertex(X, 2, 1)
+        length, p = G.find_shortest_path(A, S, 3)
+        expected = math.sqrt(5) + math.sqrt(2)
+        assert p == [A, X, S] and approx_value(length, expected), \
+            "[find_shortest_path] Expected: {}, {} | Got: {}, {}".format(
+                expected, [A, X, S], length, p)
+        check_is_path(G, A, p, 3)
+
+    @timeout_decorator.timeout(0.5)
+    def test_find_shortest_paths_batched(self):
+        G = Graph()
+
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(3, 4)
+        C = G.insert_vertex(6, 8)
+        D = G.insert_vertex(50, 50)
+        G.insert_edge(A, B)
+        G.insert_edge(B, C)
+
+        res = G.find_shortest_paths(A, [C, A, D, B], 20)
+        expected = [(10, [A, B, C]), (0, [A]), (None, None), (5, [A, B])]
+        assert len(res) == 4 and all(
+            p == ep and (l is None if el is None else approx_value(l, el))
+            for (l, p), (el, ep) in zip(res, expected)), \
+            "[find_shortest_paths] Expected: {} | Got: {}".format(expected, res)
+
+    @timeout_decorator.timeout(0.5)
+    def test_find_path_progressive_layers(self):
+        G = Graph()
+
+        A = G.insert_vertex(0, 0)
+        B = G.insert_vertex(1, 0)
+        C = G.insert_vertex(0, 1)
+        D = G.insert_vertex(1, 1)
+        E = G.insert_vertex(9, 9)
+        G.insert_edge(A, B)
+        G.insert_edge(A, C)
+        G.insert_edge(B, D)
+        G.insert_edge(D, E)
+
+        res = list(G.find_path_progressive(A, D, 2))
+        layers = [(f.hops, f.vertices) for f in res if not f.done]
+        assert layers == [(0, [A]), (1, [B, C]), (2, [D])], \
+            "[find_path_progressive] Expected layers A, BC, D | Got: {}" \
+            .format(layers)
+        assert res[-1].done and res[-1].path == [A, B, D], \
+            "[find_path_progressive] Expected: {} | Got: {}".format(
+                [A, B, D], res[-1].path)
+
+    @timeout_decorator.timeout(0.5)
+    def test_remove_vertex_same_spot(self):
+        G = Graph()
+
+        A = G.insert_vertex(1, 1)
+        B = G.insert_vertex(1, 1)
+        C = G.insert_vertex(2, 2)
+        G.insert_edge(A, C)
+        G.insert_edge(B, C)
+
+        # B is equal to A (same spot), but only B should go.
+        G.remove_vertex(B)
+        assert len(G._vertices) == 2 and G._vertices[0] is A, \
+            "[remove_vertex] Expected A and C left | Got: {}".format(
+                G._vertices)
+        assert [G.opposite(e, C) for e in C.edges][0] is A, \
+            "[remove_vertex] C should still be joined to A"
+
+        G.remove_vertex(A)
+        assert G._vertices == [C] and not C.edges, \
+            "[remove_vertex] Expected only C left | Got: {}".format(
+                G._vertices)
@@ -0,0 +1,195 @@
+"""
+Tests the snapshots of the graph, e.g. snapshot + move + query the snapshot.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_snapshot.py
+"""
+
+import math
+import threading
+import time
+import unittest
+import timeout_decorator
+
+from graph import EdgeAlreadyExists, Graph
+
+# Tolerance for the threshold of distances
+TOLERANCE_THRESHOLD = 0.001
+
+
+def approx_value(a, b):
+    """
+    Asserts that the value of a and b are approximately close.
+    :param a: A number to compare to.
+    :param b: A number to compare against.
+    :return: The bool if they're approximate
+    """
+
+    return math.isclose(a, b, abs_tol=TOLERANCE_THRESHOLD)
+
+
+def make_layers():
+    """
+    Builds the usual layered graph.
+    :return: The graph and the vertices A to F.
+    """
+
+    G = Graph()
+
+    # Layer 1
+    A = G.insert_vertex(0, 0)
+
+    # Layer 2
+    B = G.insert_vertex(2, 0)
+    C = G.insert_vertex(2, 4)
+    D = G.insert_vertex(2, 6)
+
+    # Layer 3
+    E = G.insert_vertex(3, 3)
+    F = G.insert_vertex(4, 6)
+
+    G.insert_edge(A, B)
+    G.insert_edge(A, C)
+    G.insert_edge(A, D)
+    G.insert_edge(C, E)
+    G.insert_edge(C, F)
+    G.insert_edge(D, F)
+
+    return G, (A, B, C, D, E, F)
+
+
+class TestSnapshot(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_snapshot_keeps_old_positions(self):
+        G, (A, B, C, D, E, F) = make_layers()
+
+        snap = G.snapshot()
+        G.move_vertex(C, 2, 10)
+        G.move_vertex(D, 2, 12)
+
+        assert snap.position(C) == (2, 4), \
+            "Snapshot saw a later move: {}".format(snap.position(C))
+
+        p = snap.find_path(A, F, 7.7)
+        assert p in [[A, C, F], [A, D, F]], \
+            "Snapshot path {} was not a minimal hop path".format(p)
+
+        assert G.find_path(A, F, 7.7) is None, \
+            "The live graph should have no path any more"
+        assert G.snapshot().find_path(A, F, 7.7) is None, \
+            "A new snapshot should see the moves"
+
+    @timeout_decorator.timeout(1)
+    def test_snapshot_matches_graph(self):
+        G, (A, B, C, D, E, F) = make_layers()
+        snap = G.snapshot()
+
+        for v in (A, C, F):
+            expected = G.find_emergency_range(v)
+            res = snap.find_emergency_range(v)
+            assert approx_value(expected, res), \
+                "[emergency_range] Expected: {} | Got: {}".format(expected, res)
+
+        expected = G.minimum_range(A, F)
+        res = snap.minimum_range(A, F)
+        assert approx_value(expected, res), \
+            "[minimum_range] Expected: {} | Got: {}".format(expected, res)
+
+    @timeout_decorator.timeout(1)
+    def test_snapshot_sees_edges_and_removals(self):
+        G, (A, B, C, D, E, F) = make_layers()
+        old = G.snapshot()
+
+        G.remove_vertex(C)
+        G.insert_edge(A, E)
+        new = G.snapshot()
+
+        assert C in old and C not in new, "Removal leaked into the snapshot"
+        assert len(old) == 6 and len(new) == 5, \
+            "Wrong sizes: {} and {}".format(len(old), len(new))
+        assert set(old.neighbours(A)) == {B, C, D}, \
+            "Old snapshot neighbours: {}".format(old.neighbours(A))
+        assert set(new.neighbours(A)) == {B, D, E}, \
+            "New snapshot neighbours: {}".format(new.neighbours(A))
+
+    @timeout_decorator.timeout(1)
+    def test_snapshot_only_copies_changes(self):
+        G = Graph()
+        vs = [G.insert_vertex(i, 0) for i in range(500)]
+        for u, v in zip(vs, vs[1:]):
+            G.insert_edge(u, v)
+        G.snapshot()
+
+        G.move_vertex(vs[10], 10, 1)
+        snap = G.snapshot()
+
+        assert len(snap._top.coords) == 1, \
+            "Snapshot copied {} positions".format(len(snap._top.coords))
+        assert G.snapshot() is snap, "Nothing changed, snapshot was rebuilt"
+
+    @timeout_decorator.timeout(5)
+    def test_readers_see_consistent_versions(self):
+        G = Graph()
+        b = G.insert_vertex(0, 0)
+        line = [G.insert_vertex(i, 0) for i in range(1, 30)]
+        G.insert_edge(b, line[0])
+        for u, v in zip(line, line[1:]):
+            G.insert_edge(u, v)
+
+        errors = []
+
+        def read():
+            for _ in range(200):
+                snap = G.snapshot()
+                # Every station is moved as one version, either all on the
+                # x axis or all on the y axis, so the range never changes.
+                r = snap.minimum_range(b, line[-1])
+                if not approx_value(r, 29):
+                    errors.append(r)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for t in readers:
+            t.start()
+        for step in range(50):
+            with G._lock:
+                for i, v in enumerate(line, 1):
+                    if step % 2:
+                        G.move_vertex(v, i, 0)
+                    else:
+                        G.move_vertex(v, 0, i)
+        for t in readers:
+            t.join()
+
+        assert not errors, "Readers saw half applied moves: {}".format(errors)
+
+    @timeout_decorator.timeout(5)
+    def test_writers_add_an_edge_once(self):
+        G = Graph()
+        u = G.insert_vertex(0, 0)
+        v = G.insert_vertex(1, 0)
+        added = []
+
+        def write():
+            try:
+                G.insert_edge(u, v)
+                added.append(True)
+            except EdgeAlreadyExists:
+                pass
+
+        # Every writer queues up on the lock before any of them gets it.
+        writers = [threading.Thread(target=write) for _ in range(4)]
+        with G._lock:
+            for t in writers:
+                t.start()
+            time.sleep(0.1)
+        for t in writers:
+            t.join()
+
+        assert len(added) == 1 and len(u.edges) == len(v.edges) == 1, \
+            "The edge was added {} times".format(len(added))
+
+
+if __name__ == "__main__":
+    unittest.main()
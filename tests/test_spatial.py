@@ -0,0 +1,179 @@
+"""
+Tests the range and nearest station queries, against measuring the distance
+to every station.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_spatial.py
+"""
+
+import math
+import os
+import random
+import tempfile
+import unittest
+import timeout_decorator
+
+from graph import Graph
+from metrics import Haversine
+from spatial import GridIndex, SphereIndex
+
+
+class TestGridIndexNearest(unittest.TestCase):
+
+    @timeout_decorator.timeout(5)
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(1)
+        for grid in (GridIndex(), GridIndex(0.3), GridIndex(50)):
+            points = {}
+            for i in range(400):
+                points[i] = (rng.uniform(0, 30), rng.uniform(0, 10))
+                grid.insert(i, *points[i])
+            for i in range(0, 400, 3):
+                del points[i]
+                grid.remove(i)
+
+            # Inside the map, and far outside it.
+            for x, y in ((15, 5), (0, 0), (300, -200)):
+                for k in (1, 5, 40):
+                    expected = sorted(
+                        (math.hypot(px - x, py - y), i)
+                        for i, (px, py) in points.items() if i != 4)[:k]
+                    got = grid.nearest(x, y, k, skip=4)
+                    assert [i for _, i in got] == [i for _, i in expected], \
+                        "Nearest {} to ({}, {}): expected {}, got {}".format(
+                            k, x, y, expected, got)
+
+    @timeout_decorator.timeout(1)
+    def test_more_than_there_are(self):
+        grid = GridIndex()
+        grid.insert(0, 1, 1)
+        grid.insert(1, 2, 2)
+        assert [i for _, i in grid.nearest(0, 0, 10)] == [0, 1], \
+            "Expected both stations"
+        assert grid.nearest(0, 0, 10, skip=0) == [(math.hypot(2, 2), 1)], \
+            "Expected only station 1"
+        assert GridIndex().nearest(0, 0, 3) == [], "Expected nothing"
+
+    @timeout_decorator.timeout(1)
+    def test_at(self):
+        grid = GridIndex()
+        for i in range(100):
+            grid.insert(i, i * 0.5, -i)
+        assert grid.at(10, -20) == 20, "Expected station 20"
+        assert grid.at(10, -21) is None, "Expected no station"
+        grid.move(20, 3, 3)
+        assert grid.at(10, -20) is None, "Station 20 moved away"
+        assert grid.at(3, 3) == 20, "Station 20 moved here"
+
+
+class TestSphereIndex(unittest.TestCase):
+
+    @timeout_decorator.timeout(5)
+    def test_within_matches_brute_force(self):
+        rng = random.Random(2)
+        h = Haversine()
+        sphere = SphereIndex()
+        points = {}
+        # All over the globe, plus the poles and along the equator and the
+        # date line, where the faces meet.
+        spots = [(rng.uniform(-180, 180), rng.uniform(-90, 90))
+                 for _ in range(500)]
+        spots += [(0, 90), (0, -90), (180, 0), (-180, 0), (45, 0), (45, 35.26)]
+        for i, (lon, lat) in enumerate(spots):
+            points[i] = h.project(lon, lat)
+            sphere.insert(i, points[i])
+        for i in range(0, 500, 4):
+            points[i] = h.project(rng.uniform(-180, 180), rng.uniform(-90, 90))
+            sphere.move(i, points[i])
+        for i in range(1, 500, 7):
+            del points[i]
+            sphere.remove(i)
+
+        for r in (10, 500, 3000, 20000):
+            c = h.chord(r) * (1 + 1e-9)
+            for lon, lat in spots[::25] + spots[-6:]:
+                p = h.project(lon, lat)
+                got = set(sphere.within(p, c))
+                expected = {i for i, q in points.items() if h.kernel(p, q) <= r}
+                assert expected <= got, \
+                    "Range {} of {}: missed {}".format(
+                        r, (lon, lat), expected - got)
+                assert len(got) == len(set(sphere.within(p, c))), \
+                    "Found a station twice"
+        assert len(sphere) == len(points), "Lost count of the stations"
+
+
+class TestStationQueries(unittest.TestCase):
+
+    def make_map(self, seed):
+        rng = random.Random(seed)
+        G = Graph()
+        vs = [G.insert_vertex(rng.uniform(-50, 50), rng.uniform(-50, 50))
+              for _ in range(500)]
+        for v in vs[:100]:
+            G.move_vertex(v, rng.uniform(-80, 80), rng.uniform(-80, 80))
+        for v in vs[100:150]:
+            G.remove_vertex(v)
+        return G, vs[:100] + vs[150:]
+
+    @timeout_decorator.timeout(5)
+    def test_stations_within(self):
+        G, vs = self.make_map(2)
+
+        for b in vs[::50]:
+            for r in (0, 5, 20, 500):
+                expected = sorted((v for v in vs if v is not b and
+                                   G.distance(b, v) <= r),
+                                  key=lambda v: (G.distance(b, v), v.id))
+                got = G.stations_within(b, r)
+                assert got == expected, \
+                    "Within {} of {}: expected {}, got {}".format(
+                        r, b, expected, got)
+
+        got = G.stations_within((0, 0), 10)
+        expected = sorted(
+            (v for v in vs if math.hypot(v.x_pos, v.y_pos) <= 10),
+            key=lambda v: (math.hypot(v.x_pos, v.y_pos), v.id))
+        assert got == expected, \
+            "Within 10 of (0, 0): expected {}, got {}".format(expected, got)
+
+    @timeout_decorator.timeout(5)
+    def test_nearest_stations(self):
+        G, vs = self.make_map(3)
+
+        for b in vs[::50]:
+            expected = sorted(G.distance(b, v) for v in vs if v is not b)[:7]
+            got = G.nearest_stations(b, 7)
+            assert all(math.isclose(d, e) for (d, _), e in zip(got, expected)) \
+                and len(got) == 7, \
+                "Nearest to {}: expected {}, got {}".format(b, expected, got)
+            assert all(math.isclose(d, G.distance(b, v)) for d, v in got), \
+                "Distances don't match the stations: {}".format(got)
+
+        d, v = G.nearest_stations((1000, 1000), 1)[0]
+        expected = min(vs, key=lambda u: math.hypot(u.x_pos - 1000,
+                                                    u.y_pos - 1000))
+        assert v is expected, "Expected {}, got {}".format(expected, v)
+
+    @timeout_decorator.timeout(1)
+    def test_loaded_graph_has_index(self):
+        G = Graph()
+        A = G.insert_vertex(0, 0)
+        G.insert_vertex(1, 0)
+        G.insert_vertex(5, 5)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "map.graph")
+            G.save(path)
+            H = Graph.load(path, mmap=False)
+
+        a = H._by_id[A.id]
+        got = [v.id for v in H.stations_within(a, 2)]
+        assert got == [1], "Expected station 1, got {}".format(got)
+        H.move_vertex(a, 1, 0)
+        assert (a.x_pos, a.y_pos) == (0, 0), "Moved on top of station 1"
+
+
+if __name__ == "__main__":
+    unittest.main()
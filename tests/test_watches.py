@@ -0,0 +1,188 @@
+"""
+Tests the standing queries, e.g. watch + move + callback.
+
+To run this file, in your terminal from the folder above:
+
+python3 -m unittest tests/test_watches.py
+"""
+
+import math
+import random
+import unittest
+import timeout_decorator
+
+from graph import Graph
+from benchmarks.generators import random_geometric
+
+# Tolerance for the threshold of distances
+TOLERANCE_THRESHOLD = 0.001
+
+
+def approx_value(a, b):
+    """
+    Asserts that the value of a and b are approximately close.
+    :param a: A number to compare to.
+    :param b: A number to compare against.
+    :return: The bool if they're approximate
+    """
+
+    return math.isclose(a, b, abs_tol=TOLERANCE_THRESHOLD)
+
+
+def make_layers():
+    """
+    Builds the usual layered graph.
+    :return: The graph and the vertices A to F.
+    """
+
+    G = Graph()
+
+    A = G.insert_vertex(0, 0)
+    B = G.insert_vertex(2, 0)
+    C = G.insert_vertex(2, 20)
+    D = G.insert_vertex(2, 6)
+    E = G.insert_vertex(3, 3)
+    F = G.insert_vertex(4, 6)
+
+    G.insert_edge(A, B)
+    G.insert_edge(A, C)
+    G.insert_edge(A, D)
+    G.insert_edge(C, E)
+    G.insert_edge(C, F)
+    G.insert_edge(D, F)
+
+    return G, (A, B, C, D, E, F)
+
+
+class TestWatches(unittest.TestCase):
+
+    @timeout_decorator.timeout(1)
+    def test_path_watch(self):
+        G, (A, B, C, D, E, F) = make_layers()
+        calls = []
+        watch = G.watch_path(A, F, 7.7, lambda old, new: calls.append(new))
+
+        assert watch.answer == [A, D, F], "Started with {}".format(watch.answer)
+
+        # Out of range before and after, or in range and off the path, or an
+        # edge to outside the range.
+        G.move_vertex(C, 2, 30)
+        G.move_vertex(B, 1, 0)
+        G.insert_edge(B, C)
+        assert calls == [] and watch.recomputes == 0, \
+            "Irrelevant changes caused {} recomputes".format(watch.recomputes)
+
+        # D leaves the range, there is no other way.
+        G.move_vertex(D, 2, 12)
+        assert calls == [None], "Expected the path to break, got {}".format(calls)
+
+        # C comes back, joining up with A.
+        G.move_vertex(C, 2, 4)
+        assert calls[-1] == [A, C, F], "Expected A, C, F, got {}".format(calls)
+
+        watch.cancel()
+        G.move_vertex(C, 2, 30)
+        assert len(calls) == 2, "Callback after cancel"
+
+    @timeout_decorator.timeout(1)
+    def test_range_watch(self):
+        G, (A, B, C, D, E, F) = make_layers()
+        calls = []
+        watch = G.watch_range(A, F, lambda old, new: calls.append(new))
+        assert approx_value(watch.answer, 7.2111), "Got {}".format(watch.answer)
+
+        # Further away than the answer, can't matter.
+        G.move_vertex(C, 2, 40)
+        G.insert_edge(C, B)
+        assert watch.recomputes == 0, \
+            "Far changes caused {} recomputes".format(watch.recomputes)
+
+        G.move_vertex(F, 4, 5)
+        assert len(calls) == 1 and approx_value(calls[0], math.sqrt(41)), \
+            "Expected sqrt(41), got {}".format(calls)
+
+        G.remove_vertex(F)
+        assert calls[-1] is None, "Removing s should end the watch"
+
+    @timeout_decorator.timeout(20)
+    def test_random_changes_match_queries(self):
+        G, vs = random_geometric(150, seed=9)
+        rng = random.Random(9)
+        b = vs[0]
+        watches = []
+        for s in rng.sample(vs[1:], 5):
+            r = G.distance(b, s) * 1.5
+            watches.append((G.watch_path(b, s, r, lambda old, new: None), r))
+        ranges = [G.watch_range(b, s, lambda old, new: None)
+                  for s in rng.sample(vs[1:], 5)]
+
+        for _ in range(100):
+            v = rng.choice(vs[1:])
+            G.move_vertex(v, v.x_pos + rng.uniform(-0.05, 0.05),
+                          v.y_pos + rng.uniform(-0.05, 0.05))
+
+            for watch, r in watches:
+                expected = G.find_path(b, watch.s, r)
+                if expected is None:
+                    assert watch.answer is None, "Watch kept a broken path"
+                else:
+                    assert watch.answer is not None and \
+                        len(watch.answer) == len(expected) and \
+                        watch._still_valid(watch.answer), \
+                        "Watch has {}, expected {}".format(watch.answer, expected)
+
+            for watch in ranges:
+                expected = G.minimum_range(b, watch.s)
+                assert approx_value(watch.answer, expected), \
+                    "[minimum_range] Expected: {} | Got: {}".format(
+                        expected, watch.answer)
+
+        total = sum(w.recomputes for w, _ in watches) + \
+            sum(w.recomputes for w in ranges)
+        assert total < 1000, "Every change was recomputed ({})".format(total)
+
+    @timeout_decorator.timeout(20)
+    def test_proximity_move_calls_back_once(self):
+        # A move in proximity mode drops and adds edges as it goes, the
+        # watches should only hear about where it ends up.
+        rng = random.Random(10)
+        G = Graph(travel_distance=4)
+        vs = [G.insert_vertex(rng.randint(0, 20), rng.randint(0, 20))
+              for _ in range(40)]
+        b = vs[0]
+        calls = []
+
+        def callback(k):
+            return lambda old, new: calls.append(k)
+
+        paths = [G.watch_path(b, s, 12, callback(k))
+                 for k, s in enumerate(vs[1:6])]
+        ranges = [G.watch_range(b, s, callback(k + len(paths)))
+                  for k, s in enumerate(vs[1:6])]
+
+        for _ in range(200):
+            v = rng.choice(vs[1:])
+            before = [w.answer for w in paths + ranges]
+            del calls[:]
+            G.move_vertex(v, rng.randint(0, 20), rng.randint(0, 20))
+
+            for k, watch in enumerate(paths):
+                old, new = before[k], G.find_path(b, watch.s, 12)
+                assert calls.count(k) == (watch.answer is not old), \
+                    "{} path callbacks for one move".format(calls.count(k))
+                if (old is None) != (new is None) or \
+                        len(old or ()) != len(new or ()):
+                    assert calls.count(k) == 1, \
+                        "No callback for {} to {}".format(old, new)
+
+            for k, watch in enumerate(ranges, len(paths)):
+                old, new = before[k], G.minimum_range(b, watch.s)
+                assert watch.answer == new, \
+                    "[minimum_range] Expected: {} | Got: {}".format(
+                        new, watch.answer)
+                assert calls.count(k) == (old != new), \
+                    "{} range callbacks for {} to {}".format(
+                        calls.count(k), old, new)
+
+if __name__ == "__main__":
+    unittest.main()
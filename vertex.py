@@ -25,6 +25,9 @@ class Vertex:
         * x_pos (float): The X position of the vertex.
         * y_pos (float): The Y position of the vertex.
         * edges (list) : The list of edges where this node is connected.
+        * id (int)     : The identifier given to the vertex by the graph it
+                         was inserted into, None until then. Unlike the
+                         position, it never changes when the vertex moves.
     """
 
     def __init__(self, x_pos, y_pos):
@@ -46,6 +49,7 @@ class Vertex:
         self.x_pos = x_pos
         self.y_pos = y_pos
         self.edges = []
+        self.id = None
 
     def __eq__(self, other):
         """
@@ -0,0 +1,246 @@
+"""
+Watches Module
+==============
+
+Standing queries: register a find_path or minimum_range query once, and get a
+callback whenever a change to the graph changes its answer.
+
+Every change is first put through a cheap check that rules out most of the
+changes that can't matter, and only the rest cause the query to be run again.
+The callback is only made if the answer really is different.
+
+For find_path(b, s, r) only the stations within r of b matter:
+
+    * a station that stays inside (or stays outside) the range changes
+      nothing, and neither does an edge with an end outside the range.
+    * a station leaving the range, or being removed, only matters if it is on
+      the current path, and so does an edge being removed.
+    * a station entering the range only matters if it is next to a station
+      already inside it.
+
+For minimum_range(b, s) with current answer R, any path through the changed
+part needs a range of at least t (the smaller of a moved station's old and
+new distance to b, the larger of the distances of a new or removed edge's
+ends, the distance of a removed station). Nothing changes while R < t.
+
+A change that comes as several events (a move in proximity mode drops the
+edges that got too long, moves, then adds the new ones) is checked event by
+event, but the query is only run again once, at the end.
+
+Usage:
+    Not to be run as main, watches are made with Graph.watch_path() and
+    Graph.watch_range().
+
+Example:
+    def changed(old, new):
+        print("Route went from", old, "to", new)
+
+    watch = G.watch_path(b, s, r, changed)
+    ...
+    watch.cancel()
+"""
+
+
+class _Watch:
+    """
+    The parts shared by all watches: following the graph, and calling back
+    when the answer changes.
+
+    Attributes:
+        * answer: The current answer of the query.
+        * recomputes (int): How many times the query was run again.
+    """
+
+    def __init__(self, graph, b, s, callback):
+        self._graph = graph
+        self.b = b
+        self.s = s
+        self._callback = callback
+        self.recomputes = 0
+        # Inside a change made of several events, whether one of them
+        # mattered (None outside of one).
+        self._stale = None
+        with graph._lock:
+            self.answer = self._query()
+            graph._observers.append(self)
+
+    def cancel(self):
+        """
+        Stops watching, no more callbacks will be made.
+        """
+
+        if self in self._graph._observers:
+            self._graph._observers.remove(self)
+
+    def _distance(self, v):
+        return self._graph.distance(self.b, v)
+
+    def _old_distance(self, old_x, old_y):
+        return self._graph._distance_to(self.b, old_x, old_y)
+
+    def _recompute(self):
+        """
+        Runs the query again, and calls back if the answer changed.
+        """
+
+        if self._stale is not None:
+            # Wait for the end of the change.
+            self._stale = True
+            return
+        self.recomputes += 1
+        old, new = self.answer, self._query()
+        if not self._same(old, new):
+            self.answer = new
+            self._callback(old, new)
+
+    def _same(self, old, new):
+        return old == new
+
+    def change_started(self):
+        self._stale = False
+
+    def change_finished(self):
+        stale, self._stale = self._stale, None
+        if stale:
+            self._recompute()
+
+    def vertex_inserted(self, v):
+        # A new station has no edges yet, it can't be part of any answer.
+        pass
+
+    def vertex_removed(self, v, neighbours):
+        if v is self.b or v is self.s:
+            self.cancel()
+            old, self.answer = self.answer, None
+            if old is not None:
+                self._callback(old, None)
+            return
+        if self._removal_matters(v):
+            self._recompute()
+
+    def vertex_moved(self, v, old_x, old_y):
+        if v is self.b or self._move_matters(v, old_x, old_y):
+            self._recompute()
+
+    def edge_inserted(self, u, v):
+        if self._edge_matters(u, v):
+            self._recompute()
+
+    def edge_removed(self, u, v):
+        if self._edge_removal_matters(u, v):
+            self._recompute()
+
+
+class PathWatch(_Watch):
+    """
+    PathWatch Class
+    ---------------
+
+    Watches find_path(b, s, r). The callback gets the old and the new path
+    (either can be None) when the path stops being valid, a path with fewer
+    hops appears, or a path appears where there was none.
+    """
+
+    def __init__(self, graph, b, s, r, callback):
+        self.r = r
+        super().__init__(graph, b, s, callback)
+
+    def _query(self):
+        return self._graph.find_path(self.b, self.s, self.r)
+
+    def _same(self, old, new):
+        if old is None or new is None:
+            return old is new
+        # Another path with as few hops is no news, keep the one we had.
+        return len(old) == len(new) and self._still_valid(old)
+
+    def _still_valid(self, path):
+        """
+        Checks every station of the path is still in the graph and in range,
+        and every hop is still an edge.
+        """
+
+        graph = self._graph
+        for i, v in enumerate(path):
+            if graph._by_id.get(v.id) is not v or self._distance(v) > self.r:
+                return False
+            if i > 0 and not any(graph.opposite(e, v) is path[i - 1]
+                                 for e in v.edges):
+                return False
+        return True
+
+    def _on_path(self, v):
+        return self.answer is not None and \
+            any(u is v for u in self.answer)
+
+    def _removal_matters(self, v):
+        # Only removing a station on the path can break it, and losing a
+        # station never makes a shorter path.
+        return self._on_path(v)
+
+    def _move_matters(self, v, old_x, old_y):
+        was_in = self._old_distance(old_x, old_y) <= self.r
+        is_in = self._distance(v) <= self.r
+        if was_in == is_in:
+            return False
+        if was_in:
+            return self._on_path(v)
+
+        # Entering the range only helps if it joins up with the range.
+        if v is self.s:
+            return True
+        if self.answer is not None and len(self.answer) <= 2:
+            return False
+        graph = self._graph
+        return any(self._distance(graph.opposite(e, v)) <= self.r
+                   for e in v.edges)
+
+    def _edge_matters(self, u, v):
+        if self._distance(u) > self.r or self._distance(v) > self.r:
+            return False
+        # A path of one hop (or none) can't get any shorter.
+        return self.answer is None or len(self.answer) > 2
+
+    def _edge_removal_matters(self, u, v):
+        # Only breaking the path itself can change anything.
+        if self.answer is None:
+            return False
+        for a, c in zip(self.answer, self.answer[1:]):
+            if (a is u and c is v) or (a is v and c is u):
+                return True
+        return False
+
+
+class RangeWatch(_Watch):
+    """
+    RangeWatch Class
+    ----------------
+
+    Watches minimum_range(b, s). The callback gets the old and the new range
+    (None if s can't be reached) whenever it changes.
+    """
+
+    def _query(self):
+        return self._graph.minimum_range(self.b, self.s)
+
+    def _removal_matters(self, v):
+        if self.answer is None:
+            return False
+        return self._distance(v) <= self.answer
+
+    def _move_matters(self, v, old_x, old_y):
+        if self.answer is None:
+            # Moving doesn't join anything up.
+            return False
+        t = min(self._old_distance(old_x, old_y), self._distance(v))
+        return t <= self.answer
+
+    def _edge_matters(self, u, v):
+        if self.answer is None:
+            return True
+        return max(self._distance(u), self._distance(v)) < self.answer
+
+    def _edge_removal_matters(self, u, v):
+        if self.answer is None:
+            return False
+        return max(self._distance(u), self._distance(v)) <= self.answer